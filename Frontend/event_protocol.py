@@ -0,0 +1,182 @@
+"""
+Wire protocol of the dashboard WebSocket server, self-contained so the server
+runs from any directory without importing backend modules.
+Formats (chosen by the client when it connects):
+  json    one JSON text message per event (the original format)
+  batch   events coalesced over a short window into one JSON array per message
+  packed  coalesced events in one binary message; keys and low-cardinality
+          values (class names, feed ids, types) are sent once per connection
+          and referenced by index afterwards
+The formats and the ?since= replay match the backend's /ws endpoint
+(backend/event_codec.py, backend/event_hub.py) and the dashboard decoder
+(src/lib/eventCodec.ts); change them together.
+"""
+import asyncio
+import itertools
+import json
+import struct
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple, Union
+
+FORMATS = ("json", "batch", "packed")
+DEFAULT_COALESCE_MS = 50
+MAX_COALESCE_MS = 1000
+
+PACKED_VERSION = 1
+# Header flag: the client must clear its string table before reading the frame
+FLAG_RESET = 1
+# Values of these fields repeat across events and are interned
+INTERNED_FIELDS = frozenset(("event", "feedId", "type", "class", "state"))
+MAX_STRINGS = 65535
+TAG_STRING_ID, TAG_NUMBER, TAG_NULL, TAG_TRUE, TAG_FALSE, TAG_STRING, TAG_JSON = range(7)
+
+
+def parse_transport(format: Optional[str], coalesce_ms: Optional[str]) -> Tuple[str, float]:
+    """
+    Validate the transport a client asked for.
+    Args:
+        format: One of FORMATS (None = "json")
+        coalesce_ms: Coalescing window in milliseconds (None = default; ignored for "json")
+    Returns:
+        Tuple (format, coalescing window in seconds)
+    """
+    format = format or "json"
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}")
+    if format == "json":
+        return format, 0.0
+    window = DEFAULT_COALESCE_MS if coalesce_ms in (None, "") else float(coalesce_ms)
+    if not 0 <= window <= MAX_COALESCE_MS:
+        raise ValueError(f"coalesce_ms must be between 0 and {MAX_COALESCE_MS}")
+    return format, window / 1000.0
+
+
+async def collect_batch(queue: asyncio.Queue, window: float, max_items: int = 500) -> List:
+    """
+    Wait for one queue item, then keep collecting for up to window seconds.
+    Args:
+        queue: Queue to read from
+        window: Coalescing window in seconds (0 = whatever is already queued)
+        max_items: Items per batch
+    Returns:
+        List of at least one item
+    """
+    batch = [await queue.get()]
+    deadline = time.monotonic() + window
+    while len(batch) < max_items:
+        if not queue.empty():
+            batch.append(queue.get_nowait())
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+class EventEncoder:
+    def __init__(self, format: str = "json"):
+        """
+        Encoder for one connection (packed keeps a per-connection string table).
+        Args:
+            format: One of FORMATS
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}")
+        self.format = format
+        self._strings: Dict[str, int] = {}
+
+    def encode(self, events: List[Dict]) -> List[Union[str, bytes]]:
+        """
+        Encode a batch of events.
+        Args:
+            events: JSON-serializable events
+        Returns:
+            Messages to send (text for json/batch, binary for packed)
+        """
+        if self.format == "json":
+            return [json.dumps(event) for event in events]
+        if self.format == "batch":
+            return [json.dumps(events)]
+        return [self._encode_packed(events)]
+
+    def _intern(self, value: str, new_strings: List[str]) -> int:
+        index = self._strings.get(value)
+        if index is None:
+            index = len(self._strings)
+            self._strings[value] = index
+            new_strings.append(value)
+        return index
+
+    def _encode_packed(self, events: List[Dict]) -> bytes:
+        """
+        Frame layout (little endian):
+            uint8 version, uint8 flags,
+            uint16 new string count, per string: uint16 byte length + UTF-8,
+            uint16 event count, per event: uint8 field count, per field:
+                uint16 key string id, uint8 tag, value by tag
+                (string id: uint16, number: float64, string/json: uint16 length + UTF-8)
+        """
+        flags = 0
+        # Reset instead of overflowing the uint16 ids; a frame adds at most a few strings per event
+        if len(self._strings) + 8 * len(events) > MAX_STRINGS:
+            self._strings = {}
+            flags |= FLAG_RESET
+        new_strings: List[str] = []
+        body = bytearray(struct.pack('<H', len(events)))
+        for event in events:
+            items = list(event.items())[:255]
+            body += struct.pack('<B', len(items))
+            for key, value in items:
+                body += struct.pack('<H', self._intern(str(key), new_strings))
+                if value is None:
+                    body += struct.pack('<B', TAG_NULL)
+                elif value is True or value is False:
+                    body += struct.pack('<B', TAG_TRUE if value else TAG_FALSE)
+                elif isinstance(value, (int, float)):
+                    body += struct.pack('<Bd', TAG_NUMBER, value)
+                elif isinstance(value, str) and key in INTERNED_FIELDS:
+                    body += struct.pack('<BH', TAG_STRING_ID, self._intern(value, new_strings))
+                else:
+                    tag = TAG_STRING if isinstance(value, str) else TAG_JSON
+                    data = (value if tag == TAG_STRING else json.dumps(value)).encode('utf-8')
+                    body += struct.pack('<BH', tag, len(data)) + data
+
+        header = bytearray(struct.pack('<BBH', PACKED_VERSION, flags, len(new_strings)))
+        for string in new_strings:
+            data = string.encode('utf-8')
+            header += struct.pack('<H', len(data)) + data
+        return bytes(header + body)
+
+
+class EventHistory:
+    def __init__(self, size: int = 1000):
+        """
+        Sequence numbers and a ring buffer of the latest events (not thread-safe; callers lock).
+        Args:
+            size: Events kept for replay
+        """
+        self.events = deque(maxlen=size)
+        self.latest = 0
+
+    def append(self, event: Dict) -> Dict:
+        """Number an event; returns a copy with its 'seq' field."""
+        self.latest += 1
+        event = {**event, "seq": self.latest}
+        self.events.append(event)
+        return event
+
+    def since(self, seq: int) -> List[Dict]:
+        """
+        Buffered events after seq, oldest first.
+        Events older than the buffer are gone; a seq from before a restart
+        (above the latest number) replays the whole buffer.
+        """
+        if seq > self.latest:
+            seq = 0
+        first = self.latest - len(self.events) + 1
+        return list(itertools.islice(self.events, max(seq + 1 - first, 0), None))
@@ -0,0 +1,70 @@
+// Decoder for the "packed" WebSocket format (see backend/event_codec.py).
+// Frames reference strings sent earlier on the same connection, so keep one
+// table per socket and start a new one when reconnecting.
+
+const PACKED_VERSION = 1;
+const FLAG_RESET = 1;
+const TAG_STRING_ID = 0;
+const TAG_NUMBER = 1;
+const TAG_NULL = 2;
+const TAG_TRUE = 3;
+const TAG_FALSE = 4;
+const TAG_STRING = 5;
+
+const textDecoder = new TextDecoder();
+
+export function decodePackedFrame(buffer: ArrayBuffer, strings: string[]): Record<string, unknown>[] {
+  const view = new DataView(buffer);
+  let offset = 0;
+
+  const readString = () => {
+    const length = view.getUint16(offset, true);
+    const value = textDecoder.decode(new Uint8Array(buffer, offset + 2, length));
+    offset += 2 + length;
+    return value;
+  };
+
+  const version = view.getUint8(0);
+  if (version !== PACKED_VERSION) {
+    throw new Error(`Unsupported packed version ${version}`);
+  }
+  if (view.getUint8(1) & FLAG_RESET) {
+    strings.length = 0;
+  }
+  const newStrings = view.getUint16(2, true);
+  offset = 4;
+  for (let i = 0; i < newStrings; i++) {
+    strings.push(readString());
+  }
+
+  const numEvents = view.getUint16(offset, true);
+  offset += 2;
+  const events: Record<string, unknown>[] = [];
+  for (let e = 0; e < numEvents; e++) {
+    const numFields = view.getUint8(offset);
+    offset += 1;
+    const event: Record<string, unknown> = {};
+    for (let f = 0; f < numFields; f++) {
+      const key = strings[view.getUint16(offset, true)];
+      const tag = view.getUint8(offset + 2);
+      offset += 3;
+      if (tag === TAG_STRING_ID) {
+        event[key] = strings[view.getUint16(offset, true)];
+        offset += 2;
+      } else if (tag === TAG_NUMBER) {
+        event[key] = view.getFloat64(offset, true);
+        offset += 8;
+      } else if (tag === TAG_NULL) {
+        event[key] = null;
+      } else if (tag === TAG_TRUE || tag === TAG_FALSE) {
+        event[key] = tag === TAG_TRUE;
+      } else if (tag === TAG_STRING) {
+        event[key] = readString();
+      } else {
+        event[key] = JSON.parse(readString());
+      }
+    }
+    events.push(event);
+  }
+  return events;
+}
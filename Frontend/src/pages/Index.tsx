@@ -9,6 +9,7 @@ import { Button } from "@/components/ui/button";
 import { useToast } from "@/hooks/use-toast";
 import { ResizablePanelGroup, ResizablePanel, ResizableHandle } from "@/components/ui/resizable";
 import { Alert, AlertDescription } from "@/components/ui/alert";
+import { decodePackedFrame } from "@/lib/eventCodec";
 
 export interface FeedData {
   id: string;
@@ -21,6 +22,10 @@ export interface FeedData {
   feedIndex?: number;
 }
 
+// websocket_server.py by default; set VITE_WS_URL=ws://localhost:8000/ws for the backend's own event hub.
+// Append ?format=batch or ?format=packed (and optionally &coalesce_ms=50) to receive coalesced events.
+const WEBSOCKET_URL = import.meta.env.VITE_WS_URL || "ws://localhost:1234";
+
 const Index = () => {
   const [feeds, setFeeds] = useState<FeedData[]>([]);
   const [terminalOutput, setTerminalOutput] = useState<string[]>([]);
@@ -31,30 +36,67 @@ const Index = () => {
   const socketRef = useRef<WebSocket | null>(null);
 
   useEffect(() => {
-    const socket = new WebSocket("ws://localhost:1234"); {/* ÄNDRA WEBSOCKET SERVER HÄR!!!!!!!!! */}
-    socketRef.current = socket;
+    // Sequence number of the last event received; a reconnect resumes after it
+    let lastSeq: number | null = null;
+    let retryDelay = 1000;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
 
-    socket.onopen = () => {
-      setIsConnected(true);
-      addTerminalMessage("WebSocket connected.");
-    };
+    const connect = () => {
+      const url = new URL(WEBSOCKET_URL);
+      if (lastSeq !== null) {
+        url.searchParams.set("since", String(lastSeq));
+      }
+      const socket = new WebSocket(url.toString());
+      socket.binaryType = "arraybuffer";
+      socketRef.current = socket;
+      // String table of the packed format, valid for this connection only
+      const packedStrings: string[] = [];
 
-    socket.onclose = () => {
-      setIsConnected(false);
-      addTerminalMessage("WebSocket disconnected.");
-    };
+      socket.onopen = () => {
+        retryDelay = 1000;
+        setIsConnected(true);
+        addTerminalMessage(lastSeq === null ? "WebSocket connected." : "WebSocket reconnected.");
+      };
 
-    socket.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        handleDetectionNotification(data);
-      } catch (e) {
-        console.error("Invalid JSON:", event.data);
-      }
+      socket.onclose = () => {
+        setIsConnected(false);
+        if (closed) {
+          return;
+        }
+        addTerminalMessage(`WebSocket disconnected, reconnecting in ${retryDelay / 1000}s.`);
+        reconnectTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+
+      socket.onmessage = (event) => {
+        try {
+          const data = typeof event.data === "string"
+            ? JSON.parse(event.data)
+            : decodePackedFrame(event.data, packedStrings);
+          // batch and packed messages carry several events
+          for (const item of Array.isArray(data) ? data : [data]) {
+            if (typeof item.seq === "number") {
+              // A lower number means the server restarted; a jump means its replay buffer no longer had everything
+              if (lastSeq !== null && item.seq > lastSeq + 1) {
+                addTerminalMessage(`Missed ${item.seq - lastSeq - 1} event(s) while disconnected.`);
+              }
+              lastSeq = item.seq;
+            }
+            handleDetectionNotification(item);
+          }
+        } catch (e) {
+          console.error("Invalid event message:", event.data);
+        }
+      };
     };
 
+    connect();
+
     return () => {
-      socket.close();
+      closed = true;
+      clearTimeout(reconnectTimer);
+      socketRef.current?.close();
     };
   }, []);
 
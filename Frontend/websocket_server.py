@@ -1,41 +1,195 @@
 import asyncio
 import json
+import os
+import time
+from urllib.parse import parse_qs, urlparse
 import websockets
 from fastapi import FastAPI, Request
 import uvicorn
 from threading import Thread
 
-connected_clients = set()
+# Samma meddelandeformat som backendens /ws (se event_protocol.py)
+from event_protocol import EventEncoder, EventHistory, collect_batch, parse_transport
+
+# Meddelanden som buffras per klient innan policyn slår till
+CLIENT_QUEUE_SIZE = int(os.getenv("WS_CLIENT_QUEUE", "100"))
+# "drop_oldest": släng äldsta meddelandet, "disconnect": koppla ner klienten
+SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+if SLOW_CLIENT_POLICY not in ("drop_oldest", "disconnect"):
+    raise ValueError(f"WS_SLOW_CLIENT_POLICY must be 'drop_oldest' or 'disconnect', got {SLOW_CLIENT_POLICY!r}")
+
+connected_clients = {}  # websocket -> Client
+slow_disconnects = 0  # Klienter som kopplats ner av "disconnect"-policyn
+# Senaste händelserna med sekvensnummer, för återuppspelning efter återanslutning (?since=<seq>)
+history = EventHistory(int(os.getenv("WS_REPLAY_SIZE", "1000")))
+websocket_loop = None  # WebSocket-serverns event loop (HTTP API:t kör i en egen tråd och loop)
 app = FastAPI()
 
+
+class Client:
+    def __init__(self, websocket, max_queue: int, policy: str, format: str = "json", window: float = 0.0, backfill=None):
+        """
+        One connected WebSocket client with its own send queue and writer task.
+        Args:
+            websocket: The client connection
+            max_queue: Events buffered before the slow-client policy applies
+            policy: "drop_oldest" or "disconnect"
+            format: Wire format the client asked for (see event_protocol.FORMATS)
+            window: Seconds over which events are coalesced into one message
+            backfill: Missed events to send before live ones
+        """
+        self.websocket = websocket
+        self.policy = policy
+        self.format = format
+        self.window = window
+        self.encoder = EventEncoder(format)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.connected_at = time.time()
+        self.sent = 0
+        self.events = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.closing = False
+        self.backfill = backfill or []
+        self.writer = asyncio.create_task(self._write())
+
+    def enqueue(self, event, message: str):
+        """
+        Queue an event without waiting for the client (call from the WebSocket loop).
+        Args:
+            event: The event
+            message: The event already serialized as JSON (shared by all json clients)
+        """
+        if self.closing:
+            return
+        item = (event, message, time.monotonic())
+        try:
+            self.queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.policy == "disconnect":
+            global slow_disconnects
+            self.closing = True
+            # Bara det utlösande meddelandet är säkert förlorat; nedkopplingen räknas för sig
+            self.dropped += 1
+            slow_disconnects += 1
+            print(f"Disconnecting slow WebSocket client {self.websocket.remote_address}")
+            asyncio.create_task(self.websocket.close(code=1013, reason="client too slow"))
+            return
+        self.queue.get_nowait()
+        self.dropped += 1
+        self.queue.put_nowait(item)
+
+    async def _send(self, messages):
+        for message in messages:
+            await self.websocket.send(message)
+        self.sent += len(messages)
+
+    async def _write(self):
+        try:
+            for i in range(0, len(self.backfill), 500):
+                events = self.backfill[i:i + 500]
+                await self._send(self.encoder.encode(events))
+                self.events += len(events)
+        except websockets.exceptions.ConnectionClosed:
+            return
+        self.backfill = []
+        while True:
+            batch = await collect_batch(self.queue, self.window)
+            if self.format == "json":
+                messages = [message for _, message, _ in batch]
+            else:
+                messages = self.encoder.encode([event for event, _, _ in batch])
+            try:
+                await self._send(messages)
+            except websockets.exceptions.ConnectionClosed:
+                return
+            self.events += len(batch)
+            self.last_lag = time.monotonic() - batch[0][2]
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+    def get_stats(self):
+        return {
+            "address": str(self.websocket.remote_address),
+            "format": self.format,
+            "connected_for": round(time.time() - self.connected_at, 1),
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "events": self.events,
+            "dropped": self.dropped,
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+
 # WebSocket-server
 async def websocket_handler(websocket):
-    print("WebSocket client connected")
-    connected_clients.add(websocket)
+    # Klienten väljer format vid anslutning: ws://localhost:1234/?format=packed&coalesce_ms=50
+    # och återupptar med ?since=<seq> efter ett avbrott
+    path = websocket.request.path if hasattr(websocket, "request") else websocket.path
+    query = parse_qs(urlparse(path).query)
+    try:
+        format, window = parse_transport(query.get("format", [None])[0], query.get("coalesce_ms", [None])[0])
+        since = query.get("since", [None])[0]
+        since = int(since) if since not in (None, "") else None
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    print(f"WebSocket client connected (format: {format}, since: {since})")
+    # Samma loop-iteration som registreringen: varje händelse hamnar antingen i backfill eller i kön
+    backfill = history.since(since) if since is not None else []
+    client = Client(websocket, CLIENT_QUEUE_SIZE, SLOW_CLIENT_POLICY, format, window, backfill)
+    connected_clients[websocket] = client
     try:
         async for message in websocket:
             print("Received from client:", message)
     except websockets.exceptions.ConnectionClosed:
-        print("WebSocket client disconnected")
+        pass
     finally:
-        connected_clients.remove(websocket)
+        print("WebSocket client disconnected")
+        connected_clients.pop(websocket, None)
+        client.writer.cancel()
 
 # HTTP POST-endpoint som tar emot detection-data
 @app.post("/detection_output")
 async def detection_output(request: Request):
     try:
         data = await request.json()
-        print("Received detection:", data)
-        await broadcast_to_clients(data)
-        return {"status": "ok"}
+        # The backend posts batches (lists) of events; single events are still accepted
+        events = data if isinstance(data, list) else [data]
+        print(f"Received {len(events)} detection(s):", events)
+        for event in events:
+            broadcast_to_clients(event)
+        return {"status": "ok", "received": len(events)}
     except Exception as e:
         return {"error": str(e)}
 
-# Funktion som skickar data till alla WebSocket-klienter
-async def broadcast_to_clients(data):
+# Köstatus och fördröjning per klient
+@app.get("/clients")
+async def clients():
+    return {
+        "policy": SLOW_CLIENT_POLICY,
+        "queue_size": CLIENT_QUEUE_SIZE,
+        "latest_seq": history.latest,
+        "slow_disconnects": slow_disconnects,
+        "clients": [client.get_stats() for client in list(connected_clients.values())],
+    }
+
+# Lägger data i varje klients kö; skrivningen sker i klientens egen task så en
+# långsam klient aldrig håller upp de andra. Säker att anropa från vilken tråd som helst.
+def broadcast_to_clients(data):
+    if websocket_loop is not None:
+        websocket_loop.call_soon_threadsafe(_publish, data)
+
+# Numrering, historik och köer hanteras i WebSocket-loopen, så ordningen är densamma för alla
+def _publish(data):
+    event = history.append(data)
     if connected_clients:
-        message = json.dumps(data)
-        await asyncio.gather(*[client.send(message) for client in connected_clients])
+        message = json.dumps(event)
+        for client in list(connected_clients.values()):
+            client.enqueue(event, message)
 
 # Kör FastAPI på en egen tråd
 def run_http_api():
@@ -43,6 +197,8 @@ def run_http_api():
 
 # Kör WebSocket-servern separat på port 8765
 async def start_websocket_server():
+    global websocket_loop
+    websocket_loop = asyncio.get_running_loop()
     print("WebSocket server listening on ws://localhost:1234")
     async with websockets.serve(websocket_handler, "0.0.0.0", 1234): #DETTA MÅSTE ÖVERRENSTÄMMA MED SRC/PAGES/INDEX.TSX
         await asyncio.Future()  # Kör för evigt
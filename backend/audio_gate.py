@@ -0,0 +1,117 @@
+"""
+Energy / spectral-flux gate for the audio pipeline.
+Skips YAMNet inference on silent or stationary-noise hops, using an
+adaptive noise-floor tracker so quiet sites with a steady hum stay gated.
+"""
+import numpy as np
+from typing import Dict, Optional
+
+
+class EnergyGate:
+    def __init__(
+        self,
+        snr_db: float = 6.0,
+        flux_threshold_db: float = 2.0,
+        silence_db: float = -70.0,
+        floor_rise_db: float = 0.5,
+        floor_init_db: Optional[float] = None,
+        hangover_hops: int = 2,
+        frame_size: int = 512,
+        num_bands: int = 16,
+    ):
+        """
+        Initialize the gate.
+        Args:
+            snr_db: A hop is active when its RMS level is this far above the noise floor
+            flux_threshold_db: A hop is active when its mean band-energy rise per frame exceeds this
+                (onsets in otherwise quiet audio)
+            silence_db: Hops below this RMS level (dBFS) are always skipped
+            floor_rise_db: Maximum noise floor increase per hop (falls immediately; hops below
+                silence_db leave it unchanged)
+            floor_init_db: Initial noise floor estimate (dBFS), defaults to the level of the first hop
+            hangover_hops: Hops kept active after activity ends, so event tails are still scored
+            frame_size: Analysis frame length in samples for the spectral flux
+            num_bands: Number of frequency bands the spectrum is pooled into
+        """
+        self.snr_db = snr_db
+        self.flux_threshold_db = flux_threshold_db
+        self.silence_db = silence_db
+        self.floor_rise_db = floor_rise_db
+        self.hangover_hops = hangover_hops
+        self.frame_size = frame_size
+        self.num_bands = num_bands
+        self._window = np.hanning(frame_size).astype(np.float32)
+
+        self.noise_floor_db = floor_init_db
+        self._last_bands = None
+        self._hangover = 0
+        self.hops_total = 0
+        self.hops_skipped = 0
+
+    def _band_energies_db(self, hops: np.ndarray) -> np.ndarray:
+        """Band energies in dB, shape (num_hops, frames_per_hop, num_bands)."""
+        num_hops, hop_len = hops.shape
+        frames_per_hop = hop_len // self.frame_size
+        frames = hops[:, :frames_per_hop * self.frame_size].reshape(num_hops, frames_per_hop, self.frame_size)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=-1)) ** 2
+        # Pool bins into bands so stationary noise has a stable band energy
+        bins = power.shape[-1] - 1
+        bands = power[..., 1:1 + bins - bins % self.num_bands]
+        bands = bands.reshape(num_hops, frames_per_hop, self.num_bands, -1).sum(axis=-1)
+        return 10 * np.log10(bands + 1e-10)
+
+    def evaluate(self, hops: np.ndarray) -> np.ndarray:
+        """
+        Decide which hops need inference.
+        Args:
+            hops: Array of shape (num_hops, hop_samples), consecutive hops of one stream
+        Returns:
+            Boolean array, True where the hop should be scored
+        """
+        hops = np.atleast_2d(np.asarray(hops, dtype=np.float32))
+        rms_db = 10 * np.log10(np.mean(hops ** 2, axis=1) + 1e-12)
+
+        # Spectral flux: mean positive band-energy change between consecutive frames
+        bands = self._band_energies_db(hops)
+        num_hops = len(hops)
+        flat = bands.reshape(-1, self.num_bands)
+        previous = self._last_bands if self._last_bands is not None else flat[:1]
+        rises = np.maximum(np.diff(np.vstack([previous, flat]), axis=0), 0).mean(axis=1)
+        flux_db = rises.reshape(num_hops, -1).max(axis=1)
+        self._last_bands = flat[-1:]
+
+        # The noise floor recursion is sequential, but only one scalar per hop
+        active = np.zeros(num_hops, dtype=bool)
+        for i in range(num_hops):
+            loud = rms_db[i] > self.silence_db
+            floor_db = self.noise_floor_db if self.noise_floor_db is not None else rms_db[i]
+            above_floor = rms_db[i] > floor_db + self.snr_db
+            onset = flux_db[i] > self.flux_threshold_db
+            if loud and (above_floor or onset):
+                self._hangover = self.hangover_hops
+                active[i] = True
+            elif self._hangover > 0:
+                self._hangover -= 1
+                active[i] = True
+
+            # Track the floor: fall immediately, rise slowly. Silent hops (dropouts,
+            # digital zeros) say nothing about the room noise, so they never pull it down
+            if not loud:
+                continue
+            if self.noise_floor_db is None or rms_db[i] < self.noise_floor_db:
+                self.noise_floor_db = float(rms_db[i])
+            else:
+                self.noise_floor_db += min(self.floor_rise_db, float(rms_db[i]) - self.noise_floor_db)
+
+        self.hops_total += num_hops
+        self.hops_skipped += int(num_hops - active.sum())
+        return active
+
+    def get_stats(self) -> Dict:
+        """Skip counters and the current noise floor."""
+        return {
+            "hops_total": self.hops_total,
+            "hops_skipped": self.hops_skipped,
+            "skip_ratio": self.hops_skipped / self.hops_total if self.hops_total else 0.0,
+            "noise_floor_db": self.noise_floor_db,
+        }
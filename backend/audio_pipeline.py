@@ -0,0 +1,519 @@
+"""
+Real-time audio detection pipeline for many audio streams.
+Capture callbacks (sounddevice) and network sources only copy samples into a
+per-stream ring buffer. One worker thread resamples every stream, collects the
+ready windows of all streams and scores them in a single batched model call
+per tick, then dispatches the per-stream events.
+"""
+import threading
+import time
+import numpy as np
+import sounddevice as sd
+from typing import Callable, Dict, List, Optional
+from streaming_resampler import StreamingResampler
+from streaming_classifier import StreamingYAMNetClassifier
+from http_audio_stream import HTTPAudioStreamReader
+from embedding_store import head_detections, score_heads
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity: int):
+        """
+        Single-producer / single-consumer ring buffer for mono float32 audio.
+        The producer (PortAudio callback) only advances the write position and
+        the consumer (worker thread) only advances the read position, so no
+        lock is needed between them.
+        Args:
+            capacity: Buffer size in samples
+        """
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+        self._write_pos = 0  # Total samples written (monotonic)
+        self._read_pos = 0   # Total samples read (monotonic)
+        self.overflow_count = 0
+        self.dropped_samples = 0
+
+    def available(self) -> int:
+        """Number of samples ready to be read."""
+        return self._write_pos - self._read_pos
+
+    def write(self, samples: np.ndarray) -> int:
+        """
+        Copy samples into the buffer (producer side).
+        If the consumer has fallen behind, the samples that do not fit are
+        dropped and counted as an overflow.
+        Args:
+            samples: 1-D array of audio samples
+        Returns:
+            Number of samples written
+        """
+        n = len(samples)
+        free = self.capacity - (self._write_pos - self._read_pos)
+        if n > free:
+            self.overflow_count += 1
+            self.dropped_samples += n - free
+            n = free
+        if n <= 0:
+            return 0
+
+        start = self._write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        if n > first:
+            self._buffer[:n - first] = samples[first:n]
+
+        # Publish the samples only after they are copied
+        self._write_pos += n
+        return n
+
+    def read_available(self) -> Optional[np.ndarray]:
+        """
+        Read everything buffered so far (consumer side).
+        Returns:
+            Copy of the samples, or None if the buffer is empty
+        """
+        n = self.available()
+        return self.read(n) if n > 0 else None
+
+    def read(self, n: int) -> Optional[np.ndarray]:
+        """
+        Read exactly n samples (consumer side).
+        Args:
+            n: Number of samples to read
+        Returns:
+            Copy of the samples, or None if not enough are buffered yet
+        """
+        if self.available() < n:
+            return None
+
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty(n, dtype=np.float32)
+        out[:first] = self._buffer[start:start + first]
+        if n > first:
+            out[first:] = self._buffer[:n - first]
+
+        self._read_pos += n
+        return out
+
+
+class AudioStream:
+    def __init__(self, feed_id: str, input_sr: int, classifier: StreamingYAMNetClassifier, target_sr: int = 16000, buffer_seconds: float = 10.0):
+        """
+        One audio source (microphone, pushed network audio or HTTP stream) in the registry.
+        Args:
+            feed_id: Feed the detections are reported under
+            input_sr: Sample rate of the source, resolved when the stream is registered
+            classifier: Sliding-window classifier state for this stream
+            target_sr: Sample rate expected by the detector
+            buffer_seconds: Ring buffer size in seconds of input audio
+        """
+        self.feed_id = feed_id
+        self.input_sr = int(input_sr)
+        self.ring = AudioRingBuffer(int(self.input_sr * buffer_seconds))
+        self.resampler = StreamingResampler(self.input_sr, target_sr)
+        self.classifier = classifier
+        self.events = None  # Optional HysteresisEventDetector
+        self.source = "push"
+        self.device = None
+        self.input_stream = None
+        self.reader = None
+        self.reader_thread = None
+        self.input_overflows = 0
+        self.capturing = True
+
+    #### --- Capture stage (PortAudio callback / network reader) --- ###
+    def audio_callback(self, indata, frames, time_info, status):
+        """sounddevice callback: copy the block into the ring buffer and return."""
+        if status and status.input_overflow:
+            self.input_overflows += 1
+
+        if not self.capturing:
+            return
+
+        if indata.ndim > 1 and indata.shape[1] > 1:
+            self.ring.write(np.mean(indata, axis=1))
+        else:
+            self.ring.write(indata.reshape(-1))
+
+    def write(self, samples: np.ndarray) -> int:
+        """
+        Push mono samples from a network source.
+        Args:
+            samples: 1-D audio at the stream's input rate
+        Returns:
+            Number of samples accepted (the rest overflowed)
+        """
+        if not self.capturing:
+            return 0
+        return self.ring.write(np.asarray(samples, dtype=np.float32).reshape(-1))
+
+    def reset(self):
+        """Drop buffered audio and restart the stream clock (after capture was paused)."""
+        self.ring.read_available()
+        self.resampler.reset()
+        self.classifier.reset()
+        if self.events is not None:
+            self.events.reset()
+
+    def read_from(self, reader: HTTPAudioStreamReader):
+        """Reader thread: copy blocks from an HTTP stream into the ring buffer until it is closed."""
+        try:
+            for block in reader.iter_blocks():
+                self.write(block)
+        except Exception as e:
+            if self.reader is not None:
+                print(f"Audio stream '{self.feed_id}' reader stopped: {e}")
+
+    def close(self):
+        """Stop the capture device or HTTP reader, if any."""
+        if self.input_stream is not None:
+            self.input_stream.stop()
+            self.input_stream.close()
+            self.input_stream = None
+        if self.reader is not None:
+            reader, self.reader = self.reader, None
+            reader.close()
+
+    def get_stats(self) -> Dict:
+        """Overflow counters for the status endpoint."""
+        gate = self.classifier.gate
+        return {
+            "source": self.source,
+            "device": self.device,
+            "sample_rate": self.input_sr,
+            "input_overflows": self.input_overflows,
+            "buffer_overflows": self.ring.overflow_count,
+            "dropped_samples": self.ring.dropped_samples,
+            "buffered_seconds": self.ring.available() / self.input_sr,
+            "hops_processed": self.classifier.hops_processed,
+            "gate": gate.get_stats() if gate else None,
+            "http": self.reader.get_stats() if self.reader else None,
+            "events": self.events.get_stats() if self.events else None,
+        }
+
+
+class AudioStreamRegistry:
+    def __init__(
+        self,
+        detector,
+        target_sr: int = 16000,
+        threshold: float = 0.3,
+        on_detections: Optional[Callable[[str, List[Dict]], None]] = None,
+        is_enabled: Optional[Callable[[], bool]] = None,
+        gate_factory: Optional[Callable[[], object]] = None,
+        buffer_seconds: float = 10.0,
+        poll_interval: float = 0.05,
+        embedding_store=None,
+        heads: Optional[List] = None,
+        event_factory: Optional[Callable[[], object]] = None,
+        on_events: Optional[Callable[[str, List[Dict]], None]] = None,
+        profiles=None,
+    ):
+        """
+        Registry of audio streams sharing one detector and one worker thread.
+        Args:
+            detector: SoundDetector (YAMNet mode) or YAMNetDetector used for inference
+            target_sr: Sample rate expected by the detector
+            threshold: Detection threshold passed to the classifiers
+            on_detections: Called from the worker thread with (feed_id, detections) of each hop
+            is_enabled: Returns False while detection is switched off
+            gate_factory: Creates one EnergyGate per stream (None disables gating)
+            buffer_seconds: Ring buffer size per stream in seconds of input audio
+            poll_interval: Worker sleep when no stream has new audio
+            embedding_store: Optional EmbeddingStore the embedding of every scored hop is appended to
+            heads: Optional custom LinearHeads evaluated on the hop embeddings next to the YAMNet classes
+            event_factory: Creates one HysteresisEventDetector per stream (None disables event detection)
+            on_events: Called from the worker thread with (feed_id, events) when events start or end
+            profiles: Optional DetectionProfileStore; a feed's profile overrides the class filter
+                and threshold for that feed only
+        """
+        self.detector = getattr(detector, 'yamnet_detector', detector)
+        self.target_sr = target_sr
+        self.threshold = threshold
+        self.on_detections = on_detections
+        self.is_enabled = is_enabled or (lambda: True)
+        self.gate_factory = gate_factory
+        self.buffer_seconds = buffer_seconds
+        self.poll_interval = poll_interval
+        self.embedding_store = embedding_store
+        self.heads = list(heads or [])
+        self.event_factory = event_factory
+        self.on_events = on_events
+        self.profiles = profiles
+        self._class_names = [self.detector.class_names[i] for i in range(len(self.detector.class_names))]
+
+        # Replaced (never mutated) on register/unregister, so the worker can iterate a snapshot
+        self._streams: Dict[str, AudioStream] = {}
+        self._lock = threading.Lock()
+        self._was_enabled = True
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_inference_ms = 0.0
+
+        self._stop = threading.Event()
+        self._worker = None
+
+    #### --- Stream management --- ###
+    def _create_stream(self, feed_id: str, input_sr: int) -> AudioStream:
+        classifier = StreamingYAMNetClassifier(
+            self.detector,
+            threshold=self.threshold,
+            gate=self.gate_factory() if self.gate_factory else None
+        )
+        stream = AudioStream(feed_id, input_sr, classifier, target_sr=self.target_sr, buffer_seconds=self.buffer_seconds)
+        if self.event_factory:
+            stream.events = self.event_factory()
+        return stream
+
+    def _add(self, stream: AudioStream):
+        with self._lock:
+            old = self._streams.get(stream.feed_id)
+            self._streams = {**self._streams, stream.feed_id: stream}
+        if old is not None:
+            old.close()
+
+    def register_device(self, feed_id: str, device=None, block_duration: float = 0.5) -> AudioStream:
+        """
+        Capture a local input device.
+        Args:
+            feed_id: Feed the detections are reported under
+            device: sounddevice device index or name (None = default input)
+            block_duration: Seconds per PortAudio callback block
+        Returns:
+            The registered stream
+        """
+        device_info = sd.query_devices(device, kind='input')
+        device_sr = int(device_info['default_samplerate'])
+        stream = self._create_stream(feed_id, device_sr)
+        stream.source = "device"
+        stream.device = device_info['name']
+        stream.input_stream = sd.InputStream(
+            callback=stream.audio_callback,
+            channels=1,
+            samplerate=device_sr,
+            blocksize=int(device_sr * block_duration),
+            device=device
+        )
+        stream.input_stream.start()
+        self._add(stream)
+        print(f"Audio stream '{feed_id}' capturing {device_info['name']} at {device_sr} Hz")
+        return stream
+
+    def register_push(self, feed_id: str, sample_rate: int) -> AudioStream:
+        """
+        Register a network source that pushes samples through AudioStream.write().
+        Args:
+            feed_id: Feed the detections are reported under
+            sample_rate: Sample rate of the pushed audio
+        Returns:
+            The registered stream
+        """
+        stream = self._create_stream(feed_id, sample_rate)
+        self._add(stream)
+        print(f"Audio stream '{feed_id}' registered for pushed audio at {sample_rate} Hz")
+        return stream
+
+    def register_url(self, feed_id: str, url: str, sample_rate: int = 16000) -> AudioStream:
+        """
+        Read a live HTTP audio stream (WAV or raw 16-bit PCM) on its own thread.
+        The connection is kept open and re-established with backoff if it drops.
+        Args:
+            feed_id: Feed the detections are reported under
+            url: Stream URL
+            sample_rate: Sample rate of raw PCM streams (a WAV header overrides it)
+        Returns:
+            The registered stream
+        """
+        reader = HTTPAudioStreamReader(url, sample_rate=sample_rate)
+        stream_sr = reader.connect()
+        stream = self._create_stream(feed_id, stream_sr)
+        stream.source = "url"
+        stream.device = url
+        stream.reader = reader
+        stream.reader_thread = threading.Thread(target=stream.read_from, args=(reader,), daemon=True)
+        stream.reader_thread.start()
+        self._add(stream)
+        print(f"Audio stream '{feed_id}' reading {url} at {stream_sr} Hz")
+        return stream
+
+    def unregister(self, feed_id: str) -> bool:
+        """Remove a stream and stop its capture. Returns False if it was not registered."""
+        with self._lock:
+            if feed_id not in self._streams:
+                return False
+            streams = dict(self._streams)
+            stream = streams.pop(feed_id)
+            self._streams = streams
+        stream.close()
+        return True
+
+    def get(self, feed_id: str) -> Optional[AudioStream]:
+        """Look up a registered stream."""
+        return self._streams.get(feed_id)
+
+    def feed_ids(self) -> List[str]:
+        """Registered feed ids."""
+        return list(self._streams)
+
+    #### --- Worker stage --- ###
+    def start(self):
+        """Start the worker thread."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the worker thread and all capture devices."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=1.0)
+        for stream in list(self._streams.values()):
+            stream.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.tick()
+            except Exception as e:
+                print(f"Audio detection error: {e}")
+                processed = 0
+            if not processed:
+                time.sleep(self.poll_interval)
+
+    def tick(self) -> int:
+        """
+        Process everything buffered in all streams with one batched model call.
+        Returns:
+            Number of hops processed
+        """
+        streams = list(self._streams.values())
+        enabled = self.is_enabled()
+        for stream in streams:
+            stream.capturing = enabled
+        if not enabled:
+            self._was_enabled = False
+            return 0
+        if not self._was_enabled:
+            # Capture was paused: restart every stream clock instead of stitching the gap
+            for stream in streams:
+                stream.reset()
+            self._was_enabled = True
+
+        # Resample and collect the ready windows of every stream
+        pending = []
+        for stream in streams:
+            block = stream.ring.read_available()
+            if block is None:
+                continue
+            hops = stream.classifier.collect(stream.resampler.process(block))
+            if hops:
+                pending.append((stream, hops))
+        if not pending:
+            return 0
+
+        # One model invocation for all streams
+        windows = [hop['window'] for _, hops in pending for hop in hops if hop['active']]
+        heads = self.heads
+        need_embeddings = self.embedding_store is not None or bool(heads)
+        scores = []
+        embeddings = None
+        if windows:
+            start = time.perf_counter()
+            if need_embeddings:
+                scores, embeddings = self.detector.score_windows(np.stack(windows), return_embeddings=True)
+            else:
+                scores = self.detector.score_windows(np.stack(windows))
+            self.last_inference_ms = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.last_batch_size = len(windows)
+
+        # Hand each stream its rows and dispatch
+        offset = 0
+        processed = 0
+        for stream, hops in pending:
+            num_active = sum(hop['active'] for hop in hops)
+            class_mask, threshold = self._feed_filter(stream.feed_id)
+            results = stream.classifier.complete(hops, scores[offset:offset + num_active], threshold, class_mask)
+            if embeddings is not None and num_active:
+                self._apply_embeddings(stream.feed_id, results, embeddings[offset:offset + num_active], heads)
+            offset += num_active
+            processed += len(results)
+            if self.on_detections:
+                for hop in results:
+                    if hop['detections']:
+                        self.on_detections(stream.feed_id, hop['detections'])
+            if stream.events is not None:
+                self._update_events(stream, results, heads, class_mask, threshold)
+        return processed
+
+    def _feed_filter(self, feed_id: str):
+        """(class mask, threshold) of a feed's profile; None entries fall back to the global settings."""
+        profile = self.profiles.get(feed_id) if self.profiles is not None else None
+        if profile is None:
+            return None, None
+        return profile.audio_mask(self.detector.class_matcher), profile.audio_threshold
+
+    def _update_events(self, stream: AudioStream, results: List[Dict], heads: List, class_mask: Optional[np.ndarray] = None, threshold: Optional[float] = None):
+        """
+        Run the stream's event state machine over the YAMNet classes and custom heads of each hop.
+        A feed profile's threshold zeroes YAMNet scores below it first, so events (WebSocket
+        notifications, event log) follow the same threshold as the feed's detections.
+        """
+        names = self._class_names + [head.name for head in heads]
+        num_classes = len(self._class_names)
+        if class_mask is None:
+            class_mask = self.detector.class_mask
+        mask = np.ones(len(names), dtype=bool)
+        if class_mask is not None:
+            mask[:num_classes] = class_mask
+
+        for hop in results:
+            scores = hop['scores']
+            if scores is not None and threshold is not None:
+                scores = np.where(scores >= threshold, scores, 0.0)
+            if scores is not None and heads:
+                scores = np.concatenate([scores, hop['head_scores']])
+            events = stream.events.update(hop['start_time'], hop['end_time'], scores, names, mask)
+            for event in events:
+                if event['class_index'] >= num_classes:
+                    event['class_index'] = None  # Custom head
+            if events and self.on_events:
+                self.on_events(stream.feed_id, events)
+
+    def set_heads(self, heads: List):
+        """Replace the custom heads (takes effect on the next tick)."""
+        self.heads = list(heads)
+
+    def _apply_embeddings(self, feed_id: str, results: List[Dict], embeddings: np.ndarray, heads: List):
+        """Store the embeddings of the scored hops and add the detections of the custom heads."""
+        scored = [hop for hop in results if hop['scores'] is not None]
+        if self.embedding_store is not None:
+            self.embedding_store.append(
+                feed_id,
+                np.array([hop['start_time'] for hop in scored]),
+                np.array([hop['end_time'] for hop in scored]),
+                embeddings
+            )
+        if not heads:
+            return
+        probabilities = score_heads(heads, embeddings)
+        for hop, row, detections in zip(scored, probabilities, head_detections(heads, probabilities)):
+            hop['head_scores'] = row
+            for detection in detections:
+                detection['start_time'] = hop['start_time']
+                detection['end_time'] = hop['end_time']
+            hop['detections'].extend(detections)
+
+    def get_stats(self) -> Dict:
+        """Per-stream counters and batch statistics for the status endpoint."""
+        return {
+            "streams": {feed_id: stream.get_stats() for feed_id, stream in self._streams.items()},
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_inference_ms": self.last_inference_ms,
+            "heads": [head.name for head in self.heads],
+            "stored_embeddings": len(self.embedding_store) if self.embedding_store is not None else None,
+        }
@@ -0,0 +1,107 @@
+"""
+Chunked analysis of long audio files.
+Decodes a file block by block with soundfile, classifies it window by window
+with bounded memory, and returns a timeline of (start, end, class, score)
+segments instead of one score averaged over the whole clip.
+"""
+import numpy as np
+import soundfile as sf
+from typing import Dict, Iterator, List
+from streaming_resampler import StreamingResampler
+from streaming_classifier import StreamingYAMNetClassifier
+
+
+class TimelineBuilder:
+    def __init__(self, merge_gap: float = 0.0):
+        """
+        Merge per-hop detections into class segments.
+        Args:
+            merge_gap: Seconds between two detections of a class that still count as one segment
+        """
+        self.merge_gap = merge_gap
+        self._open: Dict[int, Dict] = {}  # class_index -> segment still being extended
+
+    def add(self, hop: Dict) -> List[Dict]:
+        """
+        Add one hop (from StreamingYAMNetClassifier) in time order.
+        Returns:
+            Segments that were closed by this hop
+        """
+        closed = []
+        # Close segments whose class was not seen within merge_gap
+        for class_index, segment in list(self._open.items()):
+            if hop['start_time'] - segment['end'] > self.merge_gap:
+                closed.append(self._open.pop(class_index))
+
+        for detection in hop['detections']:
+            segment = self._open.get(detection['class_index'])
+            if segment is None:
+                self._open[detection['class_index']] = {
+                    'start': hop['start_time'],
+                    'end': hop['end_time'],
+                    'class': detection['class'],
+                    'class_index': detection['class_index'],
+                    'score': detection['probability']
+                }
+            else:
+                segment['end'] = hop['end_time']
+                segment['score'] = max(segment['score'], detection['probability'])
+        return sorted(closed, key=lambda seg: seg['start'])
+
+    def finish(self) -> List[Dict]:
+        """Close all remaining segments."""
+        closed = sorted(self._open.values(), key=lambda seg: seg['start'])
+        self._open = {}
+        return closed
+
+
+def iter_timeline(detector, path: str, threshold: float = 0.3, top_k: int = 10, block_seconds: float = 30.0, merge_gap: float = 0.0) -> Iterator[Dict]:
+    """
+    Stream the timeline of an audio file, yielding segments as they close.
+    Memory stays bounded by one decode block, whatever the file length.
+    Args:
+        detector: YAMNetDetector used to score windows
+        path: Path to an audio file readable by soundfile
+        threshold: Minimum probability threshold
+        top_k: Maximum number of classes per hop
+        block_seconds: Seconds of audio decoded (and scored as one batch) at a time
+        merge_gap: Seconds between detections of a class that still count as one segment
+    Yields:
+        Segments with 'start' and 'end' (seconds from the file start), 'class',
+        'class_index' and 'score' (peak probability in the segment)
+    """
+    classifier = StreamingYAMNetClassifier(detector, threshold=threshold, top_k=top_k, start_time=0.0)
+    builder = TimelineBuilder(merge_gap=merge_gap)
+
+    with sf.SoundFile(path) as audio_file:
+        duration = audio_file.frames / audio_file.samplerate
+        resampler = StreamingResampler(audio_file.samplerate, detector.sample_rate)
+        blocksize = max(1, int(audio_file.samplerate * block_seconds))
+
+        for block in audio_file.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+            mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            for hop in classifier.push(resampler.process(mono)):
+                for segment in builder.add(hop):
+                    yield _clip(segment, duration)
+
+    for hop in classifier.flush():
+        for segment in builder.add(hop):
+            yield _clip(segment, duration)
+    for segment in builder.finish():
+        yield _clip(segment, duration)
+
+
+def analyze_file(detector, path: str, threshold: float = 0.3, top_k: int = 10, block_seconds: float = 30.0, merge_gap: float = 0.0) -> List[Dict]:
+    """
+    Timeline of an audio file, see iter_timeline().
+    Returns:
+        Segments sorted by start time
+    """
+    segments = list(iter_timeline(detector, path, threshold, top_k, block_seconds, merge_gap))
+    return sorted(segments, key=lambda seg: (seg['start'], -seg['score']))
+
+
+def _clip(segment: Dict, duration: float) -> Dict:
+    """The padded last window can reach past the end of the file."""
+    segment['end'] = min(segment['end'], duration)
+    return segment
@@ -0,0 +1,453 @@
+"""
+Batch sound classification over archived audio.
+Walks a directory (or reads a manifest of paths), decodes and resamples the
+files in a process pool, scores the windows of several files per model call
+and appends one result per file to a JSONL file or a Parquet dataset.
+Files already in the output are skipped, so an interrupted run can resume.
+
+Usage:
+    python batch_classify.py /data/archive --output results.jsonl
+    python batch_classify.py --manifest files.txt --output results.parquet --workers 8
+
+Each record has 'path', 'duration' (seconds), 'detections' (the
+SoundDetector.detect_sounds result for the file) and 'error'.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import soundfile as sf
+from streaming_resampler import StreamingResampler
+from embedding_store import EmbeddingStore
+
+# Optional Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3")
+
+
+def count_windows(num_samples: int, window: int, hop: int) -> int:
+    """Windows covering num_samples: the full ones plus a zero-padded one for the uncovered tail (as SlidingWindowBuffer.flush)."""
+    if num_samples <= 0:
+        return 0
+    if num_samples < window:
+        return 1
+    num_full = 1 + (num_samples - window) // hop
+    covered_end = (num_full - 1) * hop + window
+    return num_full + (1 if num_samples > covered_end else 0)
+
+
+def decode_segment(
+    path: str,
+    sample_rate: int,
+    window: int,
+    hop: int,
+    first_window: int = 0,
+    max_windows: Optional[int] = None,
+    block_seconds: float = 30.0
+) -> Tuple[str, int, Optional[np.ndarray], float, Optional[str]]:
+    """
+    Decode the windows of one segment of a file (runs in a worker process).
+    Only the audio under the segment's windows is decoded, so memory is bounded by
+    max_windows whatever the file length; segments resample exactly like the whole file.
+    Args:
+        path: Audio file readable by soundfile
+        sample_rate: Model sample rate
+        window: Window length in samples
+        hop: Distance between window starts in samples
+        first_window: Index of the segment's first window in the file
+        max_windows: Windows in the segment (None = up to the end of the file)
+        block_seconds: Seconds of audio decoded at a time
+    Returns:
+        (path, first_window, windows of shape (num_windows, window), duration in seconds, error message);
+        fewer than max_windows windows means the file ended in this segment
+    """
+    start = first_window * hop
+    stop = None if max_windows is None else start + (max_windows - 1) * hop + window
+    try:
+        with sf.SoundFile(path) as audio_file:
+            duration = audio_file.frames / audio_file.samplerate
+            resampler = StreamingResampler(audio_file.samplerate, sample_rate)
+            if resampler.passthrough:
+                input_start = start
+            else:
+                # A fresh resampler started on a multiple of its decimation factor, one filter length
+                # early, gives every output sample of the segment the same taps as a continuous pass
+                earliest = start * resampler.down // resampler.up - resampler.taps_per_phase
+                input_start = max(0, earliest // resampler.down * resampler.down)
+            output_start = input_start // resampler.down * resampler.up
+            parts, decoded = [], 0
+            if input_start < audio_file.frames:
+                audio_file.seek(input_start)
+                blocksize = max(1, int(audio_file.samplerate * block_seconds))
+                for block in audio_file.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+                    mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                    parts.append(resampler.process(mono))
+                    decoded += len(parts[-1])
+                    if stop is not None and output_start + decoded >= stop:
+                        break
+        waveform = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    except Exception as e:
+        return path, first_window, None, 0.0, str(e)
+
+    if stop is not None and output_start + decoded >= stop:
+        num_windows = max_windows
+    else:
+        # The file ended in this segment
+        num_windows = max(0, count_windows(output_start + decoded, window, hop) - first_window)
+        if max_windows is not None:
+            num_windows = min(num_windows, max_windows)
+    waveform = waveform[start - output_start:stop - output_start if stop is not None else None]
+    if num_windows == 0:
+        return path, first_window, np.zeros((0, window), dtype=np.float32), duration, None
+    padded = np.zeros((num_windows - 1) * hop + window, dtype=np.float32)
+    covered = min(len(waveform), len(padded))
+    padded[:covered] = waveform[:covered]
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)[::hop][:num_windows]
+    return path, first_window, np.ascontiguousarray(windows), duration, None
+
+
+def iter_windows(path: str, sample_rate: int, window: int, hop: int, segment_windows: int = 256, block_seconds: float = 30.0) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Windows of a file, decoded one segment at a time in this process.
+    Yields:
+        (index of the first window, windows of shape (num_windows, window)) per segment
+    Raises:
+        ValueError: The file could not be decoded
+    """
+    first_window = 0
+    while True:
+        _, _, windows, _, error = decode_segment(path, sample_rate, window, hop, first_window, segment_windows, block_seconds)
+        if error is not None:
+            raise ValueError(error)
+        if len(windows):
+            yield first_window, windows
+        if len(windows) < segment_windows:
+            return
+        first_window += len(windows)
+
+
+def plan_segments(path: str, sample_rate: int, window: int, hop: int, segment_windows: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Split a file into segments of segment_windows windows from its header.
+    Returns:
+        (first window, window count) per segment; the last one reads to the end of the file
+    """
+    try:
+        info = sf.info(path)
+        num_samples = -(-info.frames * sample_rate // int(info.samplerate))
+    except Exception:
+        return [(0, None)]  # The decode worker reports the error
+    num_windows = count_windows(num_samples, window, hop)
+    firsts = list(range(0, num_windows, segment_windows)) or [0]
+    return [(first, segment_windows) for first in firsts[:-1]] + [(firsts[-1], None)]
+
+
+def find_audio_files(directory: str, extensions=AUDIO_EXTENSIONS) -> List[str]:
+    """All audio files below a directory, sorted for a stable processing order."""
+    files = []
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.lower().endswith(extensions):
+                files.append(os.path.join(dirpath, filename))
+    return sorted(files)
+
+
+def read_manifest(manifest_path: str) -> List[str]:
+    """Paths listed one per line; relative paths are relative to the manifest."""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r') as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+
+class JsonlResultWriter:
+    def __init__(self, path: str):
+        """
+        Append results to a JSONL file, one line per file, flushed per record.
+        Args:
+            path: Output .jsonl file
+        """
+        self.path = path
+        self._file = None
+
+    def done_paths(self) -> Set[str]:
+        """Paths already classified without an error."""
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partial last line of an interrupted run
+                if not record.get('error'):
+                    done.add(record['path'])
+        return done
+
+    def write(self, record: Dict):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetResultWriter:
+    def __init__(self, path: str, row_group_size: int = 256):
+        """
+        Write results to a Parquet dataset directory, one complete part file per row group.
+        A Parquet file is only readable once its footer is written, so each group of records
+        goes to its own file, written under a temporary name and renamed when complete: every
+        finished group survives an interrupted run (even a hard kill); buffered records are redone.
+        Args:
+            path: Output directory (e.g. results.parquet)
+            row_group_size: Records buffered before a part file is written
+        """
+        if not PARQUET_AVAILABLE:
+            raise ValueError("Parquet output requires pyarrow (pip install pyarrow).")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ('path', pa.string()),
+            ('duration', pa.float64()),
+            ('detections', pa.string()),  # JSON, same content as the JSONL output
+            ('error', pa.string()),
+        ])
+        self._rows: List[Dict] = []
+        self._parts = 0
+
+    def done_paths(self) -> Set[str]:
+        """Paths already classified without an error."""
+        done = set()
+        for part in sorted(glob.glob(os.path.join(self.path, '*.parquet'))):
+            try:
+                table = pq.read_table(part, columns=['path', 'error'])
+            except Exception as e:
+                print(f"Skipping unreadable part {part}: {e}")
+                continue
+            for path, error in zip(table.column('path').to_pylist(), table.column('error').to_pylist()):
+                if not error:
+                    done.add(path)
+        return done
+
+    def write(self, record: Dict):
+        self._rows.append({**record, 'detections': json.dumps(record['detections'])})
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        part = os.path.join(self.path, f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._parts:05d}.parquet")
+        # Not *.parquet until complete, so done_paths never reads a partial file
+        temp_path = f"{part}.tmp"
+        pq.write_table(pa.Table.from_pylist(self._rows, schema=self.schema), temp_path)
+        os.replace(temp_path, part)
+        self._parts += 1
+        self._rows = []
+
+    def close(self):
+        self._flush()
+
+
+def classify_files(
+    sound_detector,
+    paths: List[str],
+    writer,
+    workers: Optional[int] = None,
+    batch_windows: int = 64,
+    threshold: Optional[float] = None,
+    block_seconds: float = 30.0,
+    embedding_store=None,
+    segment_windows: int = 256
+) -> Dict[str, int]:
+    """
+    Classify files with decoding in a process pool and batched model calls.
+    Files are decoded in segments of segment_windows windows and only a running score
+    sum is kept per file, so memory does not grow with file length.
+    Args:
+        sound_detector: SoundDetector using YAMNet
+        paths: Files to classify
+        writer: JsonlResultWriter or ParquetResultWriter
+        workers: Decode processes (defaults to the CPU count)
+        batch_windows: Windows collected (across files) before model calls of at most this many windows
+        threshold: Optional override for detection threshold
+        block_seconds: Seconds of audio decoded at a time per file
+        embedding_store: Optional EmbeddingStore the window embeddings of every file are appended to
+        segment_windows: Windows decoded per worker task (256 windows = about 2 minutes of audio)
+    Returns:
+        Counters 'files', 'errors' and 'windows'
+    """
+    from yamnet_detector import WINDOW_SAMPLES, HOP_SAMPLES
+
+    yamnet = sound_detector.yamnet_detector
+    stats = {'files': 0, 'errors': 0, 'windows': 0}
+    # path -> score sum, scored windows, duration, segments still to decode, windows still to score, error
+    files: Dict[str, Dict] = {}
+    pending: List[Tuple[str, int, np.ndarray]] = []
+
+    def score_pending():
+        if not pending:
+            return
+        batch = np.concatenate([windows for _, _, windows in pending])
+        score_parts, embedding_parts = [], []
+        for offset in range(0, len(batch), batch_windows):
+            if embedding_store is not None:
+                scores, embeddings = yamnet.score_windows(batch[offset:offset + batch_windows], return_embeddings=True)
+                embedding_parts.append(embeddings)
+            else:
+                scores = yamnet.score_windows(batch[offset:offset + batch_windows])
+            score_parts.append(scores)
+        scores = np.concatenate(score_parts)
+        embeddings = np.concatenate(embedding_parts) if embedding_parts else None
+        offset = 0
+        for path, first_window, windows in pending:
+            state = files[path]
+            window_scores = scores[offset:offset + len(windows)]
+            state['score_sum'] = window_scores.sum(axis=0, dtype=np.float64) + (state['score_sum'] if state['score_sum'] is not None else 0.0)
+            state['windows'] += len(windows)
+            state['unscored'] -= len(windows)
+            if embedding_store is not None:
+                start_times = (first_window + np.arange(len(windows))) * HOP_SAMPLES / yamnet.sample_rate
+                end_times = np.minimum(start_times + WINDOW_SAMPLES / yamnet.sample_rate, state['duration'])
+                embedding_store.append(os.path.abspath(path), start_times, end_times, embeddings[offset:offset + len(windows)])
+            offset += len(windows)
+        pending.clear()
+
+    def finish_files():
+        for path in [path for path, state in files.items() if state['segments'] == 0 and state['unscored'] == 0]:
+            state = files.pop(path)
+            if state['error'] is not None:
+                print(f"Error decoding {path}: {state['error']}")
+                writer.write({'path': path, 'duration': None, 'detections': [], 'error': state['error']})
+                stats['errors'] += 1
+                continue
+            mean_scores = (state['score_sum'] / state['windows'])[None, :].astype(np.float32) if state['windows'] else None
+            detections = sound_detector.detect_sounds_from_scores(mean_scores, threshold) if mean_scores is not None else []
+            writer.write({'path': path, 'duration': state['duration'], 'detections': detections, 'error': None})
+            stats['files'] += 1
+            stats['windows'] += state['windows']
+
+    def segments():
+        for path in paths:
+            plan = plan_segments(path, yamnet.sample_rate, WINDOW_SAMPLES, HOP_SAMPLES, segment_windows)
+            files[path] = {'score_sum': None, 'windows': 0, 'duration': 0.0, 'segments': len(plan), 'unscored': 0, 'error': None}
+            for first_window, max_windows in plan:
+                yield path, first_window, max_windows
+
+    # spawn: workers must not inherit the loaded model or its threads
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        decoded = _decode_in_order(pool, segments(), workers, yamnet.sample_rate, WINDOW_SAMPLES, HOP_SAMPLES, block_seconds)
+        for path, first_window, windows, duration, error in decoded:
+            state = files[path]
+            state['segments'] -= 1
+            if error is not None:
+                state['error'] = state['error'] or error
+            else:
+                state['duration'] = duration
+                if state['error'] is None and len(windows):
+                    state['unscored'] += len(windows)
+                    pending.append((path, first_window, windows))
+            if sum(len(windows) for _, _, windows in pending) >= batch_windows:
+                score_pending()
+            finish_files()
+        score_pending()
+        finish_files()
+    return stats
+
+
+def _decode_in_order(pool, segments: Iterator[Tuple[str, int, Optional[int]]], workers: int, sample_rate: int, window: int, hop: int, block_seconds: float) -> Iterator[Tuple]:
+    """Decode file segments in the pool, keeping at most 2 segments per worker in flight to bound memory."""
+    in_flight = []
+    for path, first_window, max_windows in segments:
+        in_flight.append(pool.submit(decode_segment, path, sample_rate, window, hop, first_window, max_windows, block_seconds))
+        if len(in_flight) >= 2 * workers:
+            yield in_flight.pop(0).result()
+    for future in in_flight:
+        yield future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a directory or manifest of audio files with YAMNet")
+    parser.add_argument("directory", nargs="?", help="Directory searched recursively for audio files")
+    parser.add_argument("--manifest", help="Text file with one audio path per line")
+    parser.add_argument("--output", required=True, help="Output .jsonl file or .parquet dataset directory")
+    parser.add_argument("--workers", type=int, default=None, help="Decode processes (default: CPU count)")
+    parser.add_argument("--batch-windows", type=int, default=64, help="Windows per model call")
+    parser.add_argument("--threshold", type=float, default=None, help="Detection threshold (default: 0.3)")
+    parser.add_argument("--block-seconds", type=float, default=30.0, help="Seconds decoded at a time per file")
+    parser.add_argument("--segment-windows", type=int, default=256, help="Windows decoded per worker task (bounds memory per file)")
+    parser.add_argument("--embedding-store", default=None, help="Also append the window embeddings to this EmbeddingStore directory")
+    parser.add_argument("--no-resume", action="store_true", help="Reclassify files already in the output")
+    parser.add_argument("--yamnet-backend", default=os.getenv("YAMNET_BACKEND", "tf"), help="tf or tflite")
+    parser.add_argument("--yamnet-tflite-path", default=os.getenv("YAMNET_TFLITE_PATH"), help="YAMNet .tflite model")
+    args = parser.parse_args()
+
+    if not args.directory and not args.manifest:
+        parser.error("Give a directory or --manifest")
+    paths = read_manifest(args.manifest) if args.manifest else find_audio_files(args.directory)
+
+    if args.output.endswith('.parquet'):
+        writer = ParquetResultWriter(args.output)
+    else:
+        writer = JsonlResultWriter(args.output)
+
+    if not args.no_resume:
+        done = writer.done_paths()
+        if done:
+            print(f"Resuming: skipping {len(done)} files already in {args.output}")
+        paths = [path for path in paths if path not in done]
+    print(f"Classifying {len(paths)} files")
+    if not paths:
+        return
+
+    # Imported here so decode workers never load TensorFlow or PyTorch
+    from sound_detector import SoundDetector
+    sound_detector = SoundDetector(
+        use_yamnet=True,
+        yamnet_backend=args.yamnet_backend,
+        yamnet_tflite_path=args.yamnet_tflite_path
+    )
+    if not sound_detector.use_yamnet:
+        raise ValueError("Batch classification requires YAMNet (tensorflow and tensorflow_hub).")
+
+    start = time.time()
+    try:
+        stats = classify_files(
+            sound_detector,
+            paths,
+            writer,
+            workers=args.workers,
+            batch_windows=args.batch_windows,
+            threshold=args.threshold,
+            block_seconds=args.block_seconds,
+            segment_windows=args.segment_windows,
+            embedding_store=EmbeddingStore(args.embedding_store) if args.embedding_store else None
+        )
+    finally:
+        writer.close()
+    elapsed = time.time() - start
+    print(f"Classified {stats['files']} files ({stats['windows']} windows, {stats['errors']} errors) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Offline text matcher from prompts or category names to YAMNet classes.
+All class names are indexed once as TF-IDF vectors over character trigrams
+and whole words (after light stemming), so "dogs barking" or "glass-break"
+still land on "Bark", "Dog" and "Glass". Typos are only partly tolerated: a
+misspelled word keeps some trigrams of the class name but may score below MIN_SCORE.
+Matching one phrase is a handful of row lookups and one small matrix-vector
+product: well under a millisecond, without any network call.
+"""
+import re
+import numpy as np
+from typing import Dict, List, Optional, Tuple, Union
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SEPARATORS = re.compile(r"[,;/|\n]+|\band\b|\bor\b")
+STOPWORDS = frozenset(
+    "a an the of in on at to for with from by is are be being when if me my i you any some "
+    "sound sounds noise noises detect detection alert alerts listen hear heard like".split()
+)
+WORD_WEIGHT = 2.0
+# Lowest cosine similarity that counts as a match (drops "gun shots" -> Machine gun); misspellings
+# such as "thundr" score around this cutoff and are not guaranteed to match
+MIN_SCORE = 0.35
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping so 'barking', 'barks' and 'bark' share features."""
+    for suffix in ("ing", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _features(text: str) -> Dict[str, float]:
+    """Feature counts of a text: 'w:<stem>' per word and word pair, and character trigrams of each padded stem."""
+    features: Dict[str, float] = {}
+    words = [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+    # Adjacent words also count joined, so "gun shots" meets "Gunshot" and "door bell" meets "Doorbell"
+    for first, second in zip(words, words[1:]):
+        joined = "w:" + _stem(first + second)
+        features[joined] = features.get(joined, 0.0) + WORD_WEIGHT
+    for word in words:
+        stem = _stem(word)
+        features["w:" + stem] = features.get("w:" + stem, 0.0) + WORD_WEIGHT
+        padded = f" {stem} "
+        for i in range(len(padded) - 2):
+            gram = padded[i:i + 3]
+            features[gram] = features.get(gram, 0.0) + 1.0
+    return features
+
+
+class ClassMatcher:
+    def __init__(self, class_names: Union[Dict[int, str], List[str]]):
+        """
+        Index class names for matching.
+        Args:
+            class_names: Class index -> name (as YAMNetDetector.class_names) or a list of names
+        """
+        if isinstance(class_names, dict):
+            class_names = [class_names.get(i, "") for i in range(max(class_names) + 1)] if class_names else []
+        self.class_names = list(class_names)
+        self._exact = {name.lower(): i for i, name in enumerate(self.class_names) if name}
+
+        docs = [_features(name) for name in self.class_names]
+        vocabulary: Dict[str, int] = {}
+        for doc in docs:
+            for feature in doc:
+                vocabulary.setdefault(feature, len(vocabulary))
+        self._vocabulary = vocabulary
+
+        # Inverse document frequency: features shared by many classes ("er ", "w:sound") count less
+        document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+        for doc in docs:
+            for feature in doc:
+                document_frequency[vocabulary[feature]] += 1
+        self._idf = np.log((1 + len(docs)) / (1 + document_frequency)) + 1.0
+        self._unknown_idf = float(np.log(1 + len(docs)) + 1.0)
+
+        # Feature x class matrix of L2-normalized TF-IDF class vectors; a query gathers only its own rows
+        matrix = np.zeros((len(vocabulary), len(docs)), dtype=np.float32)
+        for column, doc in enumerate(docs):
+            for feature, count in doc.items():
+                row = vocabulary[feature]
+                matrix[row, column] = count * self._idf[row]
+        norms = np.linalg.norm(matrix, axis=0)
+        self._matrix = matrix / np.where(norms > 0, norms, 1.0)
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of text to every class (0 for unmatched classes)."""
+        features = _features(text)
+        rows, weights, norm = [], [], 0.0
+        for feature, count in features.items():
+            row = self._vocabulary.get(feature)
+            # Features no class has still count in the norm: they are evidence against every class
+            weight = count * (self._idf[row] if row is not None else self._unknown_idf)
+            norm += weight * weight
+            if row is not None:
+                rows.append(row)
+                weights.append(weight)
+        if not rows:
+            return np.zeros(len(self.class_names), dtype=np.float32)
+        return np.asarray(weights, dtype=np.float32) @ self._matrix[rows] / np.sqrt(norm)
+
+    def match(self, text: str, top_k: int = 3, min_score: float = MIN_SCORE) -> List[Tuple[int, float]]:
+        """
+        Best classes for one phrase.
+        Args:
+            text: Phrase, e.g. a category name from the LLM
+            top_k: Maximum classes returned
+            min_score: Minimum cosine similarity
+        Returns:
+            List of (class index, score), best first; an exact (case-insensitive) name match
+            is returned alone with score 1.0
+        """
+        exact = self._exact.get(text.strip().lower())
+        if exact is not None:
+            return [(exact, 1.0)]
+        scores = self.scores(text)
+        if top_k < len(scores):
+            candidates = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in candidates if scores[i] >= min_score]
+
+    def match_all(self, phrases: List[str], top_k: int = 3, min_score: float = MIN_SCORE) -> List[int]:
+        """Sorted class indices matched by any phrase."""
+        indices = set()
+        for phrase in phrases:
+            indices.update(i for i, _ in self.match(phrase, top_k, min_score))
+        return sorted(indices)
+
+    def match_prompt(self, prompt: str, top_k: int = 3, min_score: float = MIN_SCORE) -> List[int]:
+        """Class indices for a free-text prompt, split into phrases at commas, 'and' and 'or'."""
+        phrases = [phrase for phrase in _SEPARATORS.split(prompt.lower()) if _WORD.search(phrase)]
+        return self.match_all(phrases, top_k, min_score)
+
+    def mask(self, phrases: Optional[List[str]], top_k: int = 3, min_score: float = MIN_SCORE) -> Optional[np.ndarray]:
+        """Boolean class mask for a list of category phrases (None for no phrases)."""
+        if not phrases:
+            return None
+        mask = np.zeros(len(self.class_names), dtype=bool)
+        mask[self.match_all(phrases, top_k, min_score)] = True
+        return mask
+
+    def names(self, indices: List[int]) -> List[str]:
+        return [self.class_names[i] for i in indices]
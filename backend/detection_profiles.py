@@ -0,0 +1,123 @@
+"""
+Per-feed detection profiles.
+Each dashboard feed has its own audio categories, YOLO class list and
+thresholds. Profiles are immutable and swapped per feed, so updating one
+feed's prompt replaces one dictionary entry: the audio worker and camera
+thread pick it up on their next hop or frame, and no other feed or model is
+touched.
+"""
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class DetectionProfile:
+    def __init__(
+        self,
+        feed_id: str,
+        detection_mode: Optional[str] = None,
+        prompt: Optional[str] = None,
+        audio_categories: Optional[List[str]] = None,
+        audio_threshold: Optional[float] = None,
+        video_classes: Optional[List[str]] = None,
+        video_threshold: Optional[float] = None,
+    ):
+        """
+        Detection settings of one feed; None fields fall back to the global defaults.
+        Args:
+            feed_id: Feed the profile applies to
+            detection_mode: Dashboard detection mode the prompt was given for
+            prompt: Prompt the profile was generated from
+            audio_categories: YAMNet category names (matched like the global categories)
+            audio_threshold: Minimum probability of audio detections
+            video_classes: YOLO class names to report
+            video_threshold: Minimum confidence of YOLO detections
+        """
+        self.feed_id = feed_id
+        self.detection_mode = detection_mode
+        self.prompt = prompt
+        self.audio_categories = list(audio_categories) if audio_categories else None
+        self.audio_threshold = audio_threshold
+        self.video_classes = frozenset(video_classes) if video_classes else None
+        self.video_threshold = video_threshold
+        self.updated_at = time.time()
+        self._audio_mask = None
+
+    def audio_mask(self, matcher) -> Optional[np.ndarray]:
+        """
+        Class mask of audio_categories, compiled on first use.
+        Args:
+            matcher: ClassMatcher of the YAMNet classes
+        Returns:
+            Boolean mask, or None to use the global filter
+        """
+        if self.audio_categories is None:
+            return None
+        if self._audio_mask is None:
+            self._audio_mask = matcher.mask(self.audio_categories)
+        return self._audio_mask
+
+    def accepts_video(self, class_name: str, confidence: float) -> bool:
+        """Whether a YOLO detection passes the class list and threshold."""
+        if self.video_classes is not None and class_name not in self.video_classes:
+            return False
+        return self.video_threshold is None or confidence >= self.video_threshold
+
+    def replace(self, **changes) -> "DetectionProfile":
+        """Copy with some fields changed."""
+        fields = self.to_dict()
+        for name in ("feed_id", "updated_at"):
+            fields.pop(name)
+        fields.update(changes)
+        return DetectionProfile(self.feed_id, **fields)
+
+    def to_dict(self) -> Dict:
+        return {
+            "feed_id": self.feed_id,
+            "detection_mode": self.detection_mode,
+            "prompt": self.prompt,
+            "audio_categories": self.audio_categories,
+            "audio_threshold": self.audio_threshold,
+            "video_classes": sorted(self.video_classes) if self.video_classes is not None else None,
+            "video_threshold": self.video_threshold,
+            "updated_at": self.updated_at,
+        }
+
+
+class DetectionProfileStore:
+    def __init__(self):
+        """In-memory detection profiles by feed id."""
+        # Replaced (never mutated) on update, so readers need no lock
+        self._profiles: Dict[str, DetectionProfile] = {}
+        self._lock = threading.Lock()
+
+    def get(self, feed_id: str) -> Optional[DetectionProfile]:
+        return self._profiles.get(feed_id)
+
+    def update(self, feed_id: str, **changes) -> DetectionProfile:
+        """
+        Change fields of a feed's profile (created if missing); other feeds are not touched.
+        Args:
+            feed_id: Feed to update
+            **changes: DetectionProfile fields to set
+        Returns:
+            The new profile
+        """
+        with self._lock:
+            old = self._profiles.get(feed_id)
+            profile = old.replace(**changes) if old else DetectionProfile(feed_id, **changes)
+            self._profiles = {**self._profiles, feed_id: profile}
+        return profile
+
+    def remove(self, feed_id: str) -> bool:
+        with self._lock:
+            if feed_id not in self._profiles:
+                return False
+            profiles = dict(self._profiles)
+            del profiles[feed_id]
+            self._profiles = profiles
+        return True
+
+    def all(self) -> List[DetectionProfile]:
+        return list(self._profiles.values())
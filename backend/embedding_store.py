@@ -0,0 +1,361 @@
+"""
+Persistent YAMNet embeddings and custom linear heads.
+Stores the 1024-d embedding of every scored window in append-only,
+memory-mapped files, and trains small per-category linear heads on them.
+A new sound category can then be searched for in historical audio with one
+matrix product over the stored embeddings, without running YAMNet again.
+
+Usage:
+    python embedding_store.py embed --store embeddings /data/archive/*.wav
+    python embedding_store.py train --store embeddings --name "dog whining" --positives whine1.wav whine2.wav --out heads/dog_whining.npz
+    python embedding_store.py search --store embeddings --head heads/dog_whining.npz --threshold 0.8
+"""
+import json
+import os
+import threading
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+EMBEDDING_DIM = 1024
+WINDOW_DTYPE = np.dtype([('source', '<i4'), ('start_time', '<f8'), ('end_time', '<f8')])
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, dim: int = EMBEDDING_DIM):
+        """
+        Open (or create) an embedding store directory.
+        Embeddings are kept as float16 rows in embeddings.f16, with one
+        (source, start_time, end_time) record per row in windows.bin.
+        Args:
+            root: Store directory
+            dim: Embedding size
+        """
+        self.root = root
+        self.dim = dim
+        self.embeddings_path = os.path.join(root, 'embeddings.f16')
+        self.windows_path = os.path.join(root, 'windows.bin')
+        self.sources_path = os.path.join(root, 'sources.json')
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sources: List[str] = []
+        if os.path.exists(self.sources_path):
+            with open(self.sources_path, 'r') as f:
+                self._sources = json.load(f)
+        self._source_ids = {name: i for i, name in enumerate(self._sources)}
+        self._repaired = False
+
+    @property
+    def sources(self) -> List[str]:
+        """Source names (feed ids or file paths) in id order."""
+        return list(self._sources)
+
+    def __len__(self) -> int:
+        if not os.path.exists(self.windows_path) or not os.path.exists(self.embeddings_path):
+            return 0
+        # Appends are not atomic across the two files, so count only complete rows of both
+        return min(
+            os.path.getsize(self.windows_path) // WINDOW_DTYPE.itemsize,
+            os.path.getsize(self.embeddings_path) // (2 * self.dim)
+        )
+
+    def _truncate(self, rows: int):
+        """Cut both files to rows complete rows, dropping the unmatched tail of an interrupted append."""
+        for path, row_size in ((self.embeddings_path, 2 * self.dim), (self.windows_path, WINDOW_DTYPE.itemsize)):
+            if os.path.exists(path) and os.path.getsize(path) > rows * row_size:
+                print(f"Truncating {path} to {rows} rows after an interrupted append")
+                os.truncate(path, rows * row_size)
+
+    def _source_id(self, source: str) -> int:
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = len(self._sources)
+            self._sources.append(source)
+            self._source_ids[source] = source_id
+            # Write and rename, so a crash never leaves a truncated source list behind
+            temp_path = f"{self.sources_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self._sources, f)
+            os.replace(temp_path, self.sources_path)
+        return source_id
+
+    def append(self, source: str, start_times: np.ndarray, end_times: np.ndarray, embeddings: np.ndarray):
+        """
+        Append the embeddings of consecutive windows of one source.
+        Args:
+            source: Feed id or file path the windows come from
+            start_times: Window start times (seconds: wall clock for feeds, file offset for files)
+            end_times: Window end times
+            embeddings: Array of shape (num_windows, dim)
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float16).reshape(-1, self.dim)
+        if len(embeddings) == 0:
+            return
+        with self._lock:
+            windows = np.empty(len(embeddings), dtype=WINDOW_DTYPE)
+            windows['source'] = self._source_id(source)
+            windows['start_time'] = start_times
+            windows['end_time'] = end_times
+            rows = len(self)
+            if not self._repaired:
+                # Once per writer, not on every open: readers must not cut a live writer's append
+                self._truncate(rows)
+                self._repaired = True
+            try:
+                with open(self.embeddings_path, 'ab') as f:
+                    f.write(embeddings.tobytes())
+                with open(self.windows_path, 'ab') as f:
+                    f.write(windows.tobytes())
+            except Exception:
+                # Keep the files row-aligned. A crash instead is repaired by the next writer's
+                # first append(); readers only ever see the shorter file's row count
+                self._truncate(rows)
+                raise
+
+    def open(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Memory-map the stored rows.
+        Returns:
+            (windows, embeddings): structured records and float16 array of shape (rows, dim)
+        """
+        rows = len(self)
+        if rows == 0:
+            return np.zeros(0, dtype=WINDOW_DTYPE), np.zeros((0, self.dim), dtype=np.float16)
+        windows = np.memmap(self.windows_path, dtype=WINDOW_DTYPE, mode='r', shape=(rows,))
+        embeddings = np.memmap(self.embeddings_path, dtype=np.float16, mode='r', shape=(rows, self.dim))
+        return windows, embeddings
+
+    def iter_chunks(self, chunk_rows: int = 65536, source: Optional[str] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Iterate over the store in chunks, so searches never load it whole.
+        Args:
+            chunk_rows: Rows per chunk
+            source: Only rows of this source
+        Yields:
+            (windows, embeddings as float32) per chunk
+        """
+        windows, embeddings = self.open()
+        source_id = self._source_ids.get(source) if source is not None else None
+        if source is not None and source_id is None:
+            return
+        for start in range(0, len(windows), chunk_rows):
+            chunk_windows = np.asarray(windows[start:start + chunk_rows])
+            chunk_embeddings = embeddings[start:start + chunk_rows]
+            if source_id is not None:
+                keep = chunk_windows['source'] == source_id
+                chunk_windows = chunk_windows[keep]
+                chunk_embeddings = chunk_embeddings[keep]
+            yield chunk_windows, np.asarray(chunk_embeddings, dtype=np.float32)
+
+    def sample(self, n: int, seed: int = 0) -> np.ndarray:
+        """
+        Random stored embeddings (e.g. as negatives for training a head).
+        Returns:
+            Float32 array of shape (min(n, rows), dim)
+        """
+        _, embeddings = self.open()
+        rows = len(embeddings)
+        indices = np.sort(np.random.default_rng(seed).choice(rows, size=min(n, rows), replace=False))
+        return np.asarray(embeddings[indices], dtype=np.float32)
+
+
+class LinearHead:
+    def __init__(self, name: str, weights: np.ndarray, bias: float, threshold: float = 0.5):
+        """
+        Logistic-regression head for one custom sound category.
+        Args:
+            name: Category name reported in detections
+            weights: Weight vector of shape (dim,)
+            bias: Bias term
+            threshold: Probability above which a window counts as a detection
+        """
+        self.name = name
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.threshold = threshold
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """Probability of the category for each embedding row."""
+        return _sigmoid(np.asarray(embeddings, dtype=np.float32) @ self.weights + self.bias)
+
+    @classmethod
+    def fit(
+        cls,
+        name: str,
+        positives: np.ndarray,
+        negatives: np.ndarray,
+        epochs: int = 300,
+        learning_rate: float = 0.5,
+        l2: float = 1e-3,
+        threshold: float = 0.5
+    ) -> 'LinearHead':
+        """
+        Train a head with full-batch gradient descent on class-balanced logistic loss.
+        Args:
+            name: Category name
+            positives: Embeddings of windows containing the sound
+            negatives: Embeddings of windows without it
+            epochs: Gradient steps
+            learning_rate: Step size
+            l2: Weight decay
+            threshold: Detection threshold stored with the head
+        Returns:
+            The trained head
+        """
+        if len(positives) == 0 or len(negatives) == 0:
+            raise ValueError("Training a head needs positive and negative examples.")
+        features = np.vstack([positives, negatives]).astype(np.float32)
+        labels = np.concatenate([np.ones(len(positives)), np.zeros(len(negatives))]).astype(np.float32)
+        # Each class contributes half of the loss, however few positives there are
+        sample_weights = np.where(labels == 1, 0.5 / len(positives), 0.5 / len(negatives)).astype(np.float32)
+
+        weights = np.zeros(features.shape[1], dtype=np.float32)
+        bias = 0.0
+        for _ in range(epochs):
+            error = (_sigmoid(features @ weights + bias) - labels) * sample_weights
+            weights -= learning_rate * (features.T @ error + l2 * weights)
+            bias -= learning_rate * float(error.sum())
+        return cls(name, weights, bias, threshold)
+
+    def save(self, path: str):
+        """Write the head to an .npz file."""
+        np.savez(path, name=self.name, weights=self.weights, bias=self.bias, threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearHead':
+        """Read a head written by save()."""
+        data = np.load(path)
+        return cls(str(data['name']), data['weights'], float(data['bias']), float(data['threshold']))
+
+
+def load_heads(directory: str) -> List[LinearHead]:
+    """All heads (*.npz) in a directory, sorted by file name."""
+    if not directory or not os.path.isdir(directory):
+        return []
+    return [
+        LinearHead.load(os.path.join(directory, filename))
+        for filename in sorted(os.listdir(directory))
+        if filename.endswith('.npz')
+    ]
+
+
+def score_heads(heads: List[LinearHead], embeddings: np.ndarray) -> np.ndarray:
+    """
+    Score several heads in one matrix product.
+    Args:
+        heads: Heads to evaluate
+        embeddings: Array of shape (num_windows, dim)
+    Returns:
+        Probabilities of shape (num_windows, num_heads)
+    """
+    weights = np.stack([head.weights for head in heads], axis=1)
+    biases = np.array([head.bias for head in heads], dtype=np.float32)
+    return _sigmoid(np.asarray(embeddings, dtype=np.float32) @ weights + biases)
+
+
+def head_detections(heads: List[LinearHead], probabilities: np.ndarray) -> List[List[Dict]]:
+    """
+    Detections of custom heads, in the YAMNet result format.
+    Args:
+        heads: Heads that were evaluated
+        probabilities: Output of score_heads(), shape (num_windows, num_heads)
+    Returns:
+        One list of {'class', 'probability', 'class_index': None} per window
+    """
+    thresholds = np.array([head.threshold for head in heads])
+    return [
+        [
+            {'class': heads[i].name, 'probability': float(row[i]), 'class_index': None}
+            for i in np.flatnonzero(row > thresholds)
+        ]
+        for row in probabilities
+    ]
+
+
+def search(store: EmbeddingStore, head: LinearHead, threshold: Optional[float] = None, source: Optional[str] = None) -> List[Dict]:
+    """
+    Find windows of stored audio where a head fires.
+    Args:
+        store: Embedding store to search
+        head: Head to evaluate
+        threshold: Override for the head's threshold
+        source: Only search this source
+    Returns:
+        Hits with 'source', 'start_time', 'end_time' and 'probability', in store order
+    """
+    threshold = head.threshold if threshold is None else threshold
+    sources = store.sources
+    hits = []
+    for windows, embeddings in store.iter_chunks(source=source):
+        probabilities = head.predict_proba(embeddings)
+        for i in np.flatnonzero(probabilities > threshold):
+            hits.append({
+                'source': sources[windows[i]['source']],
+                'start_time': float(windows[i]['start_time']),
+                'end_time': float(windows[i]['end_time']),
+                'probability': float(probabilities[i])
+            })
+    return hits
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+
+def _embed_files(detector, paths: List[str]) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+    """YAMNet embeddings of each file's windows, a segment at a time: yields (path, start_times, embeddings)."""
+    from batch_classify import iter_windows
+    from yamnet_detector import WINDOW_SAMPLES, HOP_SAMPLES
+
+    for path in paths:
+        try:
+            for first_window, windows in iter_windows(path, detector.sample_rate, WINDOW_SAMPLES, HOP_SAMPLES):
+                _, embeddings = detector.score_windows(windows, return_embeddings=True)
+                start_times = (first_window + np.arange(len(windows))) * HOP_SAMPLES / detector.sample_rate
+                yield path, start_times, embeddings
+        except ValueError as e:
+            print(f"Skipping {path}: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="YAMNet embedding store and custom category heads")
+    parser.add_argument("--store", default=os.getenv("EMBEDDING_STORE_DIR", "embeddings"), help="Store directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    embed_parser = subparsers.add_parser("embed", help="Run YAMNet over audio files and store their embeddings")
+    embed_parser.add_argument("files", nargs="+")
+    train_parser = subparsers.add_parser("train", help="Train a head from example clips")
+    train_parser.add_argument("--name", required=True, help="Category name")
+    train_parser.add_argument("--positives", nargs="+", required=True, help="Clips containing the sound")
+    train_parser.add_argument("--negatives", nargs="*", default=[], help="Clips without it (default: random stored windows)")
+    train_parser.add_argument("--num-negatives", type=int, default=2000, help="Stored windows sampled as negatives")
+    train_parser.add_argument("--threshold", type=float, default=0.5)
+    train_parser.add_argument("--out", required=True, help="Output .npz")
+    search_parser = subparsers.add_parser("search", help="Find stored windows where a head fires")
+    search_parser.add_argument("--head", required=True, help="Head .npz")
+    search_parser.add_argument("--threshold", type=float, default=None)
+    search_parser.add_argument("--source", default=None, help="Only search this source")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.command == "search":
+        for hit in search(store, LinearHead.load(args.head), args.threshold, args.source):
+            print(json.dumps(hit))
+    else:
+        from yamnet_detector import YAMNetDetector, WINDOW_SAMPLES
+        detector = YAMNetDetector()
+        window_seconds = WINDOW_SAMPLES / detector.sample_rate
+        if args.command == "embed":
+            for path, start_times, embeddings in _embed_files(detector, args.files):
+                store.append(os.path.abspath(path), start_times, start_times + window_seconds, embeddings)
+                print(f"{path}: {len(embeddings)} windows")
+        else:
+            positives = np.vstack([e for _, _, e in _embed_files(detector, args.positives)])
+            if args.negatives:
+                negatives = np.vstack([e for _, _, e in _embed_files(detector, args.negatives)])
+            else:
+                negatives = store.sample(args.num_negatives)
+            head = LinearHead.fit(args.name, positives, negatives, threshold=args.threshold)
+            head.save(args.out)
+            train_accuracy = np.mean(np.concatenate([head.predict_proba(positives) > 0.5, head.predict_proba(negatives) <= 0.5]))
+            print(f"Saved head '{args.name}' to {args.out} ({len(positives)} positive, {len(negatives)} negative windows, train accuracy {train_accuracy:.3f})")
@@ -0,0 +1,140 @@
+"""
+Asynchronous event dispatch to the WebSocket server.
+Producers (audio worker, camera thread) publish events into a bounded queue
+without blocking; one dispatcher thread batches the queued events per flush
+interval and POSTs each batch over a pooled keep-alive connection, retrying
+failed batches with backoff and counting what had to be dropped.
+"""
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, List
+
+
+class EventBus:
+    def __init__(
+        self,
+        url: str,
+        max_queue: int = 1000,
+        flush_interval: float = 0.1,
+        max_batch: int = 100,
+        max_retries: int = 3,
+        timeout: float = 2.0,
+    ):
+        """
+        Event bus posting batches of events to an HTTP endpoint.
+        Args:
+            url: Endpoint receiving a JSON list of events per request
+            max_queue: Events buffered before new events are dropped
+            flush_interval: Seconds the dispatcher waits to fill a batch
+            max_batch: Maximum events per request
+            max_retries: Attempts per batch after the first before it is dropped
+            timeout: Request timeout in seconds
+        """
+        self.url = url
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue)
+
+        self._session = requests.Session()
+        self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self._stop = threading.Event()
+        self._worker = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped_full = 0
+        self.dropped_failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.last_error = None
+
+    def publish(self, event: Dict) -> bool:
+        """
+        Queue an event without blocking.
+        Args:
+            event: JSON-serializable event
+        Returns:
+            False if the queue was full and the event was dropped
+        """
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped_full += 1
+            return False
+        self.published += 1
+        return True
+
+    def start(self):
+        """Start the dispatcher thread."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the dispatcher after it delivered what is queued (or timeout passed)."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+
+    def _next_batch(self) -> List[Dict]:
+        """Wait for the first event, then collect more until flush_interval or max_batch."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: List[Dict]):
+        backoff = 0.2
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._session.post(self.url, json=batch, timeout=self.timeout)
+                response.raise_for_status()
+                self.delivered += len(batch)
+                self.batches += 1
+                return
+            except requests.exceptions.RequestException as e:
+                self.last_error = str(e)
+                if attempt == self.max_retries or self._stop.is_set():
+                    break
+                self.retries += 1
+                time.sleep(backoff)
+                backoff *= 2
+        self.dropped_failed += len(batch)
+        print(f"Dropped {len(batch)} events after failed delivery to {self.url}: {self.last_error}")
+
+    def get_stats(self) -> Dict:
+        """Queue and delivery counters for the status endpoint."""
+        return {
+            "queued": self._queue.qsize(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped_queue_full": self.dropped_full,
+            "dropped_failed": self.dropped_failed,
+            "last_error": self.last_error,
+        }
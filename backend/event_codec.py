@@ -0,0 +1,202 @@
+"""
+Wire formats for detection events sent over WebSocket.
+A client picks its format when it connects:
+  json    one JSON text message per event (the original format)
+  batch   events coalesced over a short window into one JSON array per message
+  packed  coalesced events in one binary message; keys and low-cardinality
+          values (class names, feed ids, types) are sent once per connection
+          and referenced by index afterwards
+The dashboard WebSocket server keeps its own copy (Frontend/event_protocol.py);
+change the two together.
+"""
+import asyncio
+import json
+import struct
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+FORMATS = ("json", "batch", "packed")
+DEFAULT_COALESCE_MS = 50
+MAX_COALESCE_MS = 1000
+
+PACKED_VERSION = 1
+# Header flag: the client must clear its string table before reading the frame
+FLAG_RESET = 1
+# Values of these fields repeat across events and are interned
+INTERNED_FIELDS = frozenset(("event", "feedId", "type", "class", "state"))
+MAX_STRINGS = 65535
+TAG_STRING_ID, TAG_NUMBER, TAG_NULL, TAG_TRUE, TAG_FALSE, TAG_STRING, TAG_JSON = range(7)
+
+
+def parse_transport(format: Optional[str], coalesce_ms: Optional[str]) -> Tuple[str, float]:
+    """
+    Validate the transport a client asked for.
+    Args:
+        format: One of FORMATS (None = "json")
+        coalesce_ms: Coalescing window in milliseconds (None = default; ignored for "json")
+    Returns:
+        Tuple (format, coalescing window in seconds)
+    """
+    format = format or "json"
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}")
+    if format == "json":
+        return format, 0.0
+    window = DEFAULT_COALESCE_MS if coalesce_ms in (None, "") else float(coalesce_ms)
+    if not 0 <= window <= MAX_COALESCE_MS:
+        raise ValueError(f"coalesce_ms must be between 0 and {MAX_COALESCE_MS}")
+    return format, window / 1000.0
+
+
+async def collect_batch(queue: asyncio.Queue, window: float, max_items: int = 500) -> List:
+    """
+    Wait for one queue item, then keep collecting for up to window seconds.
+    Args:
+        queue: Queue to read from
+        window: Coalescing window in seconds (0 = whatever is already queued)
+        max_items: Items per batch
+    Returns:
+        List of at least one item
+    """
+    batch = [await queue.get()]
+    deadline = time.monotonic() + window
+    while len(batch) < max_items:
+        if not queue.empty():
+            batch.append(queue.get_nowait())
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+class EventEncoder:
+    def __init__(self, format: str = "json"):
+        """
+        Encoder for one connection (packed keeps a per-connection string table).
+        Args:
+            format: One of FORMATS
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}")
+        self.format = format
+        self._strings: Dict[str, int] = {}
+
+    def encode(self, events: List[Dict]) -> List[Union[str, bytes]]:
+        """
+        Encode a batch of events.
+        Args:
+            events: JSON-serializable events
+        Returns:
+            Messages to send (text for json/batch, binary for packed)
+        """
+        if self.format == "json":
+            return [json.dumps(event) for event in events]
+        if self.format == "batch":
+            return [json.dumps(events)]
+        return [self._encode_packed(events)]
+
+    def _intern(self, value: str, new_strings: List[str]) -> int:
+        index = self._strings.get(value)
+        if index is None:
+            index = len(self._strings)
+            self._strings[value] = index
+            new_strings.append(value)
+        return index
+
+    def _encode_packed(self, events: List[Dict]) -> bytes:
+        """
+        Frame layout (little endian):
+            uint8 version, uint8 flags,
+            uint16 new string count, per string: uint16 byte length + UTF-8,
+            uint16 event count, per event: uint8 field count, per field:
+                uint16 key string id, uint8 tag, value by tag
+                (string id: uint16, number: float64, string/json: uint16 length + UTF-8)
+        """
+        flags = 0
+        # Reset instead of overflowing the uint16 ids; a frame adds at most a few strings per event
+        if len(self._strings) + 8 * len(events) > MAX_STRINGS:
+            self._strings = {}
+            flags |= FLAG_RESET
+        new_strings: List[str] = []
+        body = bytearray(struct.pack('<H', len(events)))
+        for event in events:
+            items = list(event.items())[:255]
+            body += struct.pack('<B', len(items))
+            for key, value in items:
+                body += struct.pack('<H', self._intern(str(key), new_strings))
+                if value is None:
+                    body += struct.pack('<B', TAG_NULL)
+                elif value is True or value is False:
+                    body += struct.pack('<B', TAG_TRUE if value else TAG_FALSE)
+                elif isinstance(value, (int, float)):
+                    body += struct.pack('<Bd', TAG_NUMBER, value)
+                elif isinstance(value, str) and key in INTERNED_FIELDS:
+                    body += struct.pack('<BH', TAG_STRING_ID, self._intern(value, new_strings))
+                else:
+                    tag = TAG_STRING if isinstance(value, str) else TAG_JSON
+                    data = (value if tag == TAG_STRING else json.dumps(value)).encode('utf-8')
+                    body += struct.pack('<BH', tag, len(data)) + data
+
+        header = bytearray(struct.pack('<BBH', PACKED_VERSION, flags, len(new_strings)))
+        for string in new_strings:
+            data = string.encode('utf-8')
+            header += struct.pack('<H', len(data)) + data
+        return bytes(header + body)
+
+
+def decode_packed(frame: bytes, strings: List[str]) -> List[Dict]:
+    """
+    Decode a packed frame (reference implementation of the dashboard's decoder).
+    Args:
+        frame: Binary message
+        strings: The connection's string table, updated in place
+    Returns:
+        List of events
+    """
+    version, flags, count = struct.unpack_from('<BBH', frame, 0)
+    if version != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed version {version}")
+    if flags & FLAG_RESET:
+        strings.clear()
+    offset = 4
+
+    def read_string():
+        nonlocal offset
+        (length,) = struct.unpack_from('<H', frame, offset)
+        value = frame[offset + 2:offset + 2 + length].decode('utf-8')
+        offset += 2 + length
+        return value
+
+    for _ in range(count):
+        strings.append(read_string())
+    (num_events,) = struct.unpack_from('<H', frame, offset)
+    offset += 2
+    events = []
+    for _ in range(num_events):
+        num_fields = frame[offset]
+        offset += 1
+        event = {}
+        for _ in range(num_fields):
+            key_id, tag = struct.unpack_from('<HB', frame, offset)
+            offset += 3
+            if tag == TAG_STRING_ID:
+                (index,) = struct.unpack_from('<H', frame, offset)
+                offset += 2
+                value = strings[index]
+            elif tag == TAG_NUMBER:
+                (value,) = struct.unpack_from('<d', frame, offset)
+                offset += 8
+            elif tag in (TAG_NULL, TAG_TRUE, TAG_FALSE):
+                value = {TAG_NULL: None, TAG_TRUE: True, TAG_FALSE: False}[tag]
+            elif tag == TAG_STRING:
+                value = read_string()
+            else:
+                value = json.loads(read_string())
+            event[strings[key_id]] = value
+        events.append(event)
+    return events
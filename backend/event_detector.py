@@ -0,0 +1,207 @@
+"""
+Temporal smoothing and hysteresis for audio and video events.
+Turns per-hop class scores into sound events with a start and an end, using
+one vectorized state machine over all classes: exponential score smoothing,
+separate onset and offset thresholds and a minimum event duration.
+PresenceEventDetector does the same for YOLO classes seen per frame, so a
+detection flickering across frames does not flood notifications.
+"""
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class HysteresisEventDetector:
+    _STATE = (
+        ('_smoothed', np.float64),
+        ('_onset_time', np.float64),
+        ('_run_start', np.float64),
+        ('_run', bool),
+        ('_last_above_end', np.float64),
+        ('_peak', np.float64),
+        ('_active', bool),
+        ('_reported', bool),
+    )
+
+    def __init__(
+        self,
+        onset_threshold: float = 0.3,
+        offset_threshold: float = 0.15,
+        smoothing: float = 0.5,
+        min_duration: float = 0.4,
+    ):
+        """
+        Event state machine for one stream.
+        Args:
+            onset_threshold: Smoothed score at which an event starts
+            offset_threshold: Smoothed score below which it ends (lower than onset_threshold)
+            smoothing: Weight of the newest hop in the exponential moving average (1 = no smoothing)
+            min_duration: Seconds the raw (unsmoothed) score must stay above the offset threshold,
+                from a hop above onset_threshold, before an event is reported
+                (0.4 = two consecutive 0.48 s hops, so a single loud hop is never an event)
+        """
+        if offset_threshold > onset_threshold:
+            raise ValueError("offset_threshold must not be above onset_threshold")
+        self.onset_threshold = onset_threshold
+        self.offset_threshold = offset_threshold
+        self.smoothing = smoothing
+        self.min_duration = min_duration
+        self.reset()
+        self.events_started = 0
+        self.events_suppressed = 0
+
+    def _resize(self, num_classes: int):
+        """Allocate state for num_classes, keeping the state of classes that already existed."""
+        for name, dtype in self._STATE:
+            values = np.zeros(num_classes, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                keep = min(len(old), num_classes)
+                values[:keep] = old[:keep]
+            setattr(self, name, values)
+
+    def reset(self):
+        """Forget all state (e.g. after capture was paused); open events are dropped."""
+        for name, _ in self._STATE:
+            setattr(self, name, None)
+        self._resize(0)
+
+    def update(self, start_time: float, end_time: float, scores: Optional[np.ndarray], names: List[str], mask: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Advance the state machine by one hop.
+        Args:
+            start_time: Hop window start (seconds)
+            end_time: Hop window end (seconds)
+            scores: Per-class scores of the hop, or None if it was not scored (counts as silence)
+            names: Class name of each score column
+            mask: Optional boolean mask of the classes that may start events
+        Returns:
+            Events that started or ended in this hop, each with 'class', 'class_index',
+            'state' ("start" or "end"), 'start_time', 'end_time' (None while open) and
+            'probability' (peak smoothed score)
+        """
+        if len(names) != len(self._smoothed):
+            self._resize(len(names))
+        scores = np.zeros(len(names), dtype=np.float32) if scores is None else np.asarray(scores, dtype=np.float32)
+
+        self._smoothed += self.smoothing * (scores - self._smoothed)
+        smoothed = self._smoothed
+
+        above_offset = smoothed >= self.offset_threshold
+        onset = ~self._active & (smoothed >= self.onset_threshold)
+        if mask is not None:
+            onset &= mask
+        self._active |= onset
+        self._onset_time[onset] = start_time
+        self._peak[onset] = 0.0
+
+        active = self._active
+        self._peak[active] = np.maximum(self._peak[active], smoothed[active])
+        self._last_above_end[active & above_offset] = end_time
+
+        # Runs of consecutive raw hops: begun above the onset threshold, held above the offset threshold.
+        # Smoothing stretches a single spike over several hops, so duration is measured on raw scores
+        run_begins = ~self._run & (scores >= self.onset_threshold)
+        self._run_start[run_begins] = start_time
+        self._run = run_begins | (self._run & (scores >= self.offset_threshold))
+
+        # Report events once their run has lasted min_duration (windows overlap, so measure between hop starts)
+        started = active & ~self._reported & self._run & (start_time - self._run_start >= self.min_duration)
+        ended = active & ~above_offset
+        self.events_suppressed += int(np.count_nonzero(ended & ~self._reported & ~started))
+
+        events = []
+        for i in np.flatnonzero(started):
+            events.append(self._event(i, names, "start", None))
+        for i in np.flatnonzero(ended & (self._reported | started)):
+            events.append(self._event(i, names, "end", float(self._last_above_end[i])))
+
+        self.events_started += int(np.count_nonzero(started))
+        self._reported |= started
+        self._active &= ~ended
+        self._reported &= ~ended
+        return events
+
+    def _event(self, i: int, names: List[str], state: str, end_time: Optional[float]) -> Dict:
+        return {
+            'class': names[i],
+            'class_index': int(i),
+            'state': state,
+            'start_time': float(self._onset_time[i]),
+            'end_time': end_time,
+            'probability': float(self._peak[i]),
+        }
+
+    def get_stats(self) -> Dict:
+        """Event counters and currently open events."""
+        return {
+            "events_started": self.events_started,
+            "events_suppressed": self.events_suppressed,
+            "open_events": int(np.count_nonzero(self._active & self._reported)),
+        }
+
+
+class PresenceEventDetector:
+    def __init__(self, min_frames: int = 3, end_grace: float = 1.0):
+        """
+        Appear / disappear events of classes detected per video frame.
+        Args:
+            min_frames: Consecutive frames a class must be seen in before its event starts
+            end_grace: Seconds a started class may be missing before its event ends
+        """
+        self.min_frames = max(1, min_frames)
+        self.end_grace = end_grace
+        # class -> [first seen, last seen, consecutive frames, peak confidence, reported]
+        self._tracks: Dict[str, list] = {}
+        self.events_started = 0
+        self.events_suppressed = 0
+
+    def update(self, now: float, confidences: Dict[str, float]) -> List[Dict]:
+        """
+        Advance by one frame.
+        Args:
+            now: Frame time (seconds)
+            confidences: Best confidence of each class detected in the frame
+        Returns:
+            Events that started or ended in this frame, shaped like HysteresisEventDetector events
+            (without 'class_index'); an event ends at the last frame its class was seen in
+        """
+        events = []
+        for class_name, confidence in confidences.items():
+            track = self._tracks.get(class_name)
+            if track is None:
+                track = self._tracks[class_name] = [now, now, 0, 0.0, False]
+            track[1] = now
+            track[2] += 1
+            track[3] = max(track[3], confidence)
+            if not track[4] and track[2] >= self.min_frames:
+                track[4] = True
+                self.events_started += 1
+                events.append(self._event(class_name, track, "start", None))
+
+        for class_name in [name for name in self._tracks if name not in confidences]:
+            track = self._tracks[class_name]
+            if not track[4]:
+                # Candidates must be seen in consecutive frames
+                del self._tracks[class_name]
+                self.events_suppressed += 1
+            elif now - track[1] > self.end_grace:
+                del self._tracks[class_name]
+                events.append(self._event(class_name, track, "end", track[1]))
+        return events
+
+    def _event(self, class_name: str, track: list, state: str, end_time: Optional[float]) -> Dict:
+        return {
+            'class': class_name,
+            'state': state,
+            'start_time': track[0],
+            'end_time': end_time,
+            'probability': track[3],
+        }
+
+    def get_stats(self) -> Dict:
+        """Event counters and currently open events."""
+        return {
+            "events_started": self.events_started,
+            "events_suppressed": self.events_suppressed,
+            "open_events": sum(1 for track in self._tracks.values() if track[4]),
+        }
@@ -0,0 +1,151 @@
+"""
+In-process publish/subscribe hub for detection events.
+Producers on any thread publish events to topics ("<type>/<feedId>", e.g.
+"audio/3" or "video/1"); WebSocket subscribers in the FastAPI event loop
+receive them directly, without a second process or HTTP hop in between.
+Every event gets a sequence number and the latest events are kept in a ring
+buffer, so a reconnecting client can resume from the last number it saw.
+"""
+import asyncio
+import itertools
+import threading
+from collections import deque
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional
+
+
+def event_topic(event: Dict) -> str:
+    """Topic of a detection event: '<type>/<feedId>'."""
+    return f"{event.get('type', 'unknown')}/{event.get('feedId', '')}"
+
+
+class EventHistory:
+    def __init__(self, size: int = 1000):
+        """
+        Sequence numbers and a ring buffer of the latest events (not thread-safe; callers lock).
+        Args:
+            size: Events kept for replay
+        """
+        self.events = deque(maxlen=size)
+        self.latest = 0
+
+    def append(self, event: Dict) -> Dict:
+        """Number an event; returns a copy with its 'seq' field."""
+        self.latest += 1
+        event = {**event, "seq": self.latest}
+        self.events.append(event)
+        return event
+
+    def since(self, seq: int) -> List[Dict]:
+        """
+        Buffered events after seq, oldest first.
+        Events older than the buffer are gone; a seq from before a restart
+        (above the latest number) replays the whole buffer.
+        """
+        if seq > self.latest:
+            seq = 0
+        first = self.latest - len(self.events) + 1
+        return list(itertools.islice(self.events, max(seq + 1 - first, 0), None))
+
+
+class Subscription:
+    def __init__(self, patterns: List[str], max_queue: int = 256):
+        """
+        One subscriber's topic filter and delivery queue.
+        Args:
+            patterns: Topic patterns (fnmatch, e.g. 'audio/*', 'video/1', '*')
+            max_queue: Events buffered for this subscriber before new ones are dropped
+        """
+        self.patterns = [pattern.strip() for pattern in patterns if pattern.strip()] or ['*']
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.delivered = 0
+        self.dropped = 0
+        # Messages sent to the client; fewer than delivered when events are coalesced
+        self.frames = 0
+        # Buffered events the client missed, to be sent before anything from the queue
+        self.backfill: List[Dict] = []
+
+    def matches(self, topic: str) -> bool:
+        return any(fnmatchcase(topic, pattern) for pattern in self.patterns)
+
+
+class TopicBroker:
+    def __init__(self, max_queue: int = 256, history_size: int = 1000):
+        """
+        Topic broker bridging producer threads and asyncio subscribers.
+        Args:
+            max_queue: Per-subscriber queue size
+            history_size: Events kept for replay to reconnecting subscribers
+        """
+        self.max_queue = max_queue
+        self.history = EventHistory(history_size)
+        # Replaced (never mutated) on subscribe/unsubscribe, so publishers iterate a snapshot
+        self._subscriptions = ()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Bind the broker to the event loop its subscribers run in."""
+        self._loop = loop
+
+    def subscribe(self, patterns: List[str], since: Optional[int] = None) -> Subscription:
+        """
+        Create a subscription (call from the event loop).
+        Args:
+            patterns: Topic patterns
+            since: Last sequence number the client received; buffered events after it
+                are put in subscription.backfill
+        """
+        subscription = Subscription(patterns, self.max_queue)
+        # Under the publish lock, every event is either in the backfill or delivered live, never both
+        with self._lock:
+            if since is not None:
+                subscription.backfill = [e for e in self.history.since(since) if subscription.matches(event_topic(e))]
+            self._subscriptions = self._subscriptions + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not subscription)
+
+    def publish(self, event: Dict, topic: Optional[str] = None):
+        """
+        Publish an event from any thread; never blocks.
+        Args:
+            event: JSON-serializable event (a copy with a 'seq' field is delivered)
+            topic: Topic to publish on (defaults to event_topic(event))
+        """
+        topic = topic or event_topic(event)
+        loop = self._loop
+        # Numbering and scheduling under one lock keeps deliveries in sequence order
+        with self._lock:
+            event = self.history.append(event)
+            self.published += 1
+            if loop is None or loop.is_closed():
+                return
+            targets = [s for s in self._subscriptions if s.matches(topic)]
+            if targets:
+                loop.call_soon_threadsafe(self._deliver, targets, event)
+
+    @staticmethod
+    def _deliver(targets: List[Subscription], event: Dict):
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(event)
+                subscription.delivered += 1
+            except asyncio.QueueFull:
+                subscription.dropped += 1
+
+    def get_stats(self) -> Dict:
+        """Subscriber counts and delivery counters."""
+        subscriptions = self._subscriptions
+        return {
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "latest_seq": self.history.latest,
+            "replay_buffer": len(self.history.events),
+            "delivered": sum(s.delivered for s in subscriptions),
+            "frames": sum(s.frames for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
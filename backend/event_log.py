@@ -0,0 +1,253 @@
+"""
+Durable event history in a local SQLite database (WAL mode).
+Producers append events without blocking; a writer thread commits them in
+batches, one transaction per flush. An event is one row from its start to its
+end: "end" events fill in end_time of the row their "start" created.
+Indexes on time, feed and class keep history queries (e.g. every Glass event
+on feed 3 in the last week) to an index range scan; results are paginated
+with a (time, id) cursor.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    end_time REAL,
+    feed_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    class TEXT NOT NULL COLLATE NOCASE,
+    probability REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (time);
+CREATE INDEX IF NOT EXISTS idx_events_feed_time ON events (feed_id, time);
+CREATE INDEX IF NOT EXISTS idx_events_class_time ON events (class, time);
+CREATE INDEX IF NOT EXISTS idx_events_feed_class_time ON events (feed_id, class, time);
+"""
+
+MAX_PAGE_SIZE = 1000
+
+
+def _format_time(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Parse an ISO 8601 timestamp or unix seconds; None passes through."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class EventLog:
+    def __init__(self, path: str, max_queue: int = 10000, flush_interval: float = 0.5, max_batch: int = 500):
+        """
+        Event log backed by a SQLite database.
+        Args:
+            path: Database file (created with its schema if missing)
+            max_queue: Events buffered before new events are dropped
+            flush_interval: Seconds the writer waits to fill a batch
+            max_batch: Maximum events per transaction
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self._stop = threading.Event()
+        self._worker = None
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def append(self, event_type: str, feed_id: str, event_class: str, state: str, start_time: float,
+               end_time: Optional[float] = None, probability: Optional[float] = None) -> bool:
+        """
+        Queue an event without blocking.
+        Args:
+            event_type: "audio" or "video"
+            feed_id: Feed the event happened on
+            event_class: Class (or custom head) name
+            state: "start" creates the row, "end" sets end_time on the open row of the same event
+            start_time: Event start (unix seconds)
+            end_time: Event end (unix seconds, "end" only)
+            probability: Peak probability
+        Returns:
+            False if the queue was full and the event was dropped
+        """
+        try:
+            self._queue.put_nowait((state, event_type, feed_id, event_class, start_time, end_time, probability))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.appended += 1
+        return True
+
+    def start(self):
+        """Start the writer thread."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the writer after it committed what is queued (or timeout passed)."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+
+    def _next_batch(self) -> List[tuple]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        connection = sqlite3.connect(self.path)
+        # WAL makes NORMAL durable across application crashes; only a power loss can lose the last commits
+        connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write(connection, batch)
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List[tuple]):
+        try:
+            with connection:
+                for state, event_type, feed_id, event_class, start_time, end_time, probability in batch:
+                    if state == "start":
+                        connection.execute(
+                            "INSERT INTO events (time, end_time, feed_id, type, class, probability) VALUES (?, ?, ?, ?, ?, ?)",
+                            (start_time, end_time, feed_id, event_type, event_class, probability),
+                        )
+                    else:
+                        connection.execute(
+                            "UPDATE events SET end_time = ?, probability = max(coalesce(probability, 0), ?) "
+                            "WHERE feed_id = ? AND class = ? AND time = ? AND type = ?",
+                            (end_time, probability or 0.0, feed_id, event_class, start_time, event_type),
+                        )
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            print(f"Event log write failed, dropped {len(batch)} events: {e}")
+
+    def _reader(self) -> sqlite3.Connection:
+        """Read connection of the calling thread (WAL readers never block the writer)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA query_only=1")
+            self._local.connection = connection
+        return connection
+
+    def query(
+        self,
+        feed_id: Optional[str] = None,
+        event_class: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Dict:
+        """
+        Events, newest first.
+        Args:
+            feed_id: Only this feed
+            event_class: Only this class (case-insensitive)
+            event_type: Only "audio" or "video"
+            since: Events starting at or after this time (unix seconds)
+            until: Events starting before this time (unix seconds)
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+        Returns:
+            Dictionary with 'events' and 'next_cursor' (None on the last page)
+        """
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        clauses, params = [], []
+        for column, value in (("feed_id", feed_id), ("class", event_class), ("type", event_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("time >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("time < ?")
+            params.append(until)
+        if cursor:
+            try:
+                cursor_time, cursor_id = cursor.split(":")
+                cursor_time, cursor_id = float(cursor_time), int(cursor_id)
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            clauses.append("(time < ? OR (time = ? AND id < ?))")
+            params.extend([cursor_time, cursor_time, cursor_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT id, time, end_time, feed_id, type, class, probability FROM events {where} "
+            f"ORDER BY time DESC, id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1][1]!r}:{rows[-1][0]}"
+        events = [
+            {
+                "id": row_id,
+                "start": _format_time(start),
+                "end": _format_time(end),
+                "duration": round(end - start, 3) if end is not None else None,
+                "feedId": feed,
+                "type": event_type,
+                "class": event_class,
+                "probability": probability,
+            }
+            for row_id, start, end, feed, event_type, event_class, probability in rows
+        ]
+        return {"events": events, "next_cursor": next_cursor}
+
+    def get_stats(self) -> Dict:
+        """Queue and write counters for the status endpoint."""
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "appended": self.appended,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,313 @@
+"""
+Streaming HTTP audio ingestion.
+Reads audio from a long-lived HTTP response chunk by chunk over a pooled
+keep-alive session, decodes WAV or raw PCM incrementally and reconnects with
+exponential backoff when the connection drops, instead of downloading the
+whole response body on every poll.
+"""
+import io
+import struct
+import threading
+import numpy as np
+import requests
+import soundfile as sf
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, Optional, Tuple
+
+_session = None
+_session_lock = threading.Lock()
+
+# WAV format tag -> {bits per sample: (numpy dtype, scale to [-1, 1])}
+_WAV_FORMATS = {
+    1: {  # PCM
+        8: ('u1', 1 / 128.0),
+        16: ('<i2', 1 / 32768.0),
+        32: ('<i4', 1 / 2147483648.0),
+    },
+    3: {  # IEEE float
+        32: ('<f4', 1.0),
+        64: ('<f8', 1.0),
+    },
+}
+
+
+def get_session() -> requests.Session:
+    """
+    Shared HTTP session, so every reader reuses pooled keep-alive connections.
+    Returns:
+        The process-wide requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def fetch_audio(url: str, timeout: Tuple[float, float] = (3.05, 30.0)) -> Tuple[np.ndarray, int]:
+    """
+    Download and decode a finite audio file (any format soundfile reads) over the pooled session.
+    Args:
+        url: URL of the audio file
+        timeout: (connect, read) timeouts in seconds
+    Returns:
+        (waveform, sample_rate) with the waveform downmixed to mono float32
+    """
+    with get_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        audio_data = io.BytesIO()
+        for chunk in response.iter_content(chunk_size=1 << 16):
+            audio_data.write(chunk)
+    audio_data.seek(0)
+    waveform, sr = sf.read(audio_data, dtype='float32')
+    if waveform.ndim > 1:
+        waveform = waveform.mean(axis=1)
+    return waveform, sr
+
+
+class PCMStreamDecoder:
+    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+        """
+        Incremental decoder for a WAV stream or headerless 16-bit little-endian PCM.
+        A stream starting with a RIFF header is decoded with the header's format;
+        anything else is taken as raw PCM with the given sample rate and channels.
+        Args:
+            sample_rate: Sample rate of raw PCM streams
+            channels: Channel count of raw PCM streams
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        """Start a new stream (after a reconnect the header is sent again)."""
+        self._pending = b''
+        self._in_header = True
+        self._dtype = '<i2'
+        self._scale = 1 / 32768.0
+        self._frame_bytes = 2 * self.channels
+
+    def decode(self, data: bytes) -> Optional[np.ndarray]:
+        """
+        Decode the next chunk of the byte stream.
+        Args:
+            data: Bytes as received; may split headers and samples anywhere
+        Returns:
+            Mono float32 samples, or None if the chunk completed no frame
+        """
+        self._pending += data
+        if self._in_header and not self._parse_header():
+            return None
+
+        usable = len(self._pending) - len(self._pending) % self._frame_bytes
+        if usable == 0:
+            return None
+        frames = np.frombuffer(self._pending[:usable], dtype=self._dtype).astype(np.float32)
+        self._pending = self._pending[usable:]
+        if self._dtype == 'u1':
+            frames -= 128.0
+        frames *= self._scale
+        if self.channels > 1:
+            frames = frames.reshape(-1, self.channels).mean(axis=1)
+        return frames
+
+    def _parse_header(self) -> bool:
+        """Consume the WAV header if there is one. Returns False while more bytes are needed."""
+        if len(self._pending) < 12:
+            return False
+        if self._pending[:4] != b'RIFF' or self._pending[8:12] != b'WAVE':
+            self._in_header = False  # Headerless PCM
+            return True
+
+        offset = 12
+        while True:
+            if len(self._pending) < offset + 8:
+                return False
+            chunk_id, chunk_size = struct.unpack('<4sI', self._pending[offset:offset + 8])
+            if chunk_id == b'data':
+                # Live streams often carry a placeholder size, so read until the connection ends
+                self._pending = self._pending[offset + 8:]
+                self._in_header = False
+                return True
+            if len(self._pending) < offset + 8 + chunk_size:
+                return False
+            if chunk_id == b'fmt ':
+                self._read_fmt(self._pending[offset + 8:offset + 8 + chunk_size])
+            offset += 8 + chunk_size + chunk_size % 2
+
+    def _read_fmt(self, fmt: bytes):
+        format_tag, channels, sample_rate = struct.unpack('<HHI', fmt[:8])
+        bits = struct.unpack('<H', fmt[14:16])[0]
+        if format_tag == 0xFFFE and len(fmt) >= 26:
+            # WAVE_FORMAT_EXTENSIBLE: the real format is the first field of the sub-format GUID
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        if bits not in _WAV_FORMATS.get(format_tag, {}):
+            raise ValueError(f"Unsupported WAV stream format: tag {format_tag}, {bits} bits")
+        self._dtype, self._scale = _WAV_FORMATS[format_tag][bits]
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._frame_bytes = channels * bits // 8
+
+
+class HTTPAudioStreamReader:
+    def __init__(
+        self,
+        url: str,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        chunk_size: int = 4096,
+        timeout: Tuple[float, float] = (3.05, 10.0),
+        reconnect: bool = True,
+        max_backoff: float = 30.0,
+    ):
+        """
+        Continuous reader for a live audio stream served over HTTP.
+        Args:
+            url: Stream URL (WAV stream or raw 16-bit little-endian PCM)
+            sample_rate: Sample rate of raw PCM streams (a WAV header overrides it)
+            channels: Channel count of raw PCM streams (a WAV header overrides it)
+            chunk_size: Bytes read from the socket at a time
+            timeout: (connect, read) timeouts in seconds
+            reconnect: Reconnect when the connection drops or the response ends
+            max_backoff: Maximum wait between reconnect attempts in seconds
+        """
+        self.url = url
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+        self.decoder = PCMStreamDecoder(sample_rate, channels)
+        self._response = None
+        self._first_samples = None
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._blocks = None
+        self._closed = threading.Event()
+        self.bytes_received = 0
+        self.reconnects = 0
+        self.last_error = None
+
+    @property
+    def sample_rate(self) -> int:
+        """Sample rate of the decoded audio."""
+        return self.decoder.sample_rate
+
+    def connect(self) -> int:
+        """
+        Open the connection and read up to the first samples, so the stream format is known.
+        Returns:
+            Sample rate of the stream
+        """
+        self._open()
+        try:
+            for chunk in self._chunks():
+                samples = self._decode(chunk)
+                if samples is not None:
+                    self._first_samples = samples
+                    break
+        except Exception:
+            # Do not leave the half-opened response (and its pooled connection) behind
+            self._close_response()
+            raise
+        return self.sample_rate
+
+    def _open(self):
+        self._close_response()
+        self.decoder.reset()
+        response = get_session().get(self.url, stream=True, timeout=self.timeout)
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        self._response = response
+
+    def _chunks(self) -> Iterator[bytes]:
+        for chunk in self._response.iter_content(chunk_size=self.chunk_size):
+            if self._closed.is_set():
+                return
+            if chunk:
+                yield chunk
+
+    def _decode(self, chunk: bytes) -> Optional[np.ndarray]:
+        self.bytes_received += len(chunk)
+        sample_rate = self.decoder.sample_rate
+        samples = self.decoder.decode(chunk)
+        if self.reconnects and self.decoder.sample_rate != sample_rate:
+            raise ValueError(f"Stream {self.url} changed sample rate from {sample_rate} to {self.decoder.sample_rate} Hz")
+        return samples
+
+    def iter_blocks(self) -> Iterator[np.ndarray]:
+        """
+        Yield mono float32 blocks as they arrive, reconnecting with backoff until close().
+        Yields:
+            Decoded samples at sample_rate
+        """
+        backoff = 0.5
+        while not self._closed.is_set():
+            try:
+                if self._response is None:
+                    self._open()
+                if self._first_samples is not None:
+                    samples, self._first_samples = self._first_samples, None
+                    yield samples
+                for chunk in self._chunks():
+                    samples = self._decode(chunk)
+                    if samples is not None:
+                        backoff = 0.5
+                        yield samples
+                self.last_error = "Stream ended"
+            except requests.exceptions.RequestException as e:
+                self.last_error = str(e)
+                print(f"Audio stream {self.url}: {e}")
+            finally:
+                self._close_response()
+
+            if not self.reconnect or self._closed.wait(backoff):
+                return
+            backoff = min(backoff * 2, self.max_backoff)
+            self.reconnects += 1
+
+    def read(self, num_samples: int) -> Optional[np.ndarray]:
+        """
+        Read the next num_samples from the live stream, keeping the connection open between calls.
+        Args:
+            num_samples: Number of samples to return
+        Returns:
+            The samples, or None if the stream ended first
+        """
+        if self._blocks is None:
+            self._blocks = self.iter_blocks()
+        parts = [self._pending]
+        have = len(self._pending)
+        while have < num_samples:
+            block = next(self._blocks, None)
+            if block is None:
+                self._pending = np.concatenate(parts)
+                return None
+            parts.append(block)
+            have += len(block)
+        audio = np.concatenate(parts)
+        self._pending = audio[num_samples:]
+        return audio[:num_samples]
+
+    def _close_response(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def close(self):
+        """Stop reading; iter_blocks() returns after the current chunk."""
+        self._closed.set()
+        self._close_response()
+
+    def get_stats(self) -> Dict:
+        """Transfer counters for the status endpoint."""
+        return {
+            "url": self.url,
+            "bytes_received": self.bytes_received,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
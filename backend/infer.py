@@ -1,16 +1,32 @@
 ### YOLO for establishing bounding boxes and identifying humans
 
 import cv2
+import os
+import time
 import numpy as np # For preprocessing
 from ultralytics import YOLO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import base64
 from io import BytesIO
 from PIL import Image
+from model_store import ModelStore, resolve_model
 
 class YOLODetector:
-    def __init__(self, model_path: str = "yolov8n.pt"):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path: str = "yolov8n.pt", model_store: Optional[ModelStore] = None):
+        """
+        Load the YOLO model.
+        Args:
+            model_path: Weights file or Ultralytics model name
+            model_store: Local model store (defaults to MODEL_STORE_DIR). If it pins the
+                weights under the file's base name (e.g. 'yolov8n') they are loaded from there
+        """
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        local_path = resolve_model(name, model_store)
+
+        start = time.perf_counter()
+        self.model = YOLO(local_path or model_path)
+        self.load_seconds = time.perf_counter() - start
+        print(f"YOLO model {name} loaded in {self.load_seconds:.2f}s")
         
     def process_image(self, image_data: str) -> Dict[str, Any]:
         """
@@ -3,24 +3,36 @@
 import cv2
 # import predictor
 import fastapi
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Optional, Union
 from infer import YOLODetector
 from sound_detector import SoundDetector
+from audio_pipeline import AudioStreamRegistry
+from audio_gate import EnergyGate
+from embedding_store import EmbeddingStore, load_heads
+from event_detector import HysteresisEventDetector, PresenceEventDetector
+from event_bus import EventBus
+from event_hub import EventHistory, TopicBroker
+from event_codec import EventEncoder, collect_batch, parse_transport
+from event_log import EventLog, parse_time
+from versioned_state import VersionedState, diff
+from detection_profiles import DetectionProfileStore
+from class_matcher import ClassMatcher
+from prompt_categories import CategoryCache, MatcherCategoryProvider, OpenAICategoryProvider, PromptCategorizer, StaticCategoryProvider
 from openai import OpenAI
 from dotenv import load_dotenv
 
 import uvicorn
+import asyncio
 import threading
 import time
 import numpy as np
-from fastapi.responses import StreamingResponse
-import sounddevice as sd
-import librosa
+from fastapi.responses import Response, StreamingResponse
 import json
 import os
-import requests
+from collections import deque
 from datetime import datetime
 
 app = FastAPI()
@@ -36,8 +48,22 @@ app.add_middleware(
 
 #### --- Inits and global variables --- ###
 yolo_detector = YOLODetector()
-latest_detections = {"success": True, "detections": []}
-latest_lock = threading.Lock()
+
+def video_change_key(value):
+    """What counts as a change of the scene: classes, coarse boxes and confidence, not per-frame jitter"""
+    return sorted(
+        (d["class"], round(d["confidence"], 1), [c // 16 for c in d["bbox"]])
+        for d in value["detections"]
+    )
+
+def audio_change_key(value):
+    """What counts as a change of an audio stream's state: classes, coarse scores and events, not hop timestamps"""
+    return (
+        [(d["class"], round(d["probability"], 1)) for d in value["detections"]],
+        [(e["class"], e["state"], e["start"]) for e in value.get("events", [])]
+    )
+
+latest_detections = VersionedState({"success": True, "detections": []}, key=video_change_key)
 
 video_frame_lock = threading.Lock()
 video_frame = None
@@ -46,12 +72,26 @@ video_frame = None
 audio_detector = None
 audio_detection_enabled = False
 audio_detection_lock = threading.Lock()
-latest_audio_detections = {"success": True, "detections": []}
+latest_audio_detections = {}  # feed_id -> VersionedState with the latest detections of that audio stream
+LONG_POLL_MAX_SECONDS = 60.0
 yamnet_categories_path = "yamnet_categories.json"
+data_dir = os.path.dirname(os.path.abspath(__file__))  # Default place of runtime files (event log, prompt cache), whatever the working directory
+audio_streams = None  # AudioStreamRegistry, created once the model is loaded
+default_audio_feed = "1"  # Feed id of the default microphone (AUDIO_FEED_ID, else VIDEO_FEED_ID), so dashboard prompts for that feed reach it
+detection_profiles = DetectionProfileStore()  # Per-feed audio categories, YOLO classes and thresholds
+yolo_matcher = None  # ClassMatcher over the YOLO class names, built on first prompt
+sample_rate = 16000
+block_duration = 0.5  # Capture callback block length
+recent_audio_events = {}  # feed_id -> deque of the latest started / ended sound events
 # WebSocket server URL - change if websocket_server.py runs on different port
 # Note: websocket_server.py runs FastAPI on port 8000, but main.py also uses 8000
 # You may need to change websocket_server.py port or run them separately
 websocket_url = "http://localhost:8001/detection_output"  # WebSocket server HTTP endpoint (websocket_server.py runs on port 8001)
+event_bus = EventBus(websocket_url)  # Batched, non-blocking delivery of audio and video events
+event_hub = TopicBroker()  # In-process pub/sub behind the /ws endpoint
+websocket_mode = "external"  # "external" (websocket_server.py), "hub" (/ws on this app) or "both"
+video_feed_id = "1"  # Feed id of the camera in the dashboard
+event_log = None  # EventLog (SQLite) with the history of audio and video events, opened on startup
 
 class ImageRequest(BaseModel):
     image_data: str
@@ -61,6 +101,23 @@ class PromptPayload(BaseModel):
     detection_mode: str
     prompt: str
 
+class ProfilePayload(BaseModel):
+    # Omitted fields stay unchanged; null resets a field to the global default
+    audio_categories: Optional[list[str]] = None
+    audio_threshold: Optional[float] = None
+    video_classes: Optional[list[str]] = None
+    video_threshold: Optional[float] = None
+
+class CategoriesPayload(BaseModel):
+    categories: list[str]
+
+class AudioStreamRequest(BaseModel):
+    feed_id: str
+    source: str = "device"  # "device" (local input), "push" (network source posting PCM) or "url" (HTTP stream)
+    device: Optional[Union[int, str]] = None  # sounddevice index or name, None = default input
+    url: Optional[str] = None  # WAV or raw 16-bit PCM stream for source "url"
+    sample_rate: int = 16000  # Sample rate of pushed audio or raw PCM streams
+
 
 #### --- YOLO inference --- ###
 @app.post("/detect")
@@ -82,7 +139,101 @@ async def health_check():
     """
     Health check endpoint
     """
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "websocket_mode": websocket_mode,
+        "event_bus": event_bus.get_stats(),
+        "event_hub": event_hub.get_stats(),
+        "event_log": event_log.get_stats() if event_log else None
+    }
+
+
+@app.get("/events")
+def get_events(
+    feed_id: Optional[str] = None,
+    event_class: Optional[str] = Query(None, alias="class"),
+    type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """
+    Event history, newest first.
+    since / until take ISO 8601 timestamps or unix seconds; pass next_cursor
+    from the response as cursor to get the next page.
+    """
+    if event_log is None:
+        raise HTTPException(status_code=503, detail="Event log is disabled (EVENT_LOG_PATH is empty)")
+    try:
+        return event_log.query(feed_id, event_class, type, parse_time(since), parse_time(until), limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+#### --- In-process event stream --- ###
+@app.websocket("/ws")
+async def websocket_events(websocket: WebSocket, topics: str = "*", format: str = "json", coalesce_ms: Optional[str] = None, since: Optional[int] = None):
+    """
+    Stream detection events directly from this app (WEBSOCKET_MODE=hub or both).
+    Query parameters:
+        topics: comma-separated patterns over '<type>/<feedId>',
+            e.g. ?topics=audio/*,video/1 (default: everything)
+        format: json (one message per event), batch (JSON array per message)
+            or packed (binary, see event_codec.py)
+        coalesce_ms: window over which batch/packed collect events (default 50)
+        since: seq of the last event the client received; buffered events after it
+            are replayed before live ones
+    """
+    await websocket.accept()
+    if websocket_mode not in ("hub", "both"):
+        await websocket.close(code=1008, reason="Event hub disabled (set WEBSOCKET_MODE=hub)")
+        return
+    try:
+        format, window = parse_transport(format, coalesce_ms)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    encoder = EventEncoder(format)
+    subscription = event_hub.subscribe(topics.split(","), since)
+
+    async def send(events):
+        for message in encoder.encode(events):
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+            subscription.frames += 1
+
+    async def forward():
+        for i in range(0, len(subscription.backfill), 500):
+            await send(subscription.backfill[i:i + 500])
+        subscription.backfill = []
+        while True:
+            await send(await collect_batch(subscription.queue, window))
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Reading is what notices a closed connection while no events arrive
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        event_hub.unsubscribe(subscription)
+
+
+@app.get("/models")
+async def get_models():
+    """
+    Model startup times in seconds
+    """
+    yamnet = getattr(audio_detector, 'yamnet_detector', None)
+    return {
+        "yolo": {"load_seconds": yolo_detector.load_seconds},
+        "yamnet": {"load_seconds": yamnet.load_seconds} if yamnet else None
+    }
 
 
 #### --- FastAPI endpoints --- ####
@@ -101,16 +252,76 @@ Ideas for stuff to add:
     - When streaming to cloud vm for YOLO, we only stream changes in the frame, keeping old frames and their detections in the frontend if no motion is detected
     - Compress img frame files before sending to VM
 """
+def audio_detection_state(feed_id):
+    """VersionedState of an audio stream's latest detections, created on first use"""
+    with audio_detection_lock:
+        state = latest_audio_detections.get(feed_id)
+        if state is None:
+            state = latest_audio_detections[feed_id] = VersionedState({"success": True, "detections": []}, key=audio_change_key)
+        return state
+
+def audio_feed_state(feed_id):
+    """VersionedState of a known audio stream (the default microphone or a registered stream); 404 otherwise"""
+    if feed_id != default_audio_feed and (audio_streams is None or audio_streams.get(feed_id) is None):
+        raise HTTPException(status_code=404, detail=f"Unknown audio stream: {feed_id}")
+    return audio_detection_state(feed_id)
+
+async def versioned_response(request: Request, state: VersionedState, after_version: Optional[int], timeout: float):
+    """
+    Latest state with an ETag; 304 if the client's If-None-Match is still current.
+    With after_version, waits (long-poll) until there is a newer version or timeout passes.
+    """
+    if after_version is not None:
+        await state.wait(after_version, min(max(timeout, 0.0), LONG_POLL_MAX_SECONDS))
+    version, body = state.body()
+    etag = state.etag(version)
+    headers = {"ETag": etag, "X-State-Version": str(version), "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def detection_stream(request: Request, state: VersionedState):
+    """Server-Sent Events: a snapshot, then one delta per new version (id = version)"""
+    async def events():
+        version, value = state.snapshot()
+        yield f"id: {version}\nevent: snapshot\ndata: {json.dumps(value)}\n\n"
+        while not await request.is_disconnected():
+            if not await state.wait(version, 15.0):
+                yield ": keep-alive\n\n"
+                continue
+            new_version, new_value = state.snapshot()
+            yield f"id: {new_version}\nevent: delta\ndata: {json.dumps(diff(value, new_value))}\n\n"
+            version, value = new_version, new_value
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/latest-detections")
-async def get_latest_detections():
-    with latest_lock:
-        return latest_detections
+async def get_latest_detections(request: Request, after_version: Optional[int] = None, timeout: float = 25.0):
+    """
+    Get the latest object detection results.
+    Sends an ETag (304 on a matching If-None-Match); with after_version, waits up to
+    timeout seconds for a newer version (long-poll).
+    """
+    return await versioned_response(request, latest_detections, after_version, timeout)
+
+@app.get("/latest-detections/stream")
+async def stream_latest_detections(request: Request):
+    """Server-Sent Events stream of object detection changes"""
+    return detection_stream(request, latest_detections)
 
 @app.get("/latest-audio-detections")
-async def get_latest_audio_detections():
-    """Get the latest audio detection results"""
-    with audio_detection_lock:
-        return latest_audio_detections
+async def get_latest_audio_detections(request: Request, after_version: Optional[int] = None, timeout: float = 25.0):
+    """Get the latest audio detection results of the default microphone (versioned like /latest-detections)"""
+    return await versioned_response(request, audio_detection_state(default_audio_feed), after_version, timeout)
+
+@app.get("/latest-audio-detections/{feed_id}")
+async def get_latest_feed_audio_detections(request: Request, feed_id: str, after_version: Optional[int] = None, timeout: float = 25.0):
+    """Get the latest audio detection results of one audio stream (versioned like /latest-detections)"""
+    return await versioned_response(request, audio_feed_state(feed_id), after_version, timeout)
+
+@app.get("/latest-audio-detections/{feed_id}/stream")
+async def stream_latest_audio_detections(request: Request, feed_id: str):
+    """Server-Sent Events stream of an audio stream's detection changes"""
+    return detection_stream(request, audio_feed_state(feed_id))
 
 @app.post("/audio-detection/enable")
 async def enable_audio_detection():
@@ -130,8 +341,89 @@ async def disable_audio_detection():
 
 @app.get("/audio-detection/status")
 async def get_audio_detection_status():
-    """Get audio detection status"""
-    return {"enabled": audio_detection_enabled}
+    """Get audio detection status and pipeline overflow counters"""
+    stats = audio_streams.get_stats() if audio_streams else None
+    return {"enabled": audio_detection_enabled, "pipeline": stats}
+
+@app.get("/audio-streams")
+async def list_audio_streams():
+    """List registered audio streams"""
+    if audio_streams is None:
+        return {"streams": []}
+    return {"streams": audio_streams.feed_ids()}
+
+@app.post("/audio-streams")
+def register_audio_stream(request: AudioStreamRequest):
+    """
+    Register a microphone, pushed network audio or an HTTP audio stream under a feed id.
+    Plain def: opening a device or connecting to a URL blocks, so FastAPI runs this in its threadpool
+    """
+    if audio_streams is None:
+        raise HTTPException(status_code=503, detail="Audio detector is not initialized yet")
+    try:
+        if request.source == "device":
+            stream = audio_streams.register_device(request.feed_id, device=request.device, block_duration=block_duration)
+        elif request.source == "push":
+            stream = audio_streams.register_push(request.feed_id, request.sample_rate)
+        elif request.source == "url":
+            if not request.url:
+                raise HTTPException(status_code=400, detail="source 'url' requires a url")
+            stream = audio_streams.register_url(request.feed_id, request.url, request.sample_rate)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown audio source: {request.source}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "registered", "feed_id": request.feed_id, "stream": stream.get_stats()}
+
+@app.delete("/audio-streams/{feed_id}")
+async def unregister_audio_stream(feed_id: str):
+    """Stop and remove an audio stream"""
+    if audio_streams is None or not audio_streams.unregister(feed_id):
+        raise HTTPException(status_code=404, detail=f"Unknown audio stream: {feed_id}")
+    with audio_detection_lock:
+        latest_audio_detections.pop(feed_id, None)
+        recent_audio_events.pop(feed_id, None)
+    return {"status": "removed", "feed_id": feed_id}
+
+@app.post("/audio-streams/{feed_id}/audio")
+async def push_audio(feed_id: str, request: Request):
+    """Append raw 16-bit little-endian mono PCM to a push stream"""
+    stream = audio_streams.get(feed_id) if audio_streams else None
+    if stream is None or stream.source != "push":
+        raise HTTPException(status_code=404, detail=f"Unknown push audio stream: {feed_id}")
+    body = await request.body()
+    samples = np.frombuffer(body[:len(body) - len(body) % 2], dtype='<i2').astype(np.float32) / 32768.0
+    accepted = stream.write(samples)
+    return {"accepted": accepted, "dropped": len(samples) - accepted}
+
+@app.get("/audio-heads")
+async def get_audio_heads():
+    """List the custom linear heads scored on live YAMNet embeddings"""
+    if audio_streams is None:
+        return {"heads": []}
+    return {"heads": [{"name": head.name, "threshold": head.threshold} for head in audio_streams.heads]}
+
+@app.post("/audio-heads/reload")
+async def reload_audio_heads():
+    """Reload the custom heads from AUDIO_HEADS_DIR without restarting the pipeline"""
+    if audio_streams is None:
+        raise HTTPException(status_code=503, detail="Audio detector is not initialized yet")
+    audio_streams.set_heads(load_heads(os.getenv("AUDIO_HEADS_DIR")))
+    return {"heads": [head.name for head in audio_streams.heads]}
+
+@app.get("/audio-detection/categories")
+async def get_audio_categories():
+    """Get the YAMNet categories the live detector is filtering for"""
+    categories = audio_detector.get_categories() if audio_detector else None
+    return {"categories": categories}
+
+@app.put("/audio-detection/categories")
+async def set_audio_categories(payload: CategoriesPayload):
+    """Replace the YAMNet categories on the live detector (no model reload)"""
+    save_yamnet_categories(payload.categories)
+    return {"status": "success", "categories": payload.categories}
 
 #### --- OpenAI prompt processing (from sound_AI.py) --- ###
 
@@ -139,62 +431,128 @@ async def get_audio_detection_status():
 load_dotenv()
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+def yamnet_class_matcher():
+    """Class name matcher of the loaded YAMNet model (None while loading or with AudioCNN)"""
+    return getattr(getattr(audio_detector, 'yamnet_detector', None), 'class_matcher', None)
+
+def create_prompt_categorizer():
+    """Prompt categorizer configured from the environment (PROMPT_PROVIDER=openai, local or static)"""
+    provider_name = os.getenv("PROMPT_PROVIDER", "openai")
+    if provider_name == "static":
+        provider = StaticCategoryProvider.from_file(os.getenv("PROMPT_STATIC_CATEGORIES", "prompt_categories.json"))
+    elif provider_name == "local":
+        provider = MatcherCategoryProvider(yamnet_class_matcher)
+    elif provider_name == "openai":
+        provider = OpenAICategoryProvider(openai_client)
+    else:
+        raise ValueError(f"Unknown PROMPT_PROVIDER: {provider_name}")
+    cache_path = os.getenv("PROMPT_CACHE_PATH", os.path.join(data_dir, "prompt_cache.json"))
+    cache = CategoryCache(cache_path or None, ttl=float(os.getenv("PROMPT_CACHE_TTL", str(7 * 24 * 3600))))
+    return PromptCategorizer(provider, cache, timeout=float(os.getenv("PROMPT_TIMEOUT", "15")))
+
+prompt_categorizer = create_prompt_categorizer()
+
 @app.post("/recieve")
 async def receive_prompt(payload: PromptPayload):
     """
-    Process natural language prompt and generate YAMNet category names.
+    Process natural language prompt into the detection profile of payload.feed_id:
+    YAMNet categories for its audio and YOLO classes for its video. Other feeds
+    keep their profiles and no model is reloaded.
     Integrated from sound_AI.py
     """
-    result = update_yamnet_categories(payload.prompt)
+    result = await update_feed_profile(payload)
     return {
         "status": "OK",
         "received": payload.dict(),
         "ai_response": result
     }
 
-def update_yamnet_categories(prompt: str):
-    """Generate YAMNet categories from prompt using OpenAI"""
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an AI that analyzes prompts and returns a JSON list of YAMNet sound categories that are relevant to the prompt. Return a JSON array of strings."
-                },
-                {
-                    "role": "user",
-                    "content": f"Prompt: {prompt}. Generate a JSON list of relevant YAMNet categories. Please create approximately 5 categories, preferably well-trained and common ones. JUST print the list, nothing else, not even a json tag. If the prompt you recieved has more than one argument, try not to generalize"
-                }
-            ]
-        )
-
-        raw_content = response.choices[0].message.content
-        try:
-            categories = json.loads(raw_content)
-            print(f"Generated YAMNet categories: {categories}")
-        except (json.JSONDecodeError, TypeError) as e:
-            print(f"JSON error: {e}")
-            print(f"Content: {raw_content}")
-            return {
-                "status": "error",
-                "message": "Invalid JSON from OpenAI",
-                "yamnet_categories": []
-            }
+async def update_feed_profile(payload: PromptPayload):
+    """Generate a feed's detection profile from its prompt"""
+    result = await generate_yamnet_categories(payload.prompt)
+    changes = {"detection_mode": payload.detection_mode, "prompt": payload.prompt}
+    if result["status"] == "success":
+        changes["audio_categories"] = result["yamnet_categories"]
+    if payload.detection_mode != "none":
+        changes["video_classes"] = match_yolo_classes(payload.prompt) or None
+    profile = detection_profiles.update(payload.feed_id, **changes)
+    print(f"Detection profile of feed {payload.feed_id}: {profile.to_dict()}")
+    return {**result, "profile": profile.to_dict()}
+
+def match_yolo_classes(prompt: str):
+    """YOLO class names mentioned in a prompt (e.g. "cars and dogs" -> car, dog)"""
+    global yolo_matcher
+    if yolo_matcher is None:
+        yolo_matcher = ClassMatcher(yolo_detector.model.names)
+    return yolo_matcher.names(yolo_matcher.match_prompt(prompt))
+
+@app.get("/profiles")
+async def get_profiles():
+    """Detection profiles of all feeds that have one"""
+    return {"profiles": [profile.to_dict() for profile in detection_profiles.all()]}
+
+@app.get("/profiles/{feed_id}")
+async def get_profile(feed_id: str):
+    """Detection profile of one feed"""
+    profile = detection_profiles.get(feed_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No detection profile for feed: {feed_id}")
+    return profile.to_dict()
+
+@app.put("/profiles/{feed_id}")
+async def update_profile(feed_id: str, payload: ProfilePayload):
+    """Set fields of one feed's detection profile directly (takes effect on the next hop / frame)"""
+    return detection_profiles.update(feed_id, **payload.dict(exclude_unset=True)).to_dict()
+
+@app.delete("/profiles/{feed_id}")
+async def delete_profile(feed_id: str):
+    """Return a feed to the global categories and thresholds"""
+    if not detection_profiles.remove(feed_id):
+        raise HTTPException(status_code=404, detail=f"No detection profile for feed: {feed_id}")
+    return {"status": "removed", "feed_id": feed_id}
+
+@app.get("/audio-detection/match")
+async def match_audio_classes(q: str):
+    """Map a prompt or category names to YAMNet classes locally (no LLM)"""
+    matcher = yamnet_class_matcher()
+    if matcher is None:
+        raise HTTPException(status_code=503, detail="YAMNet classes are not loaded yet")
+    phrases = [phrase for phrase in q.split(",") if phrase.strip()]
+    return {
+        "query": q,
+        "matches": [
+            {"phrase": phrase.strip(), "classes": [{"index": i, "class": matcher.class_names[i], "score": round(score, 3)} for i, score in matcher.match(phrase)]}
+            for phrase in phrases
+        ],
+        "prompt_classes": matcher.names(matcher.match_prompt(q))
+    }
 
-        # Save result to file
-        with open(yamnet_categories_path, 'w') as f:
-            json.dump(categories, f, indent=4)
+@app.get("/prompt-cache")
+async def get_prompt_cache_stats():
+    """Provider calls and cache hit counters of the prompt categorizer"""
+    return prompt_categorizer.get_stats()
 
-        # Trigger reload of categories in audio detector
-        reload_yamnet_categories()
+async def generate_yamnet_categories(prompt: str):
+    """Generate YAMNet categories from prompt (cached; the LLM call runs off the event loop)"""
+    try:
+        result = await prompt_categorizer.categorize(prompt)
+        categories = result["categories"]
+        source = "cached" if result["cached"] else f"{result['seconds']:.2f} s"
+        print(f"Generated YAMNet categories: {categories} ({source})")
 
         return {
             "status": "success",
-            "message": "YAMNet categories updated successfully",
-            "yamnet_categories": categories
+            "message": "YAMNet categories generated successfully",
+            "yamnet_categories": categories,
+            "cached": result["cached"]
         }
 
+    except asyncio.TimeoutError:
+        return {
+            "status": "error",
+            "message": f"No answer from the category provider within {prompt_categorizer.timeout:.0f} s",
+            "yamnet_categories": []
+        }
     except Exception as e:
         return {
             "status": "error",
@@ -203,7 +561,7 @@ def update_yamnet_categories(prompt: str):
         }
 
 def camera_motion_yolo_thread():
-    global latest_detections, video_frame
+    global video_frame
     # Get camera URL from environment variable or use default
     camera_url = os.getenv("CAMERA_FEED_URL")
     if camera_url is None:
@@ -216,6 +574,11 @@ def camera_motion_yolo_thread():
         print("Cannot open camera")
         return
 
+    # Debounced appear / disappear events, so a flickering box does not flood toasts and the event log
+    video_events = PresenceEventDetector(
+        min_frames=int(os.getenv("VIDEO_EVENT_MIN_FRAMES", "3")),
+        end_grace=float(os.getenv("VIDEO_EVENT_END_GRACE", "1.0"))
+    )
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -227,6 +590,8 @@ def camera_motion_yolo_thread():
         detections = []
         annotated_frame = frame.copy()
 
+        # Read once per frame; a prompt for this feed swaps the profile between frames
+        profile = detection_profiles.get(video_feed_id)
         for result in results:
             boxes = result.boxes
             for box in boxes:
@@ -234,6 +599,8 @@ def camera_motion_yolo_thread():
                 confidence = box.conf[0].item()
                 class_id = int(box.cls[0].item())
                 class_name = yolo_detector.model.names[class_id]
+                if profile is not None and not profile.accepts_video(class_name, confidence):
+                    continue
                 detections.append({
                     "bbox": [x1, y1, x2, y2],
                     "confidence": confidence,
@@ -245,8 +612,17 @@ def camera_motion_yolo_thread():
                 label = f"{class_name} {confidence:.2f}"
                 cv2.putText(annotated_frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 2)
 
-        with latest_lock:
-            latest_detections = {"success": True, "detections": detections}
+        latest_detections.set({"success": True, "detections": detections})
+
+        # Notify only when a class appears in the scene, not on every frame
+        best = {}
+        for detection in detections:
+            best[detection["class"]] = max(best.get(detection["class"], 0.0), detection["confidence"])
+        for event in video_events.update(time.time(), best):
+            if event['state'] == "start":
+                send_detection_to_websocket(event['class'], event['probability'], video_feed_id, event['start_time'], event_type="video")
+            if event_log:
+                event_log.append("video", video_feed_id, event['class'], event['state'], event['start_time'], event['end_time'], event['probability'])
 
         with video_frame_lock:
             video_frame = annotated_frame.copy()
@@ -275,168 +651,157 @@ def video_feed():
 
 #### --- Audio detection functions --- ###
 
-def send_detection_to_websocket(event_name: str, probability: float, feed_id: str = "audio"):
-    """Send detection event to WebSocket server"""
-    try:
-        data = {
-            "event": event_name,
-            "timestamp": datetime.now().isoformat(),
-            "feedId": feed_id,
-            "probability": probability,
-            "type": "audio"
+def send_detection_to_websocket(event_name: str, probability: float, feed_id: Optional[str] = None, start_time: Optional[float] = None, event_type: str = "audio"):
+    """Queue a detection event for the WebSocket server (never blocks the caller)"""
+    if feed_id is None:
+        feed_id = default_audio_feed
+    data = {
+        "event": event_name,
+        "timestamp": datetime.fromtimestamp(start_time).isoformat() if start_time else datetime.now().isoformat(),
+        "feedId": feed_id,
+        "probability": probability,
+        "type": event_type
+    }
+    if websocket_mode in ("hub", "both"):
+        event_hub.publish(data)
+    if websocket_mode in ("external", "both") and not event_bus.publish(data):
+        print(f"Event queue full, dropped detection: {event_name}")
+
+def save_yamnet_categories(categories):
+    """Persist YAMNet categories and apply them in place to the running detector"""
+    # The file is only read at startup, so restarts keep the last prompt
+    with open(yamnet_categories_path, 'w') as f:
+        json.dump(categories, f, indent=4)
+
+    if audio_detector is not None:
+        audio_detector.set_categories(categories)
+        print(f"Audio detector categories updated: {categories}")
+
+def handle_audio_detections(feed_id, results):
+    """State update with the detections of one hop (runs on the pipeline worker thread)"""
+    detections = [
+        {
+            "class": result['class'],
+            "probability": result['probability'],
+            "timestamp": datetime.fromtimestamp(result['start_time']).isoformat()
         }
-        # Send to WebSocket server HTTP endpoint
-        requests.post(websocket_url, json=data, timeout=1)
-    except Exception as e:
-        print(f"Failed to send detection to WebSocket: {e}")
+        for result in results
+    ]
+    with audio_detection_lock:
+        events = list(recent_audio_events.get(feed_id, []))
+    audio_detection_state(feed_id).set({
+        "success": True,
+        "detections": detections,
+        "events": events,
+        "timestamp": datetime.now().isoformat()
+    })
+
+def handle_audio_events(feed_id, events):
+    """WebSocket dispatch of sound events of one stream (runs on the pipeline worker thread)"""
+    for event in events:
+        # One notification per event, when it starts
+        if event['state'] == "start":
+            send_detection_to_websocket(event['class'], event['probability'], feed_id, event['start_time'])
+        if event_log:
+            event_log.append("audio", feed_id, event['class'], event['state'], event['start_time'], event['end_time'], event['probability'])
 
-def reload_yamnet_categories():
-    """Reload YAMNet categories from file and reinitialize detector"""
-    global audio_detector
-    try:
-        if os.path.exists(yamnet_categories_path):
-            with open(yamnet_categories_path, 'r') as f:
-                categories = json.load(f)
-            print(f"Reloaded YAMNet categories: {categories}")
-            
-            # Reinitialize detector with new categories
-            if audio_detector is None or audio_detection_enabled:
-                audio_detector = SoundDetector(
-                    use_yamnet=True,
-                    yamnet_categories_path=yamnet_categories_path
-                )
-                print("Audio detector reinitialized with new categories")
-            return True
-    except Exception as e:
-        print(f"Error reloading YAMNet categories: {e}")
-    return False
+    with audio_detection_lock:
+        recent = recent_audio_events.setdefault(feed_id, deque(maxlen=50))
+        recent.extend(
+            {
+                "class": event['class'],
+                "state": event['state'],
+                "probability": event['probability'],
+                "start": datetime.fromtimestamp(event['start_time']).isoformat(),
+                "end": datetime.fromtimestamp(event['end_time']).isoformat() if event['end_time'] else None
+            }
+            for event in events
+        )
+        events = list(recent)
+    audio_detection_state(feed_id).update(lambda value: {**value, "events": events})
+
+def create_event_detector():
+    """Hysteresis event detector configured from the environment"""
+    return HysteresisEventDetector(
+        onset_threshold=float(os.getenv("AUDIO_EVENT_ONSET", "0.3")),
+        offset_threshold=float(os.getenv("AUDIO_EVENT_OFFSET", "0.15")),
+        smoothing=float(os.getenv("AUDIO_EVENT_SMOOTHING", "0.5")),
+        min_duration=float(os.getenv("AUDIO_EVENT_MIN_DURATION", "0.4"))
+    )
+
+def create_audio_gate():
+    """Energy / spectral-flux gate configured from the environment (AUDIO_GATE=0 disables it)"""
+    if os.getenv("AUDIO_GATE", "1") == "0":
+        return None
+    return EnergyGate(
+        snr_db=float(os.getenv("AUDIO_GATE_SNR_DB", "6.0")),
+        flux_threshold_db=float(os.getenv("AUDIO_GATE_FLUX_DB", "2.0")),
+        silence_db=float(os.getenv("AUDIO_GATE_SILENCE_DB", "-70.0"))
+    )
 
 def audio_detection_thread():
-    """Continuous audio detection thread using microphone"""
-    global audio_detector, latest_audio_detections, audio_detection_enabled
+    """Load the audio model and start the stream registry with the default microphone"""
+    global audio_detector, audio_streams
     
     # Initialize detector
+    yamnet_backend = os.getenv("YAMNET_BACKEND", "tf")  # "tf" or "tflite"
     try:
         audio_detector = SoundDetector(
             use_yamnet=True,
-            yamnet_categories_path=yamnet_categories_path
+            yamnet_categories_path=yamnet_categories_path,
+            yamnet_backend=yamnet_backend,
+            yamnet_tflite_path=os.getenv("YAMNET_TFLITE_PATH")
         )
-        print("Audio detector initialized with YAMNet")
+        print(f"Audio detector initialized with YAMNet ({yamnet_backend} backend)")
     except Exception as e:
         print(f"Failed to initialize audio detector: {e}")
         return
     
-    sample_rate = 16000
-    block_duration = 0.5  # Process 0.5 second chunks
-    last_detection_time = {}
-    detection_cooldown = 2.0  # Minimum seconds between same detection
-    
-    # Track file modification time to reload categories
-    last_file_mtime = 0
-    if os.path.exists(yamnet_categories_path):
-        last_file_mtime = os.path.getmtime(yamnet_categories_path)
-    
-    def audio_callback(indata, frames, time_info, status):
-        nonlocal last_detection_time, last_file_mtime
-        
-        if not audio_detection_enabled:
-            return
-        
-        if status:
-            print(f"Audio status: {status}")
-        
-        # Check if categories file was updated
-        if os.path.exists(yamnet_categories_path):
-            current_mtime = os.path.getmtime(yamnet_categories_path)
-            if current_mtime > last_file_mtime:
-                last_file_mtime = current_mtime
-                reload_yamnet_categories()
-        
-        # Convert to mono if stereo
-        if len(indata.shape) > 1:
-            audio_data = np.mean(indata, axis=1)
-        else:
-            audio_data = indata.flatten()
-        
-        # Resample to 16kHz if needed (YAMNet requirement)
-        device_sr = int(sd.query_devices(sd.default.device[0])['default_samplerate'])
-        if device_sr != sample_rate:
-            audio_data = librosa.resample(
-                audio_data.astype(np.float32),
-                orig_sr=device_sr,
-                target_sr=sample_rate
-            )
-        
-        # Normalize
-        if np.max(np.abs(audio_data)) > 0:
-            audio_data = audio_data / np.max(np.abs(audio_data))
-        
-        # Run detection
-        try:
-            if audio_detector:
-                results = audio_detector.detect_sounds_from_stream(audio_data, threshold=0.3)
-                
-                if results:
-                    current_time = time.time()
-                    detections = []
-                    
-                    for result in results:
-                        event_name = result['class']
-                        prob = result['probability']
-                        
-                        # Cooldown check
-                        if event_name not in last_detection_time or \
-                           current_time - last_detection_time[event_name] >= detection_cooldown:
-                            
-                            last_detection_time[event_name] = current_time
-                            detections.append({
-                                "class": event_name,
-                                "probability": prob,
-                                "timestamp": datetime.now().isoformat()
-                            })
-                            
-                            # Send to WebSocket
-                            send_detection_to_websocket(event_name, prob)
-                    
-                    # Update latest detections
-                    with audio_detection_lock:
-                        latest_audio_detections = {
-                            "success": True,
-                            "detections": detections,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        
-        except Exception as e:
-            print(f"Audio detection error: {e}")
+    # One model instance and one worker serve every registered stream
+    audio_streams = AudioStreamRegistry(
+        audio_detector,
+        target_sr=sample_rate,
+        threshold=0.3,
+        on_detections=handle_audio_detections,
+        is_enabled=lambda: audio_detection_enabled,
+        gate_factory=create_audio_gate,
+        embedding_store=EmbeddingStore(os.getenv("EMBEDDING_STORE_DIR")) if os.getenv("EMBEDDING_STORE_DIR") else None,
+        heads=load_heads(os.getenv("AUDIO_HEADS_DIR")),
+        event_factory=create_event_detector,
+        on_events=handle_audio_events,
+        profiles=detection_profiles
+    )
+    audio_streams.start()
+    print("Audio detection worker running...")
     
     try:
-        # Get default input device
-        default_device = sd.query_devices(kind='input')
-        device_sr = int(default_device['default_samplerate'])
-        
-        print(f"Starting audio detection on device: {default_device['name']}")
-        print(f"Sample rate: {device_sr} Hz (will resample to {sample_rate} Hz)")
-        
-        # Start recording
-        with sd.InputStream(
-            callback=audio_callback,
-            channels=1,
-            samplerate=device_sr,
-            blocksize=int(device_sr * block_duration),
-            device=None
-        ):
-            print("Audio detection thread running...")
-            while True:
-                sd.sleep(100)
-                
+        audio_streams.register_device(default_audio_feed, device=None, block_duration=block_duration)
     except Exception as e:
-        print(f"Audio detection thread error: {e}")
+        print(f"Could not open the default microphone: {e}")
         import traceback
         traceback.print_exc()
 
 # Start the camera thread on app startup
+@app.on_event("startup")
+async def attach_event_hub():
+    # Producer threads hand events to subscribers through this loop
+    event_hub.attach(asyncio.get_running_loop())
+
 @app.on_event("startup")
 def start_threads():
+    global video_feed_id, websocket_mode, event_log, default_audio_feed
+    video_feed_id = os.getenv("VIDEO_FEED_ID", video_feed_id)
+    default_audio_feed = os.getenv("AUDIO_FEED_ID", video_feed_id)
+    websocket_mode = os.getenv("WEBSOCKET_MODE", websocket_mode)
+    if websocket_mode in ("external", "both"):
+        event_bus.start()
+    event_hub.history = EventHistory(int(os.getenv("EVENT_REPLAY_SIZE", "1000")))
+    event_log_path = os.getenv("EVENT_LOG_PATH", os.path.join(data_dir, "events.db"))
+    if event_log_path:
+        event_log = EventLog(event_log_path)
+        event_log.start()
+        print(f"Event log: {event_log_path}")
+    
     # Start camera thread
     camera_thread = threading.Thread(target=camera_motion_yolo_thread, daemon=True)
     camera_thread.start()
@@ -0,0 +1,189 @@
+"""
+Local model store for offline startup.
+A directory with pinned model artifacts (SavedModels, weights, class maps)
+and a manifest.json of their SHA-256 checksums.
+
+Usage:
+    python model_store.py add yamnet /path/to/yamnet_saved_model
+    python model_store.py add yamnet_class_map /path/to/yamnet_class_map.csv
+    python model_store.py add yolov8n /path/to/yolov8n.pt
+    python model_store.py verify
+
+The store directory is taken from MODEL_STORE_DIR (or --root). With
+MODEL_STORE_OFFLINE=1 a model missing from the store is an error instead of
+a network download.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Dict, Optional
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ModelStore:
+    def __init__(self, root: str, offline: bool = False):
+        """
+        Open a model store directory.
+        Args:
+            root: Store directory containing manifest.json
+            offline: If True, models missing from the store must not be fetched from the network
+        """
+        self.root = os.path.abspath(root)
+        self.offline = offline
+        self.manifest_path = os.path.join(self.root, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {"models": {}}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+
+    def has(self, name: str) -> bool:
+        """Check if the manifest pins a model."""
+        return name in self.manifest["models"]
+
+    def resolve(self, name: str) -> str:
+        """
+        Get the local path of a pinned model after verifying its checksum.
+        Args:
+            name: Model name in the manifest
+        Returns:
+            Absolute path to the artifact (file or directory)
+        """
+        entry = self.manifest["models"].get(name)
+        if entry is None:
+            raise FileNotFoundError(f"Model '{name}' is not in the model store at {self.root}")
+
+        path = os.path.join(self.root, entry["path"])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model '{name}' is missing from the model store: {path}")
+
+        digest = checksum(path)
+        if digest != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for model '{name}': expected {entry['sha256']}, got {digest}")
+        return path
+
+    def add(self, name: str, source: str) -> str:
+        """
+        Copy an artifact into the store and pin its checksum.
+        Args:
+            name: Model name to register
+            source: File or directory to copy
+        Returns:
+            Path of the stored artifact
+        """
+        target_name = os.path.basename(os.path.normpath(source))
+        target = os.path.join(self.root, target_name)
+        if os.path.abspath(source) != target:
+            if os.path.isdir(source):
+                shutil.copytree(source, target, dirs_exist_ok=True)
+            else:
+                os.makedirs(self.root, exist_ok=True)
+                shutil.copy2(source, target)
+
+        self.manifest["models"][name] = {"path": target_name, "sha256": checksum(target)}
+        self._save_manifest()
+        return target
+
+    def verify(self) -> Dict[str, bool]:
+        """Verify every pinned model, returning name -> ok."""
+        status = {}
+        for name in self.manifest["models"]:
+            try:
+                self.resolve(name)
+                status[name] = True
+            except (FileNotFoundError, ValueError) as e:
+                print(e)
+                status[name] = False
+        return status
+
+
+def checksum(path: str) -> str:
+    """
+    SHA-256 of a file, or of a directory's relative file paths and contents.
+    Args:
+        path: File or directory
+    Returns:
+        Hex digest
+    """
+    sha = hashlib.sha256()
+    if os.path.isdir(path):
+        files = []
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                files.append(os.path.join(dirpath, filename))
+        for file_path in sorted(files):
+            sha.update(os.path.relpath(file_path, path).replace(os.sep, '/').encode('utf-8'))
+            _update_from_file(sha, file_path)
+    else:
+        _update_from_file(sha, path)
+    return sha.hexdigest()
+
+
+def _update_from_file(sha, file_path: str):
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+
+
+def get_model_store() -> Optional[ModelStore]:
+    """
+    Model store configured through the environment.
+    Returns:
+        ModelStore for MODEL_STORE_DIR, or None if it is not set
+    """
+    root = os.getenv("MODEL_STORE_DIR")
+    if not root:
+        return None
+    return ModelStore(root, offline=os.getenv("MODEL_STORE_OFFLINE", "0") == "1")
+
+
+def resolve_model(name: str, store: Optional[ModelStore] = None) -> Optional[str]:
+    """
+    Local path of a model if the store pins it.
+    Args:
+        name: Model name in the manifest
+        store: Store to use (defaults to the one configured through the environment)
+    Returns:
+        Verified local path, or None if the caller may fall back to downloading
+    """
+    store = store or get_model_store()
+    if store is None:
+        return None
+    if store.has(name):
+        return store.resolve(name)
+    if store.offline:
+        raise FileNotFoundError(f"Model '{name}' is not in the model store at {store.root} and MODEL_STORE_OFFLINE=1")
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the local model store")
+    parser.add_argument("--root", default=os.getenv("MODEL_STORE_DIR", "models"), help="Store directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_parser = subparsers.add_parser("add", help="Copy an artifact into the store and pin its checksum")
+    add_parser.add_argument("name")
+    add_parser.add_argument("source")
+    subparsers.add_parser("verify", help="Verify all pinned checksums")
+    args = parser.parse_args()
+
+    store = ModelStore(args.root)
+    if args.command == "add":
+        path = store.add(args.name, args.source)
+        print(f"Added {args.name}: {path} ({store.manifest['models'][args.name]['sha256']})")
+    else:
+        results = store.verify()
+        for name, ok in results.items():
+            print(f"{name}: {'OK' if ok else 'FAILED'}")
+        sys.exit(0 if all(results.values()) else 1)
@@ -0,0 +1,216 @@
+"""
+Prompt to YAMNet category translation.
+The LLM call runs in a worker thread with a timeout so it never blocks the
+event loop, and answers are kept in a persistent LRU cache with a TTL keyed
+on the normalized prompt: repeating a prompt returns without calling the LLM.
+Providers are pluggable; StaticCategoryProvider (fixed answers, for tests)
+and MatcherCategoryProvider (class name matching) answer locally.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+SYSTEM_PROMPT = "You are an AI that analyzes prompts and returns a JSON list of YAMNet sound categories that are relevant to the prompt. Return a JSON array of strings."
+USER_PROMPT = "Prompt: {prompt}. Generate a JSON list of relevant YAMNet categories. Please create approximately 5 categories, preferably well-trained and common ones. JUST print the list, nothing else, not even a json tag. If the prompt you recieved has more than one argument, try not to generalize"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Cache key of a prompt: lower case, single spaces, no surrounding punctuation."""
+    return re.sub(r"\s+", " ", prompt).strip().strip(".!?,;:").strip().lower()
+
+
+class OpenAICategoryProvider:
+    def __init__(self, client, model: str = "gpt-3.5-turbo"):
+        """
+        Categories from an OpenAI chat model.
+        Args:
+            client: openai.OpenAI (or AzureOpenAI) client
+            model: Model or deployment name
+        """
+        self.client = client
+        self.model = model
+
+    def categories(self, prompt: str) -> List[str]:
+        """Ask the model (blocking); raises ValueError if the answer is not a JSON list of strings."""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": USER_PROMPT.format(prompt=prompt)}
+            ]
+        )
+        raw_content = response.choices[0].message.content
+        try:
+            categories = json.loads(raw_content)
+        except (json.JSONDecodeError, TypeError):
+            raise ValueError(f"Invalid JSON from OpenAI: {raw_content}")
+        if not isinstance(categories, list) or not all(isinstance(c, str) for c in categories):
+            raise ValueError(f"Expected a JSON list of strings from OpenAI, got: {raw_content}")
+        return categories
+
+
+class StaticCategoryProvider:
+    def __init__(self, mapping: Dict[str, List[str]], default: Optional[List[str]] = None):
+        """
+        Local stand-in provider: fixed categories per prompt.
+        Args:
+            mapping: Prompt (normalized on load) -> categories
+            default: Categories for unknown prompts (None raises ValueError)
+        """
+        self.mapping = {normalize_prompt(prompt): categories for prompt, categories in mapping.items()}
+        self.default = default
+
+    @classmethod
+    def from_file(cls, path: str) -> "StaticCategoryProvider":
+        """Load a JSON object of prompt -> categories; the key "*" is the default."""
+        with open(path, 'r') as f:
+            mapping = json.load(f)
+        default = mapping.pop("*", None)
+        return cls(mapping, default)
+
+    def categories(self, prompt: str) -> List[str]:
+        categories = self.mapping.get(normalize_prompt(prompt), self.default)
+        if categories is None:
+            raise ValueError(f"No categories configured for prompt: {prompt}")
+        return list(categories)
+
+
+class MatcherCategoryProvider:
+    def __init__(self, get_matcher):
+        """
+        Local provider: the prompt's phrases matched against the YAMNet class names.
+        Args:
+            get_matcher: Function returning the ClassMatcher (None while the model is loading)
+        """
+        self.get_matcher = get_matcher
+
+    def categories(self, prompt: str) -> List[str]:
+        matcher = self.get_matcher()
+        if matcher is None:
+            raise ValueError("YAMNet classes are not loaded yet")
+        categories = matcher.names(matcher.match_prompt(prompt))
+        if not categories:
+            raise ValueError(f"No YAMNet class matches the prompt: {prompt}")
+        return categories
+
+
+class CategoryCache:
+    def __init__(self, path: Optional[str] = None, max_entries: int = 256, ttl: float = 7 * 24 * 3600):
+        """
+        LRU cache of normalized prompt -> categories, persisted as JSON.
+        Args:
+            path: Cache file (None keeps the cache in memory only)
+            max_entries: Entries kept; the least recently used is evicted
+            ttl: Seconds an entry stays valid
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    for key, (created, categories) in json.load(f).items():
+                        self._entries[key] = (created, categories)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable prompt cache {path}: {e}")
+
+    def get(self, prompt: str) -> Optional[List[str]]:
+        key = normalize_prompt(prompt)
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[1])
+
+    def put(self, prompt: str, categories: List[str]):
+        key = normalize_prompt(prompt)
+        self._entries[key] = (time.time(), list(categories))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        # Write and rename, so a crash never leaves a truncated cache behind
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(temp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PromptCategorizer:
+    def __init__(self, provider, cache: Optional[CategoryCache] = None, timeout: float = 15.0):
+        """
+        Cached, non-blocking prompt to category translation.
+        Args:
+            provider: Object with categories(prompt) -> List[str] (blocking)
+            cache: Answer cache (None disables caching)
+            timeout: Seconds to wait for the provider
+        """
+        self.provider = provider
+        self.cache = cache
+        self.timeout = timeout
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.timeouts = 0
+
+    async def categorize(self, prompt: str) -> Dict:
+        """
+        Categories for a prompt (call from the event loop).
+        Returns:
+            Dictionary with 'categories', 'cached' and 'seconds'
+        Raises:
+            asyncio.TimeoutError: The provider did not answer within timeout
+            ValueError: The provider's answer was invalid
+        """
+        start = time.perf_counter()
+        categories = self.cache.get(prompt) if self.cache else None
+        if categories is not None:
+            return {"categories": categories, "cached": True, "seconds": time.perf_counter() - start}
+
+        # Identical prompts arriving while one is in flight share its answer
+        key = normalize_prompt(prompt)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._ask(prompt))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        categories = await asyncio.shield(pending)
+        return {"categories": list(categories), "cached": False, "seconds": time.perf_counter() - start}
+
+    async def _ask(self, prompt: str) -> List[str]:
+        self.calls += 1
+        try:
+            categories = await asyncio.wait_for(asyncio.to_thread(self.provider.categories, prompt), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        if self.cache is not None:
+            self.cache.put(prompt, categories)
+        return categories
+
+    def get_stats(self) -> Dict:
+        return {
+            "provider": type(self.provider).__name__,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "cache_entries": len(self.cache) if self.cache else 0,
+            "cache_hits": self.cache.hits if self.cache else 0,
+            "cache_misses": self.cache.misses if self.cache else 0,
+        }
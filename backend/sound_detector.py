@@ -3,21 +3,23 @@ import torchaudio
 import numpy as np
 import librosa
 import requests
-import io
-import soundfile as sf
 import json
 from typing import List, Dict, Tuple, Optional
 from urllib.parse import urlparse
 import os
 from torch import nn
+from streaming_resampler import StreamingResampler
+from http_audio_stream import HTTPAudioStreamReader, fetch_audio
 
 # Optional YAMNet import
 try:
     from yamnet_detector import YAMNetDetector
+    from audio_timeline import analyze_file
     YAMNET_AVAILABLE = True
 except ImportError:
     YAMNET_AVAILABLE = False
     YAMNetDetector = None
+    analyze_file = None
 
 class AudioCNN(nn.Module):
     def __init__(self, num_classes=10):
@@ -69,7 +71,7 @@ class AudioCNN(nn.Module):
         return x
 
 class SoundDetector:
-    def __init__(self, config_path: str = "sound_classes.json", model_path: str = None, vm_url: str = None, use_yamnet: bool = False, yamnet_categories_path: str = "yamnet_categories.json"):
+    def __init__(self, config_path: str = "sound_classes.json", model_path: str = None, vm_url: str = None, use_yamnet: bool = False, yamnet_categories_path: str = "yamnet_categories.json", yamnet_backend: str = "tf", yamnet_tflite_path: Optional[str] = None, compile_model: bool = True):
         """
         Initialize the sound detector with an audio CNN model or YAMNet.
         Args:
@@ -78,12 +80,19 @@ class SoundDetector:
             vm_url: Base URL of the virtual machine hosting the audio stream
             use_yamnet: If True, use YAMNet instead of AudioCNN
             yamnet_categories_path: Path to YAMNet categories JSON file
+            yamnet_backend: "tf" (TensorFlow Hub SavedModel) or "tflite" (lightweight TFLite model)
+            yamnet_tflite_path: Path to the YAMNet .tflite model for the TFLite backend
+            compile_model: Run AudioCNN as a TorchScript module traced for a fixed input length
         """
         self.use_yamnet = use_yamnet and YAMNET_AVAILABLE
         
         if self.use_yamnet:
             print("Using YAMNet for audio classification")
-            self.yamnet_detector = YAMNetDetector(yamnet_categories_path=yamnet_categories_path)
+            self.yamnet_detector = YAMNetDetector(
+                yamnet_categories_path=yamnet_categories_path,
+                backend=yamnet_backend,
+                tflite_model_path=yamnet_tflite_path
+            )
             self.sample_rate = 16000  # YAMNet uses 16kHz
         else:
             if use_yamnet and not YAMNET_AVAILABLE:
@@ -92,9 +101,51 @@ class SoundDetector:
             self.config = self._load_config(config_path)
             self.sample_rate = self.config['model_config']['sample_rate']
             self.model = self._load_model(model_path)
+            
+            # Class info and thresholds resolved once, as per-class tensors
+            self.class_mapping = self._get_class_mapping()
+            num_classes = len(self.config['sound_classes'])
+            default_threshold = self.config['model_config']['default_threshold']
+            self._class_info = [
+                self.class_mapping.get(idx, {'name': f"Unknown_{idx}", 'description': '', 'threshold': default_threshold})
+                for idx in range(num_classes)
+            ]
+            self._class_thresholds = torch.tensor(
+                [info.get('threshold', default_threshold) for info in self._class_info],
+                dtype=torch.float32,
+                device=self.device
+            )
+            
+            # Audio is scored in fixed blocks, so the traced graph always sees one input shape
+            self.input_samples = int(self.sample_rate * self.config['model_config'].get('block_duration', 0.5))
+            self.inference_model = self._compile_model() if compile_model else self.model
         
         self.vm_url = vm_url.rstrip('/') if vm_url else None
         
+        # One stateful resampler per (stream id, input rate) for AudioCNN stream data
+        self._stream_resamplers = {}
+        
+        # Open VM stream connections, kept between polls
+        self._vm_readers = {}
+        
+    def set_categories(self, categories: Optional[List[str]]):
+        """
+        Replace the YAMNet filter categories in place (no model reload).
+        Args:
+            categories: YAMNet category names to keep, or None/empty for all classes
+        """
+        if not self.use_yamnet:
+            raise ValueError("Category filtering is only supported with YAMNet.")
+        self.yamnet_detector.set_filter_categories(categories)
+    
+    def get_categories(self) -> Optional[List[str]]:
+        """
+        Get the active YAMNet filter categories.
+        Returns:
+            Category names, or None when all classes are reported
+        """
+        return self.yamnet_detector.filter_categories if self.use_yamnet else None
+    
     def _load_config(self, config_path: str) -> Dict:
         """
         Load the configuration from JSON file.
@@ -145,6 +196,100 @@ class SoundDetector:
         except Exception as e:
             raise Exception(f"Failed to load model: {str(e)}")
     
+    def _compile_model(self) -> torch.nn.Module:
+        """
+        Trace AudioCNN to TorchScript for the fixed block length and freeze it for inference.
+        Returns:
+            The compiled module, or the eager model if tracing fails
+        """
+        try:
+            example = torch.zeros(1, self.input_samples, device=self.device)
+            with torch.no_grad():
+                traced = torch.jit.trace(self.model, example)
+                compiled = torch.jit.optimize_for_inference(traced)
+                compiled(example)  # Warm up, so the first real call does not pay for optimization
+            return compiled
+        except Exception as e:
+            print(f"Warning: TorchScript compilation failed, running AudioCNN eagerly: {e}")
+            return self.model
+    
+    def _frame_blocks(self, waveform: np.ndarray) -> np.ndarray:
+        """
+        Cut audio into consecutive fixed-length model blocks, zero-padding the last one.
+        Args:
+            waveform: 1-D audio at the model sample rate
+        Returns:
+            Array of shape (num_blocks, input_samples)
+        """
+        waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+        num_blocks = max(1, -(-len(waveform) // self.input_samples))
+        blocks = np.zeros(num_blocks * self.input_samples, dtype=np.float32)
+        blocks[:len(waveform)] = waveform
+        return blocks.reshape(num_blocks, self.input_samples)
+    
+    def predict_blocks(self, blocks: np.ndarray) -> torch.Tensor:
+        """
+        Run AudioCNN on a batch of fixed-length blocks in one forward pass.
+        Args:
+            blocks: Array of shape (num_blocks, input_samples)
+        Returns:
+            Class probabilities of shape (num_blocks, num_classes)
+        """
+        with torch.inference_mode():
+            batch = torch.from_numpy(np.ascontiguousarray(blocks, dtype=np.float32)).to(self.device)
+            return torch.sigmoid(self.inference_model(batch))
+    
+    def _probabilities_to_results(self, probabilities: torch.Tensor, threshold: Optional[float] = None) -> List[Dict[str, float]]:
+        """
+        Threshold one probability row against all classes at once.
+        Args:
+            probabilities: Class probabilities of shape (num_classes,)
+            threshold: Optional override for the per-class thresholds
+        Returns:
+            List of detected sounds with their probabilities
+        """
+        thresholds = self._class_thresholds if threshold is None else torch.full_like(self._class_thresholds, threshold)
+        detected = torch.nonzero(probabilities > thresholds).flatten().tolist()
+        probabilities = probabilities.tolist()
+        thresholds = thresholds.tolist()
+        return [
+            {
+                'class': self._class_info[idx]['name'],
+                'description': self._class_info[idx]['description'],
+                'probability': float(probabilities[idx]),
+                'threshold': float(thresholds[idx])
+            }
+            for idx in detected
+        ]
+    
+    def _detect_waveform(self, waveform: np.ndarray, threshold: Optional[float] = None) -> List[Dict[str, float]]:
+        """AudioCNN detection on a whole waveform: batched blocks, probabilities averaged over blocks."""
+        probabilities = self.predict_blocks(self._frame_blocks(waveform))
+        return self._probabilities_to_results(probabilities.mean(dim=0), threshold)
+    
+    def detect_sounds_batch(self, waveforms: List[np.ndarray], threshold: Optional[float] = None) -> List[List[Dict[str, float]]]:
+        """
+        Detect sounds in several clips with a single AudioCNN forward pass.
+        Args:
+            waveforms: 1-D clips at the model sample rate
+            threshold: Optional override for detection threshold
+        Returns:
+            One result list per clip, as detect_sounds()
+        """
+        if self.use_yamnet:
+            raise ValueError("Batched clip detection is only supported with AudioCNN.")
+        if not waveforms:
+            return []
+        framed = [self._frame_blocks(waveform) for waveform in waveforms]
+        probabilities = self.predict_blocks(np.concatenate(framed))
+        results = []
+        offset = 0
+        for blocks in framed:
+            clip = probabilities[offset:offset + len(blocks)].mean(dim=0)
+            offset += len(blocks)
+            results.append(self._probabilities_to_results(clip, threshold))
+        return results
+    
     def _fetch_audio_from_url(self, url: str) -> np.ndarray:
         """
         Fetch audio data from a URL.
@@ -154,12 +299,8 @@ class SoundDetector:
             Audio data as numpy array
         """
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Read the audio data
-            audio_data = io.BytesIO(response.content)
-            waveform, sr = sf.read(audio_data)
+            # Pooled keep-alive session, body read in chunks
+            waveform, sr = fetch_audio(url)
             
             # Resample if necessary
             if sr != self.sample_rate:
@@ -210,118 +351,108 @@ class SoundDetector:
             # Use YAMNet
             threshold = threshold or 0.3
             yamnet_results = self.yamnet_detector.detect_sounds(audio_source, threshold=threshold)
-            # Convert to consistent format
-            return [
-                {
-                    'class': r['class'],
-                    'description': r['class'],  # YAMNet doesn't have descriptions
-                    'probability': r['probability'],
-                    'threshold': threshold
-                }
-                for r in yamnet_results
-            ]
+            return self._format_yamnet_results(yamnet_results, threshold)
         
-        # Use AudioCNN (original implementation)
-        # Preprocess audio
+        # Use AudioCNN
         waveform = self.preprocess_audio(audio_source)
-        
-        # Move to device
-        waveform = waveform.to(self.device)
-        
-        # Get predictions
-        with torch.no_grad():
-            predictions = self.model(waveform)
-            probabilities = torch.sigmoid(predictions)
-        
-        # Process predictions
-        results = []
-        class_mapping = self._get_class_mapping()
-        
-        for idx, prob in enumerate(probabilities[0]):
-            # Use class-specific threshold if available, otherwise use default
-            class_threshold = class_mapping[idx]['threshold'] if idx in class_mapping else self.config['model_config']['default_threshold']
-            # Override with provided threshold if specified
-            threshold_to_use = threshold if threshold is not None else class_threshold
-            
-            if prob > threshold_to_use:
-                class_info = class_mapping[idx]
-                results.append({
-                    'class': class_info['name'],
-                    'description': class_info['description'],
-                    'probability': float(prob),
-                    'threshold': float(threshold_to_use)
-                })
-        
-        return results
+        return self._detect_waveform(waveform[0].numpy(), threshold)
     
-    def detect_sounds_from_stream(self, audio_stream: np.ndarray, threshold: Optional[float] = None) -> List[Dict[str, float]]:
+    def detect_sounds_from_scores(self, scores: np.ndarray, threshold: Optional[float] = None) -> List[Dict[str, float]]:
+        """
+        Detect sounds from already computed YAMNet window scores (e.g. from a batched model call).
+        Gives the same result as detect_sounds() on the audio the windows were cut from.
+        Args:
+            scores: Array of shape (num_windows, num_classes) from YAMNetDetector.score_windows()
+            threshold: Optional override for detection threshold
+        Returns:
+            List of detected sounds with their probabilities
+        """
+        if not self.use_yamnet:
+            raise ValueError("Window scores are only supported with YAMNet.")
+        threshold = threshold or 0.3
+        yamnet_results = self.yamnet_detector._scores_to_results(np.mean(scores, axis=0), threshold, 10)
+        return self._format_yamnet_results(yamnet_results, threshold)
+    
+    @staticmethod
+    def _format_yamnet_results(yamnet_results: List[Dict], threshold: float) -> List[Dict[str, float]]:
+        """Convert YAMNet results to the AudioCNN result format."""
+        return [
+            {
+                'class': r['class'],
+                'description': r['class'],  # YAMNet doesn't have descriptions
+                'probability': r['probability'],
+                'threshold': threshold
+            }
+            for r in yamnet_results
+        ]
+    
+    def analyze_file(self, audio_path: str, threshold: Optional[float] = None, block_seconds: float = 30.0, merge_gap: float = 0.0) -> List[Dict]:
+        """
+        Timeline of a long audio file, decoded and classified in blocks with bounded memory.
+        Args:
+            audio_path: Path to an audio file readable by soundfile
+            threshold: Optional override for detection threshold
+            block_seconds: Seconds of audio decoded at a time
+            merge_gap: Seconds between detections of a class that still count as one segment
+        Returns:
+            List of segments with 'start', 'end' (seconds), 'class', 'class_index' and 'score'
+        """
+        if not self.use_yamnet:
+            raise ValueError("Timeline analysis is only supported with YAMNet.")
+        threshold = threshold or 0.3
+        return analyze_file(
+            self.yamnet_detector,
+            audio_path,
+            threshold=threshold,
+            block_seconds=block_seconds,
+            merge_gap=merge_gap
+        )
+    
+    def detect_sounds_from_stream(self, audio_stream: np.ndarray, threshold: Optional[float] = None, input_sr: Optional[int] = None, stream_id: Optional[str] = None) -> List[Dict[str, float]]:
         """
         Detect sounds from a stream of audio data.
         Args:
             audio_stream: Numpy array containing audio data
             threshold: Optional override for detection threshold
+            input_sr: Sample rate of audio_stream (if None, assumes the model sample rate).
+                Blocks are resampled with a stateful resampler, so pass consecutive blocks of one stream
+            stream_id: Identifies the stream when several are classified concurrently
         Returns:
             List of detected sounds with their probabilities
         """
         if self.use_yamnet:
             # Use YAMNet
             threshold = threshold or 0.3
-            # YAMNet expects 16kHz, so if audio_stream is already resampled, pass input_sr=16000
-            # Otherwise, let YAMNet handle resampling by not specifying input_sr
+            # YAMNet resamples to 16kHz itself when input_sr differs
             yamnet_results = self.yamnet_detector.detect_sounds_from_stream(
                 audio_stream, 
                 threshold=threshold,
-                input_sr=self.sample_rate if self.sample_rate == 16000 else None
+                input_sr=input_sr,
+                stream_id=stream_id
             )
-            # Convert to consistent format
-            return [
-                {
-                    'class': r['class'],
-                    'description': r['class'],
-                    'probability': r['probability'],
-                    'threshold': threshold
-                }
-                for r in yamnet_results
-            ]
-        
-        # Use AudioCNN (original implementation)
-        # Convert to tensor
-        waveform = torch.from_numpy(audio_stream).float()
-        waveform = waveform.unsqueeze(0)
-        waveform = waveform.to(self.device)
-        
-        # Get predictions
-        with torch.no_grad():
-            predictions = self.model(waveform)
-            probabilities = torch.sigmoid(predictions)
-        
-        # Process predictions
-        results = []
-        class_mapping = self._get_class_mapping()
-        
-        for idx, prob in enumerate(probabilities[0]):
-            # Use class-specific threshold if available, otherwise use default
-            class_threshold = class_mapping[idx]['threshold'] if idx in class_mapping else self.config['model_config']['default_threshold']
-            # Override with provided threshold if specified
-            threshold_to_use = threshold if threshold is not None else class_threshold
-            
-            if prob > threshold_to_use:
-                class_info = class_mapping[idx]
-                results.append({
-                    'class': class_info['name'],
-                    'description': class_info['description'],
-                    'probability': float(prob),
-                    'threshold': float(threshold_to_use)
-                })
-        
-        return results
+            return self._format_yamnet_results(yamnet_results, threshold)
+        
+        # Use AudioCNN
+        # Resample to the model rate if needed
+        if input_sr and input_sr != self.sample_rate:
+            resampler = self._stream_resamplers.get((stream_id, input_sr))
+            if resampler is None:
+                resampler = StreamingResampler(input_sr, self.sample_rate)
+                self._stream_resamplers[(stream_id, input_sr)] = resampler
+            audio_stream = resampler.process(audio_stream)
+        
+        return self._detect_waveform(audio_stream, threshold)
 
-    def detect_sounds_from_vm_stream(self, endpoint: str, threshold: float = 0.5) -> List[Dict[str, float]]:
+    def detect_sounds_from_vm_stream(self, endpoint: str, threshold: float = 0.5, duration: float = 1.0, sample_rate: int = 16000) -> List[Dict[str, float]]:
         """
-        Detect sounds from a live audio stream on the virtual machine.
+        Detect sounds in the next seconds of a live audio stream on the virtual machine.
+        The connection stays open between calls, so each call classifies the audio
+        that arrived since the previous one instead of downloading the stream again.
         Args:
             endpoint: Endpoint path on the VM (will be appended to vm_url)
             threshold: Detection threshold (0-1)
+            duration: Seconds of audio to read and classify
+            sample_rate: Sample rate of raw PCM streams (a WAV header overrides it)
         Returns:
             List of detected sounds with their probabilities
         """
@@ -331,27 +462,23 @@ class SoundDetector:
         # Construct full URL
         url = f"{self.vm_url}/{endpoint.lstrip('/')}"
         
-        # Fetch and process audio
-        waveform = self._fetch_audio_from_url(url)
+        reader = self._vm_readers.get(url)
+        if reader is None:
+            reader = HTTPAudioStreamReader(url, sample_rate=sample_rate)
+            reader.connect()
+            self._vm_readers[url] = reader
         
-        # Convert to tensor
-        waveform = torch.from_numpy(waveform).float()
-        waveform = waveform.unsqueeze(0)
-        waveform = waveform.to(self.device)
-        
-        # Get predictions
-        with torch.no_grad():
-            predictions = self.model(waveform)
-            probabilities = torch.sigmoid(predictions)
+        audio = reader.read(int(duration * reader.sample_rate))
+        if audio is None:
+            raise Exception(f"Audio stream ended: {url}")
         
-        # Process predictions
-        results = []
-        for idx, prob in enumerate(probabilities[0]):
-            if prob > threshold:
-                class_name = self.class_mapping.get(idx, f"Unknown_{idx}")
-                results.append({
-                    "class": class_name,
-                    "probability": float(prob)
-                })
-        
-        return sorted(results, key=lambda x: x["probability"], reverse=True) 
\ No newline at end of file
+        return self.detect_sounds_from_stream(audio, threshold=threshold, input_sr=reader.sample_rate, stream_id=url)
+    
+    def close_vm_streams(self):
+        """Close the open VM stream connections and forget their resampler state."""
+        for url, reader in self._vm_readers.items():
+            reader.close()
+            if self.use_yamnet:
+                self.yamnet_detector.close_stream(url)
+        self._stream_resamplers = {key: resampler for key, resampler in self._stream_resamplers.items() if key[0] not in self._vm_readers}
+        self._vm_readers = {}
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Sliding-window YAMNet classification for continuous audio streams.
+Keeps a rolling audio context so every 0.48 s hop is scored exactly once
+on a full 0.96 s window, including events that straddle block boundaries.
+"""
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from yamnet_detector import WINDOW_SAMPLES, HOP_SAMPLES
+
+
+class SlidingWindowBuffer:
+    def __init__(self, window: int = WINDOW_SAMPLES, hop: int = HOP_SAMPLES):
+        """
+        Rolling audio context that cuts a stream into overlapping windows.
+        Args:
+            window: Window length in samples
+            hop: Distance between window starts in samples
+        """
+        self.window = window
+        self.hop = hop
+        self.reset()
+
+    def reset(self):
+        """Drop the buffered context."""
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0  # Stream sample index of _buffer[0]
+        self._next_start = 0    # Stream sample index of the next window
+
+    def push(self, samples: np.ndarray) -> List[Tuple[np.ndarray, int]]:
+        """
+        Append samples and return every window that became complete.
+        Args:
+            samples: 1-D audio at the classifier sample rate
+        Returns:
+            List of (window, start_sample) tuples in stream order
+        """
+        self._buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32).reshape(-1)])
+        buffer_end = self._buffer_start + len(self._buffer)
+
+        windows = []
+        while self._next_start + self.window <= buffer_end:
+            offset = self._next_start - self._buffer_start
+            windows.append((self._buffer[offset:offset + self.window], self._next_start))
+            self._next_start += self.hop
+
+        # Only keep the context needed for the next window
+        drop = self._next_start - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:].copy()
+            self._buffer_start = self._next_start
+        return windows
+
+    def flush(self) -> List[Tuple[np.ndarray, int]]:
+        """
+        Zero-pad the tail so the last samples are covered by a window (end of a file).
+        Returns:
+            The padded final window, if any audio was not covered yet
+        """
+        buffer_end = self._buffer_start + len(self._buffer)
+        covered_end = self._next_start - self.hop + self.window if self._next_start > 0 else 0
+        if buffer_end <= covered_end:
+            return []
+        return self.push(np.zeros(self._next_start + self.window - buffer_end, dtype=np.float32))
+
+
+class StreamingYAMNetClassifier:
+    def __init__(self, detector, threshold: float = 0.3, top_k: int = 10, normalize: bool = False, start_time: Optional[float] = None, gate=None):
+        """
+        Per-hop YAMNet scoring for one continuous 16kHz stream.
+        Args:
+            detector: YAMNetDetector used to score windows
+            threshold: Minimum probability threshold
+            top_k: Maximum number of classes per hop
+            normalize: Peak-normalize each window before scoring
+            start_time: Wall-clock time of the first sample (defaults to now)
+            gate: Optional EnergyGate; hops it rejects are not scored
+        """
+        self.detector = detector
+        self.threshold = threshold
+        self.top_k = top_k
+        self.normalize = normalize
+        self.sample_rate = detector.sample_rate
+        self.start_time = start_time if start_time is not None else time.time()
+        self.windows = SlidingWindowBuffer()
+        self.gate = gate
+        self.hops_processed = 0
+
+    def reset(self, start_time: Optional[float] = None):
+        """
+        Restart the stream (e.g. after capture was paused).
+        Args:
+            start_time: Wall-clock time of the next sample (defaults to now)
+        """
+        self.windows.reset()
+        self.start_time = start_time if start_time is not None else time.time()
+
+    def collect(self, samples: np.ndarray) -> List[Dict]:
+        """
+        Feed new audio and gate every hop that became available, without scoring.
+        Used to batch windows from several streams into one model call.
+        Args:
+            samples: 1-D audio at 16kHz, consecutive with the previous push
+        Returns:
+            One dict per new hop with 'window' (ready to score), 'start_sample'
+            and 'active' (False if the gate skipped the hop)
+        """
+        return self._prepare(self.windows.push(samples))
+
+    def _prepare(self, ready: List[Tuple[np.ndarray, int]]) -> List[Dict]:
+        if not ready:
+            return []
+
+        batch = np.stack([window for window, _ in ready])
+        # Gate on the newest hop of each window; the older half was judged with the previous window
+        if self.gate is not None:
+            active = self.gate.evaluate(batch[:, -self.windows.hop:])
+        else:
+            active = np.ones(len(batch), dtype=bool)
+
+        if self.normalize:
+            peaks = np.max(np.abs(batch), axis=1, keepdims=True)
+            batch = batch / np.where(peaks > 0, peaks, 1.0)
+
+        return [
+            {'window': window, 'start_sample': start_sample, 'active': bool(is_active)}
+            for window, (_, start_sample), is_active in zip(batch, ready, active)
+        ]
+
+    def complete(self, pending: List[Dict], scores: np.ndarray, threshold: Optional[float] = None, class_mask: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Turn the scores of collected hops into per-hop results.
+        Args:
+            pending: Hops returned by collect()
+            scores: One score row per active hop, in order
+            threshold: Detection threshold for these hops (defaults to self.threshold)
+            class_mask: Class mask for these hops (defaults to the detector's category filter)
+        Returns:
+            One dict per hop with 'start_time', 'end_time', 'scores'
+            (per-class array, None if the gate skipped the hop) and
+            'detections' (filtered results, each carrying the hop timestamps)
+        """
+        threshold = self.threshold if threshold is None else threshold
+        rows = iter(scores)
+        hops = []
+        for hop in pending:
+            start_time = self.start_time + hop['start_sample'] / self.sample_rate
+            end_time = start_time + len(hop['window']) / self.sample_rate
+            row = next(rows) if hop['active'] else None
+            if row is None:
+                detections = []
+            else:
+                detections = self.detector._scores_to_results(row, threshold, self.top_k, class_mask)
+            for detection in detections:
+                detection['start_time'] = start_time
+                detection['end_time'] = end_time
+            hops.append({
+                'start_time': start_time,
+                'end_time': end_time,
+                'scores': row,
+                'detections': detections
+            })
+        self.hops_processed += len(hops)
+        return hops
+
+    def push(self, samples: np.ndarray) -> List[Dict]:
+        """
+        Feed new audio and score every hop that became available.
+        Args:
+            samples: 1-D audio at 16kHz, consecutive with the previous push
+        Returns:
+            Per-hop results, see complete()
+        """
+        return self._score(self.collect(samples))
+
+    def flush(self) -> List[Dict]:
+        """
+        Score the zero-padded tail of a finite stream (e.g. the end of a file).
+        Returns:
+            Per-hop results, see complete()
+        """
+        return self._score(self._prepare(self.windows.flush()))
+
+    def _score(self, pending: List[Dict]) -> List[Dict]:
+        windows = [hop['window'] for hop in pending if hop['active']]
+        scores = self.detector.score_windows(np.stack(windows)) if windows else []
+        return self.complete(pending, scores)
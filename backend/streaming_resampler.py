@@ -0,0 +1,83 @@
+"""
+Stateful polyphase resampler for live audio.
+Keeps the filter history between blocks so consecutive blocks resample
+exactly like one continuous signal (no edge artifacts at block boundaries).
+"""
+import numpy as np
+from math import gcd
+
+
+class StreamingResampler:
+    def __init__(self, input_sr: int, target_sr: int = 16000, half_width: int = 10, kaiser_beta: float = 5.0):
+        """
+        Initialize the resampler for a fixed rate pair.
+        Args:
+            input_sr: Sample rate of the incoming blocks
+            target_sr: Output sample rate
+            half_width: Filter half-length in zero crossings of the lower rate
+            kaiser_beta: Kaiser window shape parameter for the anti-aliasing filter
+        """
+        self.input_sr = int(input_sr)
+        self.target_sr = int(target_sr)
+        g = gcd(self.input_sr, self.target_sr)
+        self.up = self.target_sr // g
+        self.down = self.input_sr // g
+        self.passthrough = self.up == self.down
+
+        if not self.passthrough:
+            # Windowed-sinc low-pass at the lower of the two Nyquist rates
+            max_rate = max(self.up, self.down)
+            num_taps = 2 * half_width * max_rate + 1
+            n = np.arange(num_taps) - (num_taps - 1) / 2
+            cutoff = 1.0 / max_rate
+            h = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, kaiser_beta)
+            h = h / np.sum(h) * self.up  # Unity DC gain after upsampling
+
+            # Split into polyphase components: phases[p, i] = h[p + i * up]
+            self.taps_per_phase = -(-num_taps // self.up)
+            padded = np.zeros(self.taps_per_phase * self.up)
+            padded[:num_taps] = h
+            self.phases = padded.reshape(self.taps_per_phase, self.up).T[:, ::-1].astype(np.float32)
+
+        self.reset()
+
+    def reset(self):
+        """Clear the filter state (e.g. when the stream restarts)."""
+        self._samples_in = 0   # Total input samples consumed
+        self._samples_out = 0  # Total output samples produced
+        if not self.passthrough:
+            self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Resample the next block of the stream.
+        Args:
+            block: 1-D float audio at input_sr
+        Returns:
+            Resampled float32 audio at target_sr
+        """
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return block
+
+        buf = np.concatenate([self._history, block])
+        buf_start = self._samples_in - len(self._history)  # Global index of buf[0]
+        self._samples_in += len(block)
+
+        # Emit every output sample whose newest input sample is now available
+        last_out = (self._samples_in * self.up - 1) // self.down
+        n = np.arange(self._samples_out, last_out + 1)
+        self._samples_out = last_out + 1
+
+        if len(n) > 0:
+            t = n * self.down
+            phase = t % self.up
+            newest = t // self.up - buf_start
+            # Window of taps_per_phase input samples ending at the newest one
+            idx = newest[:, None] + np.arange(1 - self.taps_per_phase, 1)[None, :]
+            out = np.einsum('ij,ij->i', self.phases[phase], buf[idx])
+        else:
+            out = np.zeros(0, dtype=np.float32)
+
+        self._history = buf[len(buf) - (self.taps_per_phase - 1):]
+        return out.astype(np.float32)
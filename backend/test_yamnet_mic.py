@@ -10,7 +10,7 @@ import numpy as np
 from sound_detector import SoundDetector
 import time
 import json
-import librosa
+from streaming_resampler import StreamingResampler
 
 def test_yamnet_microphone():
     """Test YAMNet with microphone input and continuous monitoring"""
@@ -51,6 +51,9 @@ def test_yamnet_microphone():
     last_detection_time = 0
     detection_cooldown = 1.0  # Minimum seconds between detections
     
+    # Created once the device sample rate is known (at stream start)
+    resampler = None
+    
     def audio_callback(indata, frames, time_info, status):
         """Callback function for audio stream processing."""
         nonlocal last_detection_time
@@ -66,13 +69,7 @@ def test_yamnet_microphone():
         
         # Resample to 16kHz if needed (YAMNet requirement)
         # Most microphones default to 44.1kHz or 48kHz
-        current_sr = int(sd.query_devices(sd.default.device[0])['default_samplerate'])
-        if current_sr != sample_rate:
-            audio_data = librosa.resample(
-                audio_data.astype(np.float32), 
-                orig_sr=current_sr, 
-                target_sr=sample_rate
-            )
+        audio_data = resampler.process(audio_data)
         
         # Normalize audio data
         if np.max(np.abs(audio_data)) > 0:
@@ -136,6 +133,7 @@ def test_yamnet_microphone():
         # Start recording
         # Note: We request the device's native sample rate, then resample in callback
         device_sr = int(default_device['default_samplerate'])
+        resampler = StreamingResampler(device_sr, sample_rate)
         with sd.InputStream(
             callback=audio_callback,
             channels=1,
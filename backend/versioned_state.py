@@ -0,0 +1,140 @@
+"""
+Versioned snapshots of the latest detections, for cheap polling.
+The latest value is always stored, but only a meaningful change bumps the
+version number. HTTP clients get it as a weak ETag and can revalidate with
+If-None-Match (304 when nothing meaningful changed) or long-poll with
+?after_version=. SSE clients receive only the differences between versions.
+The JSON body is serialized at most once per stored value, not once per
+request.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Distinguishes versions of this process from those of an earlier run in ETags
+_INSTANCE = format(int(time.time() * 1000) & 0xffffffff, "x")
+
+
+class VersionedState:
+    def __init__(self, value: Dict, key: Optional[Callable[[Dict], Any]] = None):
+        """
+        Latest value of one piece of state with a change counter.
+        Args:
+            value: Initial value (JSON-serializable dictionary)
+            key: Function returning what counts as a change (e.g. ignoring timestamps
+                and score jitter); the whole value is compared if None
+        """
+        self.key = key or (lambda v: v)
+        self._lock = threading.RLock()
+        self._value = value
+        self._key = self.key(value)
+        self._version = 0
+        self._body: Optional[bytes] = None
+        self._waiters = set()  # (loop, future) of long-polls and streams
+
+    def set(self, value: Dict) -> bool:
+        """
+        Replace the value from any thread; the version is bumped only if its key changed.
+        Returns:
+            True if it counted as a change (version bumped, waiters woken)
+        """
+        key = self.key(value)
+        with self._lock:
+            # Always keep the latest value (fresh timestamps, boxes), even under the same version
+            self._value = value
+            self._body = None
+            if key == self._key:
+                return False
+            self._key = key
+            self._version += 1
+            waiters, self._waiters = self._waiters, set()
+        for loop, future in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, future)
+        return True
+
+    def update(self, change: Callable[[Dict], Dict]) -> bool:
+        """Replace the value with change(current value), atomically with respect to other updates."""
+        with self._lock:
+            return self.set(change(self._value))
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def snapshot(self) -> Tuple[int, Dict]:
+        """Current (version, value)."""
+        with self._lock:
+            return self._version, self._value
+
+    def etag(self, version: Optional[int] = None) -> str:
+        # Weak: the body may change within a version, but not in a way that counts as a change
+        return f'W/"{_INSTANCE}-{self._version if version is None else version}"'
+
+    def body(self) -> Tuple[int, bytes]:
+        """Current (version, JSON body), serialized at most once per stored value."""
+        with self._lock:
+            if self._body is None:
+                self._body = json.dumps(self._value).encode("utf-8")
+            return self._version, self._body
+
+    async def wait(self, after_version: int, timeout: float) -> bool:
+        """
+        Wait until the version is above after_version.
+        Args:
+            after_version: Version the client already has
+            timeout: Seconds to wait at most
+        Returns:
+            True if there is a newer version, False on timeout
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            # A client from before a restart may hold a version above the current one
+            if self._version != after_version:
+                return True
+            entry = (loop, future)
+            self._waiters.add(entry)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+    def waiting(self) -> int:
+        """Number of long-polls and streams currently waiting."""
+        return len(self._waiters)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def diff(old: Dict, new: Dict) -> Dict:
+    """
+    Difference between two values: list fields as 'added' / 'removed' items,
+    other fields that changed under 'set'.
+    """
+    delta = {"set": {}, "added": {}, "removed": {}}
+    for field, value in new.items():
+        previous = old.get(field)
+        if isinstance(value, list) and isinstance(previous, list):
+            before = {json.dumps(item, sort_keys=True): item for item in previous}
+            after = {json.dumps(item, sort_keys=True): item for item in value}
+            added = [item for k, item in after.items() if k not in before]
+            removed = [item for k, item in before.items() if k not in after]
+            if added:
+                delta["added"][field] = added
+            if removed:
+                delta["removed"][field] = removed
+        elif value != previous:
+            delta["set"][field] = value
+    for field in old.keys() - new.keys():
+        delta["set"][field] = None
+    return {name: part for name, part in delta.items() if part}
@@ -8,52 +8,169 @@ import numpy as np
 import librosa
 import json
 import os
+import csv
+import time
 from typing import List, Dict, Optional
-import soundfile as sf
-import io
-import requests
 from urllib.parse import urlparse
+from streaming_resampler import StreamingResampler
+from http_audio_stream import fetch_audio
+from model_store import ModelStore, get_model_store, resolve_model
+from yamnet_tflite import TFLiteInterpreterPool, read_label_list, EMBEDDING_SIZE
+from class_matcher import ClassMatcher
 
 # YAMNet model URL from TensorFlow Hub
 YAMNET_MODEL_URL = 'https://tfhub.dev/google/yamnet/1'
 
+# YAMNet framing at 16kHz: 0.96 s patches every 0.48 s. One patch needs
+# 96 STFT frames of 25 ms with a 10 ms hop, i.e. 15600 samples.
+WINDOW_SAMPLES = 15600
+HOP_SAMPLES = 7680
+
+
+def contiguous_runs(windows: np.ndarray, hop: int = HOP_SAMPLES) -> List[tuple]:
+    """(start, end) index ranges of windows in which each window starts hop samples after the previous one."""
+    if len(windows) == 0:
+        return []
+    overlap = windows.shape[1] - hop
+    follows = np.all(windows[1:, :overlap] == windows[:-1, hop:], axis=1)
+    bounds = [0] + (np.flatnonzero(~follows) + 1).tolist() + [len(windows)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
 class YAMNetDetector:
-    def __init__(self, yamnet_categories_path: str = "yamnet_categories.json"):
+    def __init__(self, yamnet_categories_path: str = "yamnet_categories.json", model_store: Optional[ModelStore] = None, backend: str = "tf", tflite_model_path: Optional[str] = None, tflite_num_threads: int = 1):
         """
         Initialize YAMNet detector.
         Args:
             yamnet_categories_path: Path to JSON file containing YAMNet category names to filter
+            model_store: Local model store (defaults to MODEL_STORE_DIR). Pinned 'yamnet',
+                'yamnet_tflite' and 'yamnet_class_map' artifacts are loaded from it without network access
+            backend: "tf" for the TensorFlow Hub SavedModel, "tflite" for the lightweight TFLite model
+            tflite_model_path: Path to the YAMNet .tflite model (defaults to the pinned 'yamnet_tflite')
+            tflite_num_threads: CPU threads per TFLite interpreter
         """
-        print("Loading YAMNet model from TensorFlow Hub...")
-        self.model = hub.load(YAMNET_MODEL_URL)
-        print("YAMNet model loaded successfully!")
-        
-        # Load YAMNet class names
-        class_map_path = self.model.class_map_path().numpy().decode('utf-8')
-        class_names_path = tf.keras.utils.get_file(
-            'yamnet_class_map.csv',
-            'https://raw.githubusercontent.com/tensorflow/models/master/research/audioset/yamnet/yamnet_class_map.csv'
-        )
-        
-        # Read class names
-        self.class_names = {}
-        with open(class_names_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split(',')
-                if len(parts) >= 2:
-                    idx = int(parts[0])
-                    name = parts[1].strip('"')
-                    self.class_names[idx] = name
-        
-        # Load filtered categories if provided
-        self.filter_categories = None
-        if yamnet_categories_path and os.path.exists(yamnet_categories_path):
-            with open(yamnet_categories_path, 'r') as f:
-                self.filter_categories = json.load(f)
-            print(f"Filtering for categories: {self.filter_categories}")
+        if backend not in ("tf", "tflite"):
+            raise ValueError(f"Unknown YAMNet backend: {backend}")
+        self.backend = backend
+        self.model = None
+        self.interpreters = None
+        
+        start = time.perf_counter()
+        if backend == "tflite":
+            tflite_model_path = tflite_model_path or resolve_model('yamnet_tflite', model_store)
+            if not tflite_model_path:
+                raise ValueError("TFLite backend needs tflite_model_path or a pinned 'yamnet_tflite' model")
+            print(f"Loading YAMNet TFLite model: {tflite_model_path}")
+            self.interpreters = TFLiteInterpreterPool(tflite_model_path, WINDOW_SAMPLES, num_threads=tflite_num_threads)
+        else:
+            model_dir = resolve_model('yamnet', model_store)
+            if model_dir:
+                print(f"Loading YAMNet model from local model store: {model_dir}")
+                self.model = hub.load(model_dir)
+            else:
+                print("Loading YAMNet model from TensorFlow Hub...")
+                self.model = hub.load(YAMNET_MODEL_URL)
+        self.load_seconds = time.perf_counter() - start
+        print(f"YAMNet model loaded in {self.load_seconds:.2f}s")
+        
+        # Load YAMNet class names: pinned copy, or the class map bundled with the model.
+        # The bundled map needs no network, so an offline store does not have to pin it
+        store = model_store or get_model_store()
+        class_names_path = store.resolve('yamnet_class_map') if store is not None and store.has('yamnet_class_map') else None
+        if class_names_path is not None:
+            self.class_names = self._read_class_map(class_names_path)
+        elif self.backend == "tflite":
+            labels = read_label_list(tflite_model_path)
+            if labels is None:
+                raise ValueError("TFLite model has no label list; pin 'yamnet_class_map' in the model store")
+            self.class_names = dict(enumerate(labels))
+        else:
+            self.class_names = self._read_class_map(self.model.class_map_path().numpy().decode('utf-8'))
+        # Offline index mapping prompts and LLM category names to class indices
+        self.class_matcher = ClassMatcher(self.class_names)
+        
+        # Load filtered categories if provided (compiled to a class mask)
+        self._filter = (None, None)
+        self.load_filter_categories(yamnet_categories_path)
         
         # YAMNet expects 16kHz sample rate
         self.sample_rate = 16000
+        
+        # One stateful resampler per (stream id, input rate) for stream data
+        self._stream_resamplers = {}
+        
+        if self.backend == "tf":
+            self._score_batch = self._build_batch_scorer()
+    
+    @staticmethod
+    def _read_class_map(class_names_path: str) -> Dict[int, str]:
+        """Read class names (index,mid,display_name; display names may contain quoted commas)."""
+        class_names = {}
+        with open(class_names_path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                class_names[int(row['index'])] = row['display_name']
+        return class_names
+    
+    def _run_model(self, waveform: np.ndarray) -> np.ndarray:
+        """
+        Run YAMNet on a waveform of any length.
+        Args:
+            waveform: 16kHz mono audio
+        Returns:
+            Array of shape (num_frames, num_classes)
+        """
+        if self.backend == "tf":
+            scores, embeddings, spectrogram = self.model(waveform)
+            return np.asarray(scores)
+        
+        # TFLite runs on fixed windows: frame like YAMNet (pad to at least one window)
+        if len(waveform) < WINDOW_SAMPLES:
+            waveform = np.pad(waveform, (0, WINDOW_SAMPLES - len(waveform)))
+        num_frames = 1 + (len(waveform) - WINDOW_SAMPLES) // HOP_SAMPLES
+        windows = np.lib.stride_tricks.sliding_window_view(waveform, WINDOW_SAMPLES)[::HOP_SAMPLES][:num_frames]
+        return self.score_windows(windows)
+    
+    @property
+    def filter_categories(self) -> Optional[List[str]]:
+        """Category names the results are currently filtered by (None = all classes)."""
+        return self._filter[0]
+    
+    @property
+    def class_mask(self) -> Optional[np.ndarray]:
+        """Boolean mask of the classes passing the filter (None = all classes)."""
+        return self._filter[1]
+    
+    def load_filter_categories(self, yamnet_categories_path: str) -> bool:
+        """
+        Load filter categories from a JSON file and compile them.
+        Args:
+            yamnet_categories_path: Path to JSON file containing YAMNet category names
+        Returns:
+            True if the file existed and was loaded
+        """
+        if not yamnet_categories_path or not os.path.exists(yamnet_categories_path):
+            return False
+        with open(yamnet_categories_path, 'r') as f:
+            self.set_filter_categories(json.load(f))
+        print(f"Filtering for categories: {self.filter_categories}")
+        return True
+    
+    def set_filter_categories(self, categories: Optional[List[str]]):
+        """
+        Compile filter categories into a boolean mask over class indices.
+        The (categories, mask) pair is swapped in with a single assignment, so
+        a concurrent detection sees either the old or the new filter, never a mix.
+        Args:
+            categories: Category names to keep, or None/empty to keep all classes
+        """
+        self._filter = (categories, self._compile_filter(categories))
+    
+    def _compile_filter(self, categories: Optional[List[str]]) -> Optional[np.ndarray]:
+        """
+        Build the class mask for a list of category names.
+        Exact class names select that class; other phrases ("dogs barking",
+        "glass-break") select the closest classes of the n-gram matcher.
+        """
+        return self.class_matcher.mask(categories)
     
     def preprocess_audio(self, audio_source: str) -> np.ndarray:
         """
@@ -65,10 +182,8 @@ class YAMNetDetector:
         """
         # Check if the source is a URL
         if urlparse(audio_source).scheme in ('http', 'https'):
-            response = requests.get(audio_source, stream=True)
-            response.raise_for_status()
-            audio_data = io.BytesIO(response.content)
-            waveform, sr = sf.read(audio_data)
+            # Pooled keep-alive session, body read in chunks
+            waveform, sr = fetch_audio(audio_source)
         else:
             # Load from local file
             waveform, sr = librosa.load(audio_source, sr=None)
@@ -83,6 +198,24 @@ class YAMNetDetector:
         
         return waveform.astype(np.float32)
     
+    def _get_stream_resampler(self, input_sr: int, stream_id: Optional[str] = None) -> StreamingResampler:
+        """
+        Get the stateful resampler of one stream.
+        Consecutive blocks with the same stream id are assumed to belong to one continuous
+        stream; concurrent streams need distinct ids so they never share filter history.
+        """
+        key = (stream_id, input_sr)
+        resampler = self._stream_resamplers.get(key)
+        if resampler is None:
+            resampler = StreamingResampler(input_sr, self.sample_rate)
+            self._stream_resamplers[key] = resampler
+        return resampler
+    
+    def close_stream(self, stream_id: Optional[str] = None):
+        """Forget the resampler state of a stream (e.g. when it disconnects)."""
+        for key in [key for key in self._stream_resamplers if key[0] == stream_id]:
+            del self._stream_resamplers[key]
+    
     def detect_sounds(self, audio_source: str, threshold: float = 0.3, top_k: int = 10) -> List[Dict]:
         """
         Detect sounds using YAMNet.
@@ -97,49 +230,22 @@ class YAMNetDetector:
         waveform = self.preprocess_audio(audio_source)
         
         # Run YAMNet inference
-        scores, embeddings, spectrogram = self.model(waveform)
+        scores = self._run_model(waveform)
         
-        # Get top predictions
+        # Average over frames and keep the top predictions
         scores_mean = np.mean(scores, axis=0)
-        top_indices = np.argsort(scores_mean)[::-1][:top_k]
-        
-        results = []
-        for idx in top_indices:
-            prob = float(scores_mean[idx])
-            class_name = self.class_names.get(idx, f"Unknown_{idx}")
-            
-            # Filter by threshold
-            if prob < threshold:
-                continue
-            
-            # Filter by category list if provided
-            if self.filter_categories:
-                # Check if this class name matches any of our filter categories
-                # YAMNet class names are like "Glass, Glass" or "Crash" etc.
-                matches_filter = any(
-                    filter_cat.lower() in class_name.lower() 
-                    or class_name.lower() in filter_cat.lower()
-                    for filter_cat in self.filter_categories
-                )
-                if not matches_filter:
-                    continue
-            
-            results.append({
-                'class': class_name,
-                'probability': prob,
-                'class_index': int(idx)
-            })
-        
-        return sorted(results, key=lambda x: x['probability'], reverse=True)
+        return self._scores_to_results(scores_mean, threshold, top_k)
     
-    def detect_sounds_from_stream(self, audio_stream: np.ndarray, threshold: float = 0.3, top_k: int = 10, input_sr: int = None) -> List[Dict]:
+    def detect_sounds_from_stream(self, audio_stream: np.ndarray, threshold: float = 0.3, top_k: int = 10, input_sr: int = None, stream_id: Optional[str] = None) -> List[Dict]:
         """
         Detect sounds from audio stream data.
         Args:
             audio_stream: Numpy array containing audio data
             threshold: Minimum probability threshold
             top_k: Maximum number of results
-            input_sr: Input sample rate (if None, assumes 16kHz)
+            input_sr: Input sample rate (if None, assumes 16kHz). Blocks are resampled
+                with a stateful resampler, so pass consecutive blocks of one stream
+            stream_id: Identifies the stream when several are classified concurrently
         Returns:
             List of detected sounds
         """
@@ -149,44 +255,117 @@ class YAMNetDetector:
         
         # Resample to 16kHz if needed (YAMNet requirement)
         if input_sr and input_sr != self.sample_rate:
-            waveform = librosa.resample(
-                audio_stream.astype(np.float32),
-                orig_sr=input_sr,
-                target_sr=self.sample_rate
-            )
+            waveform = self._get_stream_resampler(input_sr, stream_id).process(audio_stream)
         else:
             waveform = audio_stream.astype(np.float32)
         
         # Run YAMNet
-        scores, embeddings, spectrogram = self.model(waveform)
+        scores = self._run_model(waveform)
         
         # Process results
         scores_mean = np.mean(scores, axis=0)
-        top_indices = np.argsort(scores_mean)[::-1][:top_k]
-        
-        results = []
-        for idx in top_indices:
-            prob = float(scores_mean[idx])
-            if prob < threshold:
-                continue
-            
-            class_name = self.class_names.get(idx, f"Unknown_{idx}")
-            
-            # Filter by category list if provided
-            if self.filter_categories:
-                matches_filter = any(
-                    filter_cat.lower() in class_name.lower() 
-                    or class_name.lower() in filter_cat.lower()
-                    for filter_cat in self.filter_categories
-                )
-                if not matches_filter:
+        return self._scores_to_results(scores_mean, threshold, top_k)
+    
+    def score_windows(self, windows: np.ndarray, return_embeddings: bool = False):
+        """
+        Score fixed-length analysis windows.
+        Args:
+            windows: Array of shape (num_windows, WINDOW_SAMPLES), 16kHz mono
+            return_embeddings: Also return the 1024-d YAMNet embedding of each window
+        Returns:
+            Array of shape (num_windows, num_classes) with one score row per window,
+            or (scores, embeddings) if return_embeddings is set
+        """
+        if len(windows) == 0:
+            scores = np.zeros((0, len(self.class_names)), dtype=np.float32)
+            return (scores, np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)) if return_embeddings else scores
+        
+        if self.backend == "tflite":
+            # Scored on this thread's own pre-allocated interpreter
+            outputs = [self.interpreters.score(window) for window in windows]
+            scores = np.stack([window_scores for window_scores, _ in outputs])
+            if not return_embeddings:
+                return scores
+            if outputs[0][1] is None:
+                raise ValueError(f"The TFLite model {self.interpreters.model_path} has no embedding output.")
+            return scores, np.stack([embedding for _, embedding in outputs])
+        
+        scores = np.empty((len(windows), len(self.class_names)), dtype=np.float32)
+        embeddings = np.empty((len(windows), EMBEDDING_SIZE), dtype=np.float32)
+        singles = []
+        for start, end in contiguous_runs(windows, HOP_SAMPLES):
+            if end - start > 1:
+                # Consecutive hops (a file segment, a stream that fell behind) are one waveform whose
+                # YAMNet patches are exactly these windows: the model scores them in one batched pass
+                waveform = np.concatenate([windows[start], windows[start + 1:end, WINDOW_SAMPLES - HOP_SAMPLES:].reshape(-1)])
+                run_scores, run_embeddings, _ = self.model(waveform)
+                if len(run_scores) == end - start:
+                    scores[start:end] = run_scores.numpy()
+                    embeddings[start:end] = run_embeddings.numpy()
                     continue
-            
-            results.append({
-                'class': class_name,
-                'probability': prob,
-                'class_index': int(idx)
-            })
+            singles.extend(range(start, end))
+        if singles:
+            # Unrelated windows (e.g. one per stream) share one graph invocation
+            single_scores, single_embeddings = self._score_batch(tf.convert_to_tensor(windows[singles], dtype=tf.float32))
+            scores[singles] = single_scores.numpy()
+            embeddings[singles] = single_embeddings.numpy()
+        return (scores, embeddings) if return_embeddings else scores
+    
+    def _build_batch_scorer(self):
+        """
+        Compile a graph that scores a batch of unrelated windows in one call.
+        The hub model takes a single 1-D waveform, so the batch is mapped inside
+        the graph: the windows still run one after another, this only saves the
+        Python overhead of one model call per window.
+        A window of WINDOW_SAMPLES yields exactly one YAMNet frame.
+        """
+        model = self.model
         
-        return sorted(results, key=lambda x: x['probability'], reverse=True)
-
+        def score_window(window):
+            scores, embeddings, _ = model(window)
+            return scores[0], embeddings[0]
+        
+        @tf.function(input_signature=[tf.TensorSpec(shape=[None, WINDOW_SAMPLES], dtype=tf.float32)])
+        def score_batch(windows):
+            return tf.map_fn(
+                score_window,
+                windows,
+                fn_output_signature=(tf.float32, tf.float32)
+            )
+        
+        return score_batch
+    
+    def _scores_to_results(self, scores: np.ndarray, threshold: float, top_k: int, mask: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Turn one score row into filtered detection results.
+        Args:
+            scores: Array of per-class scores
+            threshold: Minimum probability threshold
+            top_k: Maximum number of results among the classes that pass the filter
+            mask: Class mask to filter by instead of the global category filter
+        Returns:
+            List of detected sounds sorted by probability
+        """
+        scores = np.asarray(scores)
+        if mask is None:
+            mask = self._filter[1]
+        
+        # Filter by threshold and category mask in one pass
+        candidates = scores >= threshold
+        if mask is not None:
+            candidates &= mask
+        indices = np.flatnonzero(candidates)
+        
+        # Keep the top_k candidates without sorting all classes
+        if len(indices) > top_k:
+            indices = indices[np.argpartition(scores[indices], -top_k)[-top_k:]]
+        indices = indices[np.argsort(scores[indices])[::-1]]
+        
+        return [
+            {
+                'class': self.class_names.get(int(idx), f"Unknown_{idx}"),
+                'probability': float(scores[idx]),
+                'class_index': int(idx)
+            }
+            for idx in indices
+        ]
@@ -0,0 +1,103 @@
+"""
+TFLite backend for YAMNet.
+Runs the lightweight YAMNet TFLite model through a pool of pre-allocated
+interpreters, one per worker thread, with the input tensor sized once to
+the fixed YAMNet window.
+"""
+import threading
+import zipfile
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Prefer the small tflite_runtime package, fall back to full TensorFlow
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+
+NUM_CLASSES = 521
+EMBEDDING_SIZE = 1024
+
+
+class TFLiteInterpreterPool:
+    def __init__(self, model_path: str, window_samples: int, num_threads: int = 1):
+        """
+        Pool of YAMNet TFLite interpreters.
+        Each thread that scores audio gets its own interpreter (interpreters are
+        not thread-safe), created on first use and reused afterwards.
+        Args:
+            model_path: Path to the YAMNet .tflite model
+            window_samples: Fixed input length in samples
+            num_threads: CPU threads per interpreter
+        """
+        self.model_path = model_path
+        self.window_samples = window_samples
+        self.num_threads = num_threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def _create(self):
+        interpreter = Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        input_index = interpreter.get_input_details()[0]['index']
+        # Resize once to the fixed window, so every invoke reuses the same buffers
+        interpreter.resize_tensor_input(input_index, [self.window_samples], strict=False)
+        interpreter.allocate_tensors()
+
+        scores_index = None
+        embeddings_index = None
+        for output in interpreter.get_output_details():
+            if output['shape'][-1] == NUM_CLASSES:
+                scores_index = output['index']
+            elif output['shape'][-1] == EMBEDDING_SIZE:
+                embeddings_index = output['index']
+        if scores_index is None:
+            raise ValueError(f"No {NUM_CLASSES}-class score output in {self.model_path}")
+
+        with self._lock:
+            self.size += 1
+        return interpreter, input_index, scores_index, embeddings_index
+
+    def _get(self):
+        entry = getattr(self._local, 'entry', None)
+        if entry is None:
+            entry = self._create()
+            self._local.entry = entry
+        return entry
+
+    def score(self, window: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Score one window on the calling thread's interpreter.
+        Args:
+            window: 16kHz mono audio of exactly window_samples samples
+        Returns:
+            (scores, embedding) for the window; embedding is None if the model has no embedding output
+        """
+        interpreter, input_index, scores_index, embeddings_index = self._get()
+        interpreter.set_tensor(input_index, window.astype(np.float32, copy=False))
+        interpreter.invoke()
+        scores = interpreter.get_tensor(scores_index).reshape(-1, NUM_CLASSES)[0].copy()
+        embedding = None
+        if embeddings_index is not None:
+            embedding = interpreter.get_tensor(embeddings_index).reshape(-1, EMBEDDING_SIZE)[0].copy()
+        return scores, embedding
+
+
+def read_label_list(model_path: str) -> Optional[List[str]]:
+    """
+    Read the class names packed into the model's metadata.
+    TFLite models with metadata are also zip archives with the label file.
+    Args:
+        model_path: Path to the .tflite model
+    Returns:
+        Class names in index order, or None if the model carries no label file
+    """
+    if not zipfile.is_zipfile(model_path):
+        return None
+    with zipfile.ZipFile(model_path) as archive:
+        for member in archive.namelist():
+            if member.endswith('.txt'):
+                lines = archive.read(member).decode('utf-8').splitlines()
+                return [line.strip() for line in lines if line.strip()]
+    return None